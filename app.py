@@ -1,5 +1,13 @@
 import streamlit as st
 from src.auth import AuthManager
+from src.database.instrumentation import transfer_stats
+from src.database.connection import http_pool_stats
+from src.database.async_connection import async_pool_stats
+from src.database.repo_metricas import MetricaRepository
+from src.services.job_worker import start_workers
+from src.document_engine.pdf_cache import get_pdf_cache
+from src.utils.storage import StorageService
+from src.utils.formatters import format_currency
 
 # 1. Configuração da Página (Deve ser o primeiro comando Streamlit)
 st.set_page_config(
@@ -9,6 +17,12 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+def variacao(atual, anterior):
+    """Delta do st.metric em relação ao mês anterior (None sem base de comparação)."""
+    if not anterior:
+        return None
+    return f"{(atual - anterior) / anterior:+.0%}"
+
 def main():
     # 2. Inicialização de estados globais
     if "authenticated" not in st.session_state:
@@ -32,6 +46,7 @@ def main():
     
     else:
         # 4. Painel Principal (Utilizador Autenticado)
+        start_workers()  # geração de contratos, e-mails e lembretes agendados rodam em segundo plano
         st.sidebar.write(f"👤 Olá, **{st.session_state.get('user_nome')}**")
         st.sidebar.info(f"Nível: {st.session_state.get('user_perfil').capitalize()}")
         
@@ -41,13 +56,56 @@ def main():
         st.title("🚀 Painel de Contratos NexusMed")
         st.write("---")
         
-        # Dashboard Rápido (Exemplo de métricas)
-        col1, col2, col3 = st.columns(3)
-        col1.metric("Contratos Pendentes", "12", "2")
-        col2.metric("Assinados este mês", "45", "15%")
-        col3.metric("Novos Alunos", "8", "+12%")
+        # Dashboard Rápido (totais mantidos no banco; deltas em relação ao mês anterior)
+        painel = MetricaRepository.painel()
+        if painel:
+            col1, col2, col3, col4 = st.columns(4)
+            col1.metric("Contratos Pendentes", painel['pendentes'], f"{painel['criados_mes']} criados no mês", delta_color="off")
+            col2.metric("Assinados este mês", painel['assinados_mes'],
+                        variacao(painel['assinados_mes'], painel['assinados_mes_anterior']))
+            col3.metric("Novos Alunos", painel['alunos_novos_mes'],
+                        variacao(painel['alunos_novos_mes'], painel['alunos_novos_mes_anterior']))
+            col4.metric("Receita assinada no mês", format_currency(painel['receita_mes']),
+                        variacao(painel['receita_mes'], painel['receita_mes_anterior']))
+        else:
+            st.warning("Não foi possível carregar as métricas do painel.")
 
         st.info("Utilize o menu lateral para navegar entre a gestão de alunos, cursos e geração de contratos.")
 
+        # Diagnóstico: bytes recebidos do Supabase por método de repositório (desde o início do processo)
+        if st.session_state.get('user_perfil') == "admin":
+            with st.expander("📡 Tráfego do banco por consulta"):
+                stats = transfer_stats()
+                if stats:
+                    st.dataframe(
+                        [{"consulta": k, **v} for k, v in stats.items()],
+                        hide_index=True, use_container_width=True
+                    )
+                else:
+                    st.caption("Nenhuma consulta registrada ainda.")
+
+                pool = http_pool_stats()
+                if pool:
+                    st.caption(
+                        f"Pool HTTP: {pool['conexoes_abertas']}/{pool['max_connections']} conexões abertas, "
+                        f"{pool['conexoes_ativas']} em uso ({pool['utilizacao']:.0%}), "
+                        f"{pool['aguardando_conexao']} aguardando, pico de {pool['pico_em_andamento']} requisições simultâneas"
+                    )
+
+                pool_async = async_pool_stats()
+                if pool_async:
+                    st.caption(
+                        f"Pool HTTP assíncrono: {pool_async['conexoes_abertas']}/{pool_async['max_connections']} conexões abertas, "
+                        f"{pool_async['conexoes_ativas']} em uso, pico de {pool_async['pico_em_andamento']} consultas em paralelo"
+                    )
+
+                # Contadores no diretório de cada cache: somam o Streamlit e os workers da fila
+                for nome, cache in (("Cache de PDFs gerados", get_pdf_cache().stats()),
+                                    ("Cache de arquivos do Storage", StorageService.cache_stats())):
+                    st.caption(
+                        f"{nome}: {cache['hit_rate']:.0%} de acertos ({cache['hits']} hits / {cache['misses']} misses), "
+                        f"{cache['entries']} arquivo(s), {cache['bytes'] / (1024 * 1024):.1f} MB"
+                    )
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,146 @@
+"""
+Benchmark do transporte HTTP do cliente Supabase contra um servidor local.
+
+Compara o cliente criado com os padrões do create_client (um pool por serviço)
+com o transporte de src/database/transport.py (pool único, keep-alive configurado)
+e com o mesmo transporte sem keep-alive, numa carga de consultas ao PostgREST
+misturadas com uploads no Storage, em vários níveis de concorrência.
+
+O servidor local simula o custo de abrir conexão (handshake TLS do Supabase) e a
+latência de cada requisição. Ele fala só HTTP/1.1: o ganho do HTTP/2 não aparece aqui.
+
+Uso (na raiz do projeto):
+    python -m benchmarks.bench_http_transport
+    python -m benchmarks.bench_http_transport --custo-conexao-ms 30 --latencia-ms 10 --concorrencia 1 8 32
+"""
+import json
+import time
+import random
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from supabase import create_client
+from supabase.lib.client_options import SyncClientOptions
+from src.database.transport import build_http_client, transport_settings, pool_stats
+
+REQUISICOES = 400
+PDF = b"%PDF-1.4\n" + b"0" * 50_000
+LINHAS = json.dumps([{"id": i, "nome_completo": f"Aluno {i}", "cpf": "00000000000"} for i in range(25)]).encode()
+
+
+class _Servidor(ThreadingHTTPServer):
+    daemon_threads = True
+    custo_conexao = 0.0
+    latencia = 0.0
+    conexoes = 0
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # mantém a conexão aberta entre requisições
+    disable_nagle_algorithm = True  # cabeçalho e corpo saem em writes separados
+
+    def setup(self):
+        super().setup()
+        self.server.conexoes += 1
+        time.sleep(self.server.custo_conexao)
+
+    def _responder(self):
+        tamanho = int(self.headers.get("Content-Length") or 0)
+        self.rfile.read(tamanho)
+        time.sleep(self.server.latencia)
+        corpo = LINHAS if "/rest/v1/" in self.path else json.dumps({"Key": self.path, "Id": "x"}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    do_GET = do_POST = do_PUT = _responder
+
+    def log_message(self, *args):
+        pass
+
+
+def iniciar_servidor(custo_conexao_ms: float, latencia_ms: float) -> _Servidor:
+    server = _Servidor(("127.0.0.1", 0), _Handler)
+    server.custo_conexao = custo_conexao_ms / 1000
+    server.latencia = latencia_ms / 1000
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def clientes(url: str) -> dict:
+    sem_keepalive = dict(transport_settings(), max_keepalive_connections=0)
+    return {
+        "padrao (create_client)": lambda: (create_client(url, "bench-key"), None),
+        "ajustado (transport.py)": lambda: _com_transporte(url, None),
+        "ajustado sem keep-alive": lambda: _com_transporte(url, sem_keepalive),
+    }
+
+
+def _com_transporte(url: str, cfg: dict):
+    http_client = build_http_client(cfg)
+    return create_client(url, "bench-key", options=SyncClientOptions(httpx_client=http_client)), http_client
+
+
+def operacao(cliente, rnd: random.Random):
+    if rnd.random() < 0.8:
+        cliente.table("alunos").select("id, nome_completo, cpf").limit(25).execute()
+    else:
+        cliente.storage.from_("contratos").upload(
+            path=f"bench/{rnd.random()}.pdf", file=PDF,
+            file_options={"content-type": "application/pdf", "upsert": "true"}
+        )
+
+
+def medir(cliente, concorrencia: int) -> dict:
+    latencias = []
+
+    def uma(i):
+        inicio = time.perf_counter()
+        operacao(cliente, random.Random(i))
+        latencias.append(time.perf_counter() - inicio)
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concorrencia) as executor:
+        list(executor.map(uma, range(REQUISICOES)))
+    total = time.perf_counter() - inicio
+    latencias.sort()
+    return {
+        "req_por_s": REQUISICOES / total,
+        "p50_ms": latencias[len(latencias) // 2] * 1000,
+        "p95_ms": latencias[int(len(latencias) * 0.95) - 1] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do transporte HTTP do cliente Supabase")
+    parser.add_argument("--custo-conexao-ms", type=float, default=20.0, help="Custo simulado de abrir conexão")
+    parser.add_argument("--latencia-ms", type=float, default=5.0, help="Latência simulada por requisição")
+    parser.add_argument("--concorrencia", type=int, nargs="+", default=[1, 4, 16, 32])
+    args = parser.parse_args()
+
+    server = iniciar_servidor(args.custo_conexao_ms, args.latencia_ms)
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+    print(f"{REQUISICOES} requisições (80% consultas, 20% uploads de 50 KB) | conexão {args.custo_conexao_ms} ms | latência {args.latencia_ms} ms")
+    print(f"{'cliente':>24} | {'conc.':>5} | {'req/s':>8} | {'p50 (ms)':>8} | {'p95 (ms)':>8} | {'conexões':>8}")
+    try:
+        for nome, fabrica in clientes(url).items():
+            for concorrencia in args.concorrencia:
+                cliente, http_client = fabrica()
+                server.conexoes = 0
+                r = medir(cliente, concorrencia)
+                print(
+                    f"{nome:>24} | {concorrencia:>5} | {r['req_por_s']:>8.1f} | {r['p50_ms']:>8.2f} | "
+                    f"{r['p95_ms']:>8.2f} | {server.conexoes:>8}"
+                )
+                if http_client is not None and concorrencia == args.concorrencia[-1]:
+                    stats = pool_stats(http_client)
+                    print(f"{'':>24}   pool: {stats}")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,297 @@
+"""
+Benchmark ponta a ponta do pipeline de contratos.
+
+Mede, com alunos/cursos/turmas sintéticos e planos de 1 a 36 parcelas:
+  generate_docx, _inject_payment_tables, convert_docx_to_pdf,
+  create_signature_stamp, apply_stamp_to_pdf e StorageService.upload_minuta
+(este último contra um servidor HTTP local que imita o Storage do Supabase).
+
+Relata p50/p95/p99 por etapa, vazão do pipeline completo em vários níveis de
+concorrência e pico de RSS. O resultado vai para um JSON, para comparar commits.
+
+Uso (na raiz do projeto):
+    python -m benchmarks.bench_pipeline
+    python -m benchmarks.bench_pipeline --engine reportlab --iteracoes 30 --concorrencia 1 2 4 8
+    python -m benchmarks.bench_pipeline --comparar benchmarks/results/anterior.json
+"""
+import io
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import platform
+import argparse
+import resource
+import threading
+import subprocess
+from datetime import date, datetime
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from supabase import create_client
+from src.document_engine.processor import ContractProcessor
+from src.document_engine.pdf_converter import PDFManager, ENGINE_LIBREOFFICE, ENGINE_REPORTLAB
+from src.document_engine.contract_builder import (
+    calcular_valores, parcelas_entrada, parcelas_saldo, tabelas_pdf, montar_contexto
+)
+import src.utils.storage as storage
+from src.utils.storage import StorageService
+
+TEMPLATE = "assets/modelo_contrato_V2.docx"
+PARCELAS = (1, 6, 12, 24, 36)
+RESULTADOS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+NOMES = ["Ana", "João", "Márcia", "Luís", "Beatriz", "Conceição", "Otávio", "Íris", "Caio", "Fernanda"]
+SOBRENOMES = ["Araújo", "Gonçalves", "Silva", "Pereira", "Simões", "Magalhães", "Brandão", "Souza"]
+CURSOS = ["Pós-Graduação em Dermatologia", "Medicina Estética Avançada", "Tricologia Clínica", "Nutrologia"]
+
+
+# --- Dados sintéticos ---
+
+def gerar_aluno(rnd: random.Random, i: int) -> dict:
+    return {
+        "id": f"00000000-0000-0000-0000-{i:012d}",
+        "nome_completo": f"{rnd.choice(NOMES)} {rnd.choice(SOBRENOMES)} {rnd.choice(SOBRENOMES)}",
+        "cpf": f"{rnd.randrange(10 ** 10, 10 ** 11):011d}", "rg": str(rnd.randrange(10 ** 9, 10 ** 10)),
+        "email": f"aluno{i}@example.com", "telefone": f"519{rnd.randrange(10 ** 7, 10 ** 8)}",
+        "data_nascimento": f"{rnd.randint(1960, 2000)}-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d}",
+        "estado_civil": rnd.choice(["Solteiro(a)", "Casado(a)", "Divorciado(a)"]),
+        "logradouro": "Rua General Neto", "numero": str(rnd.randint(1, 3000)), "complemento": "",
+        "bairro": "Floresta", "cidade": "Porto Alegre", "uf": "RS", "cep": "90560-020",
+        "crm": str(rnd.randint(10000, 99999)),
+    }
+
+
+def gerar_caso(rnd: random.Random, i: int, qtd_saldo: int) -> dict:
+    """Um contrato completo: contexto do template + linhas das tabelas de pagamento."""
+    aluno = gerar_aluno(rnd, i)
+    curso = {"nome": rnd.choice(CURSOS), "valor_bruto": float(rnd.randrange(15000, 45000))}
+    turma = {"id": i, "codigo_turma": f"T{2027}-{i % 7:02d}", "formato": rnd.choice(["Digital", "Híbrido"]), "atendimento": "Sim"}
+    valores = calcular_valores(curso["valor_bruto"], rnd.choice([0, 5, 10, 12.5]))
+    entrada_total = round(valores["valor_final"] * 0.1, 2)
+    entrada = parcelas_entrada(entrada_total, rnd.randint(1, 3), date(2027, 1, 10), "PIX")
+    saldo = parcelas_saldo(round(valores["valor_final"] - entrada_total, 2), qtd_saldo, date(2027, 2, 10), "Boleto")
+    tbl_ent, tbl_sal = tabelas_pdf(entrada, saldo)
+    return {
+        "aluno": aluno, "curso": curso, "qtd_saldo": qtd_saldo,
+        "contexto": montar_contexto(aluno, curso, turma, valores, datetime(2027, 1, 5, 10, 0)),
+        "tbl_ent": tbl_ent, "tbl_sal": tbl_sal,
+    }
+
+
+# --- Stand-in local do Storage ---
+
+class _StorageHandler(BaseHTTPRequestHandler):
+    """Aceita uploads em /storage/v1/object/<bucket>/<path> e responde como o Supabase."""
+    latencia = 0.0
+
+    def _upload(self):
+        tamanho = int(self.headers.get("Content-Length") or 0)
+        self.rfile.read(tamanho)
+        if self.latencia:
+            time.sleep(self.latencia)
+        caminho = self.path.split("/storage/v1/object/", 1)[-1]
+        corpo = json.dumps({"Key": caminho, "Id": caminho}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    do_POST = _upload
+    do_PUT = _upload
+
+    def log_message(self, *args):
+        pass
+
+
+def iniciar_storage_local(latencia_ms: float) -> ThreadingHTTPServer:
+    _StorageHandler.latencia = latencia_ms / 1000
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StorageHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    storage.supabase = create_client(f"http://127.0.0.1:{server.server_address[1]}", "bench-key")
+    return server
+
+
+# --- Medição ---
+
+def percentis(amostras: list) -> dict:
+    ordenadas = sorted(amostras)
+
+    def p(q):
+        idx = min(len(ordenadas) - 1, max(0, int(round(q / 100 * len(ordenadas) + 0.5)) - 1))
+        return ordenadas[idx] * 1000
+
+    return {
+        "n": len(ordenadas), "media_ms": sum(ordenadas) / len(ordenadas) * 1000,
+        "p50_ms": p(50), "p95_ms": p(95), "p99_ms": p(99), "max_ms": ordenadas[-1] * 1000,
+    }
+
+
+def cronometrar(fn, *args):
+    inicio = time.perf_counter()
+    resultado = fn(*args)
+    return time.perf_counter() - inicio, resultado
+
+
+def pipeline(processor: ContractProcessor, caso: dict, engine: str, tempos: dict = None):
+    """Executa todas as etapas de um contrato, acumulando os tempos em `tempos` (se informado)."""
+    etapas = []
+
+    t, docx = cronometrar(processor.generate_docx, caso["contexto"], caso["tbl_ent"], caso["tbl_sal"])
+    etapas.append(("generate_docx", t))
+
+    t, _ = cronometrar(processor._inject_payment_tables, io.BytesIO(docx.getvalue()), caso["tbl_ent"], caso["tbl_sal"])
+    etapas.append(("_inject_payment_tables", t))
+
+    t, pdf = cronometrar(PDFManager.convert_docx_to_pdf, io.BytesIO(docx.getvalue()), engine)
+    if pdf is None:
+        raise RuntimeError(f"Conversão falhou no motor '{engine}'")
+    etapas.append(("convert_docx_to_pdf", t))
+
+    aluno = caso["aluno"]
+    t, carimbo = cronometrar(
+        PDFManager.create_signature_stamp, datetime(2027, 1, 6, 9, 30), aluno["nome_completo"],
+        aluno["cpf"], aluno["email"], "127.0.0.1", "https://example.com/Assinatura?token=x", "A" * 64
+    )
+    etapas.append(("create_signature_stamp", t))
+
+    t, _ = cronometrar(PDFManager.apply_stamp_to_pdf, io.BytesIO(pdf.getvalue()), carimbo)
+    etapas.append(("apply_stamp_to_pdf", t))
+
+    t, (url, erro) = cronometrar(StorageService.upload_minuta, io.BytesIO(pdf.getvalue()), aluno["nome_completo"], caso["curso"]["nome"])
+    if erro:
+        raise RuntimeError(f"Upload falhou: {erro}")
+    etapas.append(("upload_minuta", t))
+
+    if tempos is not None:
+        for nome, t in etapas:
+            tempos.setdefault(nome, []).append(t)
+            tempos.setdefault(f"{nome}@{caso['qtd_saldo']}", []).append(t)
+
+
+def medir_etapas(processor, casos: list, engine: str) -> dict:
+    pipeline(processor, casos[0], engine)  # aquecimento: template, fontes, pool do LibreOffice
+    tempos = {}
+    for caso in casos:
+        pipeline(processor, caso, engine, tempos)
+    return {nome: percentis(amostras) for nome, amostras in sorted(tempos.items())}
+
+
+def medir_vazao(processor, casos: list, engine: str, niveis: list) -> dict:
+    resultado = {}
+    for nivel in niveis:
+        latencias = []
+
+        def um(caso):
+            t, _ = cronometrar(pipeline, processor, caso, engine)
+            latencias.append(t)
+
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=nivel) as executor:
+            list(executor.map(um, casos))
+        total = time.perf_counter() - inicio
+        resultado[str(nivel)] = {"contratos_por_s": len(casos) / total, "duracao_s": total, **percentis(latencias)}
+    return resultado
+
+
+def pico_rss_mb() -> dict:
+    # ru_maxrss em KB no Linux (bytes no macOS)
+    fator = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return {
+        "processo_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / fator,
+        "filhos_mb": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / fator,
+    }
+
+
+def commit_atual() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return "desconhecido"
+
+
+# --- Relatório ---
+
+def imprimir(resultado: dict):
+    print(f"\ncommit {resultado['commit']} | motor {resultado['engine']} | {resultado['iteracoes']} contratos")
+    print(f"{'etapa':>32} | {'p50 (ms)':>9} | {'p95 (ms)':>9} | {'p99 (ms)':>9}")
+    for nome, s in resultado["etapas"].items():
+        if "@" not in nome:
+            print(f"{nome:>32} | {s['p50_ms']:>9.2f} | {s['p95_ms']:>9.2f} | {s['p99_ms']:>9.2f}")
+    print(f"\n{'concorrência':>12} | {'contratos/s':>11} | {'p95 (ms)':>9}")
+    for nivel, v in resultado["vazao"].items():
+        print(f"{nivel:>12} | {v['contratos_por_s']:>11.2f} | {v['p95_ms']:>9.1f}")
+    rss = resultado["pico_rss"]
+    print(f"\npico RSS: processo {rss['processo_mb']:.1f} MB | filhos {rss['filhos_mb']:.1f} MB")
+
+
+def comparar(atual: dict, anterior: dict):
+    print(f"\ncomparação com {anterior['commit']} (p50 / p95, razão atual/anterior)")
+    for nome, s in atual["etapas"].items():
+        base = anterior["etapas"].get(nome)
+        if "@" in nome or not base:
+            continue
+        print(f"{nome:>32} | {s['p50_ms'] / base['p50_ms']:>6.2f}x | {s['p95_ms'] / base['p95_ms']:>6.2f}x")
+    for nivel, v in atual["vazao"].items():
+        base = anterior["vazao"].get(nivel)
+        if base:
+            print(f"{'vazão c=' + nivel:>32} | {v['contratos_por_s'] / base['contratos_por_s']:>6.2f}x")
+
+
+def main():
+    motor_padrao = ENGINE_LIBREOFFICE if shutil.which("soffice") or shutil.which("libreoffice") else ENGINE_REPORTLAB
+    parser = argparse.ArgumentParser(description="Benchmark ponta a ponta do pipeline de contratos")
+    parser.add_argument("--engine", choices=[ENGINE_LIBREOFFICE, ENGINE_REPORTLAB], default=motor_padrao)
+    parser.add_argument("--iteracoes", type=int, default=20, help="Contratos por tamanho de plano")
+    parser.add_argument("--concorrencia", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--latencia-storage-ms", type=float, default=20.0, help="Latência simulada do upload")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--saida", default="", help="Arquivo JSON (padrão: benchmarks/results/<commit>-<data>.json)")
+    parser.add_argument("--comparar", default="", help="JSON de uma execução anterior")
+    args = parser.parse_args()
+
+    # Antes de carregar qualquer coisa: o fork do git não deve inflar o RSS dos filhos
+    commit = commit_atual()
+
+    rnd = random.Random(args.seed)
+    casos = [gerar_caso(rnd, i, qtd) for qtd in PARCELAS for i in range(args.iteracoes)]
+    rnd.shuffle(casos)
+
+    server = iniciar_storage_local(args.latencia_storage_ms)
+    processor = ContractProcessor(TEMPLATE)
+    try:
+        etapas = medir_etapas(processor, casos, args.engine)
+        vazao = medir_vazao(processor, casos, args.engine, args.concorrencia)
+    finally:
+        server.shutdown()
+
+    resultado = {
+        "commit": commit,
+        "data": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "cpus": os.cpu_count(),
+        "engine": args.engine,
+        "iteracoes": len(casos),
+        "parcelas": list(PARCELAS),
+        "latencia_storage_ms": args.latencia_storage_ms,
+        "etapas": etapas,
+        "vazao": vazao,
+        "pico_rss": pico_rss_mb(),
+    }
+
+    saida = args.saida or os.path.join(RESULTADOS_DIR, f"{resultado['commit']}-{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(saida)), exist_ok=True)
+    with open(saida, "w", encoding="utf-8") as f:
+        json.dump(resultado, f, indent=2, ensure_ascii=False)
+
+    imprimir(resultado)
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            comparar(resultado, json.load(f))
+    print(f"\nresultado salvo em {saida}")
+
+
+if __name__ == "__main__":
+    main()
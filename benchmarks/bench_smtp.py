@@ -0,0 +1,124 @@
+"""
+Benchmark e conferência do SMTPTransport contra um servidor SMTP local (aiosmtpd),
+sem provedor real:
+  - reuso: um lote inteiro numa única conexão, comparado a uma conexão por e-mail
+    (o envio anterior, um smtplib.SMTP + login por mensagem);
+  - NOOP: sessão ociosa há mais de `ocioso_max` é conferida antes do envio e reaproveitada;
+  - reconexão: conexão derrubada entre envios é refeita e a mensagem sai mesmo assim.
+
+Uso (na raiz do projeto, com `pip install aiosmtpd`):
+    python -m benchmarks.bench_smtp
+Sai com código 1 se alguma conferência falhar.
+"""
+import sys
+import time
+import socket
+import smtplib
+from src.utils.email_sender import SMTPTransport, montar_email_contrato
+
+try:
+    from aiosmtpd.controller import Controller
+    HAS_AIOSMTPD = True
+except ImportError:
+    HAS_AIOSMTPD = False
+
+MENSAGENS = 50
+REMETENTE = "secretaria@example.com"
+
+
+class Servidor:
+    """Handler do aiosmtpd: conta mensagens, sessões (conexões) e NOOPs recebidos."""
+
+    def __init__(self):
+        self.mensagens = 0
+        self.sessoes = set()
+        self.noops = 0
+
+    async def handle_DATA(self, server, session, envelope):
+        self.mensagens += 1
+        self.sessoes.add(id(session))
+        return "250 OK"
+
+    async def handle_NOOP(self, server, session, envelope, arg):
+        self.noops += 1
+        return "250 OK"
+
+
+def mensagens(qtd: int) -> list:
+    return [
+        montar_email_contrato(f"aluno{i}@example.com", f"Aluno {i}", f"https://example.com/Assinatura?token={i}",
+                              "Curso de Teste", REMETENTE)
+        for i in range(qtd)
+    ]
+
+
+def main():
+    if not HAS_AIOSMTPD:
+        print("aiosmtpd não instalado: pip install aiosmtpd")
+        sys.exit(2)
+
+    # Porta livre: o Controller do aiosmtpd não aceita port=0
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        host, port = s.getsockname()
+    servidor = Servidor()
+    controller = Controller(servidor, hostname=host, port=port)
+    controller.start()
+    falhas = []
+
+    def conferir(condicao: bool, descricao: str):
+        print(f"  [{'ok' if condicao else 'FALHOU'}] {descricao}")
+        if not condicao:
+            falhas.append(descricao)
+
+    try:
+        lote = mensagens(MENSAGENS)
+
+        # Uma conexão por mensagem (como antes do transporte compartilhado)
+        inicio = time.perf_counter()
+        for msg in lote:
+            with smtplib.SMTP(host, port, timeout=10) as server:
+                server.send_message(msg)
+        tempo_avulso = time.perf_counter() - inicio
+
+        print(f"\n=== Reuso da sessão ({MENSAGENS} mensagens)")
+        transporte = SMTPTransport(host, port, REMETENTE, starttls=False, ocioso_max=0.5)
+        servidor.mensagens, servidor.sessoes = 0, set()
+        inicio = time.perf_counter()
+        resultados = transporte.send_batch(lote)
+        tempo_sessao = time.perf_counter() - inicio
+        print(f"  uma conexão por e-mail: {tempo_avulso * 1000:8.1f} ms")
+        print(f"  sessão reaproveitada:   {tempo_sessao * 1000:8.1f} ms")
+        conferir(resultados.count(None) == MENSAGENS, f"{MENSAGENS} mensagens aceitas")
+        conferir(servidor.mensagens == MENSAGENS, "servidor recebeu todas")
+        conferir(transporte.conexoes == 1 and len(servidor.sessoes) == 1, "uma única conexão")
+
+        print("\n=== NOOP após ociosidade")
+        time.sleep(transporte.ocioso_max + 0.2)
+        noops = servidor.noops
+        transporte.send(lote[0])
+        conferir(servidor.noops == noops + 1, "sessão ociosa conferida com NOOP")
+        conferir(transporte.conexoes == 1, "sessão reaproveitada depois do NOOP")
+
+        print("\n=== Reconexão")
+        recebidas = servidor.mensagens
+        transporte._server.sock.shutdown(socket.SHUT_RDWR)  # conexão cai sem aviso
+        transporte.send(lote[0])
+        conferir(transporte.conexoes == 2, "nova conexão aberta")
+        conferir(servidor.mensagens == recebidas + 1, "mensagem entregue após reconectar")
+
+        time.sleep(transporte.ocioso_max + 0.2)
+        transporte._server.sock.shutdown(socket.SHUT_RDWR)  # cai durante a ociosidade
+        transporte.send(lote[0])
+        conferir(transporte.conexoes == 3, "NOOP sem resposta leva a nova conexão")
+        conferir(servidor.mensagens == recebidas + 2, "mensagem entregue após o NOOP falhar")
+        transporte.close()
+    finally:
+        controller.stop()
+
+    print(f"\n{len(falhas)} falha(s)." if falhas else "\nTudo certo.")
+    sys.exit(1 if falhas else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Benchmark do carimbo de assinatura: merge_page + reescrita completa
+versus Form XObject único anexado por atualização incremental.
+
+Uso (na raiz do projeto):
+    python -m benchmarks.bench_stamp
+"""
+import io
+import timeit
+import tracemalloc
+from datetime import datetime
+from pypdf import PdfReader
+from reportlab.pdfgen import canvas
+from reportlab.lib.pagesizes import A4
+from src.document_engine.pdf_converter import PDFManager
+
+PAGINAS = (2, 10, 50)
+REPETICOES = 10
+
+
+def gerar_pdf(paginas: int) -> bytes:
+    """PDF sintético com texto corrido, no tamanho de página do contrato."""
+    buf = io.BytesIO()
+    can = canvas.Canvas(buf, pagesize=A4)
+    for p in range(paginas):
+        can.setFont("Helvetica", 10)
+        for linha in range(60):
+            can.drawString(50, 800 - linha * 12, f"Página {p + 1} - Cláusula {linha + 1}: texto do contrato " * 2)
+        can.showPage()
+    can.save()
+    return buf.getvalue()
+
+
+def gerar_carimbo() -> io.BytesIO:
+    return PDFManager.create_signature_stamp(
+        data_assinatura=datetime(2026, 1, 1, 12, 0, 0), nome_aluno="ALUNO BENCHMARK",
+        cpf="000.000.000-00", email="aluno@example.com", ip="127.0.0.1",
+        link="https://example.com/Assinatura?token=x", hash_auth="A" * 64
+    )
+
+
+def medir(original: bytes, incremental: bool):
+    def rodar():
+        return PDFManager.apply_stamp_to_pdf(io.BytesIO(original), gerar_carimbo(), incremental=incremental)
+
+    tempo = timeit.timeit(rodar, number=REPETICOES) / REPETICOES
+    tracemalloc.start()
+    resultado = rodar().getvalue()
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return tempo, pico, resultado
+
+
+def main():
+    print(f"{'páginas':>7} | {'modo':>11} | {'tempo (ms)':>10} | {'pico mem (KB)':>13} | {'tamanho (KB)':>12} | original intacto")
+    for paginas in PAGINAS:
+        original = gerar_pdf(paginas)
+        for incremental in (False, True):
+            tempo, pico, resultado = medir(original, incremental)
+
+            # Sanidade: o carimbo precisa estar em todas as páginas
+            leitor = PdfReader(io.BytesIO(resultado))
+            assert all("ACEITE DIGITAL REALIZADO" in p.extract_text() for p in leitor.pages)
+
+            print(
+                f"{paginas:>7} | {'incremental' if incremental else 'merge_page':>11} | {tempo * 1000:>10.2f} | "
+                f"{pico / 1024:>13.0f} | {len(resultado) / 1024:>12.1f} | "
+                f"{PDFManager.original_preservado(original, resultado)}"
+            )
+
+
+if __name__ == "__main__":
+    main()
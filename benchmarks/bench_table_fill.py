@@ -0,0 +1,72 @@
+"""
+Micro-benchmark do preenchimento das tabelas de pagamento.
+
+Compara o preenchimento antigo (add_row + proxies python-docx por célula)
+com o clone em bloco do protótipo <w:tr> em ContractProcessor._fill_table_rows.
+
+Uso (na raiz do projeto):
+    python -m benchmarks.bench_table_fill
+"""
+import copy
+import timeit
+from docx.shared import Pt
+from docx.enum.text import WD_ALIGN_PARAGRAPH
+from src.document_engine.processor import ContractProcessor
+from src.document_engine.template_cache import template_registry
+
+TEMPLATE = "assets/modelo_contrato_V2.docx"
+TAMANHOS = (1, 12, 36)
+REPETICOES = 50
+
+
+def fill_proxy(table, data_rows: list):
+    """Implementação anterior, mantida aqui apenas como referência de medição."""
+    while len(table.rows) > 1:
+        table._element.remove(table.rows[-1]._element)
+
+    for item in data_rows:
+        row = table.add_row()
+        for i, texto in enumerate(ContractProcessor._row_values(item)):
+            cell = row.cells[i]
+            paragraph = cell.paragraphs[0]
+            paragraph.clear()
+            run = paragraph.add_run(texto)
+            run.font.name = 'Arial'
+            run.font.size = Pt(10)
+            paragraph.alignment = WD_ALIGN_PARAGRAPH.CENTER
+
+
+def gerar_parcelas(qtd: int) -> list:
+    return [
+        {"n": f"{i + 1}/{qtd}", "vencimento": f"{(i % 28) + 1:02d}/03/2027", "valor": "R$ 1.234,56", "forma": "Boleto"}
+        for i in range(qtd)
+    ]
+
+
+def tabela_saldo(doc):
+    tabelas = [t for t in doc.tables if len(t.rows[0].cells) > 1 and "VENCIMENTO" in t.rows[0].cells[1].text.upper()]
+    return tabelas[1]
+
+
+def main():
+    processor = ContractProcessor(TEMPLATE)
+    base = template_registry.get(TEMPLATE).document
+
+    print(f"{'linhas':>6} | {'proxy (ms)':>10} | {'protótipo (ms)':>14} | {'speedup':>7}")
+    for qtd in TAMANHOS:
+        parcelas = gerar_parcelas(qtd)
+
+        # Sanidade: os dois caminhos devem gerar o mesmo XML
+        doc_a, doc_b = copy.deepcopy(base), copy.deepcopy(base)
+        fill_proxy(tabela_saldo(doc_a), parcelas)
+        processor._fill_table_rows(tabela_saldo(doc_b), parcelas)
+        assert tabela_saldo(doc_a)._tbl.xml == tabela_saldo(doc_b)._tbl.xml
+
+        tabela = tabela_saldo(copy.deepcopy(base))
+        t_proxy = timeit.timeit(lambda: fill_proxy(tabela, parcelas), number=REPETICOES) / REPETICOES
+        t_proto = timeit.timeit(lambda: processor._fill_table_rows(tabela, parcelas), number=REPETICOES) / REPETICOES
+        print(f"{qtd:>6} | {t_proxy * 1000:>10.3f} | {t_proto * 1000:>14.3f} | {t_proxy / t_proto:>6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,25 +4,21 @@ from datetime import date, datetime
 from dateutil.relativedelta import relativedelta
 
 # --- IMPORTAÇÕES DO PROJETO ---
-from src.database.repo_alunos import AlunoRepository
-from src.database.repo_cursos import CursoRepository
+from src.database.repo_alunos import AsyncAlunoRepository
+from src.database.repo_cursos import CursoRepository, AsyncCursoRepository
+from src.database.async_connection import em_paralelo, ou_padrao
+from src.database.projections import GERACAO
 from src.database.repo_contratos import ContratoRepository
-from src.utils.formatters import format_currency, format_cpf, format_date_br
-from src.document_engine.processor import ContractProcessor
-from src.document_engine.pdf_converter import PDFManager
-from src.utils.storage import StorageService
-from src.utils.email_sender import enviar_email_contrato
+from src.utils.formatters import format_currency, format_cpf, format_envio_email
+from src.services.job_queue import get_job_queue
+from src.services.job_worker import start_workers
+from src.document_engine.contract_builder import (
+    calcular_valores, parcelas_saldo, tabelas_pdf, montar_contexto, montar_registro_contrato, montar_parcelas
+)
 
 # URL de Produção
 BASE_URL = "https://nexusmed-contratos.streamlit.app" 
-
-def obter_mes_extenso(dt):
-    meses = {
-        1: "Janeiro", 2: "Fevereiro", 3: "Março", 4: "Abril",
-        5: "Maio", 6: "Junho", 7: "Julho", 8: "Agosto",
-        9: "Setembro", 10: "Outubro", 11: "Novembro", 12: "Dezembro"
-    }
-    return meses[dt.month]
+TEMPLATE_CONTRATO = "assets/modelo_contrato_V2.docx"
 
 # Proteção de Acesso
 if not st.session_state.get("authenticated"):
@@ -52,8 +48,56 @@ def recalcular_parcelas_entrada():
                         st.session_state[key_prox] = max(0.0, val_prox_final)
                     break
 
+@st.fragment(run_every=2)
+def acompanhar_job(job_id: int):
+    """Consulta o status do job sem bloquear a sessão; recarrega a página ao terminar."""
+    job = get_job_queue().get(job_id)
+    if job is None:
+        st.error("Job de geração não encontrado.")
+        return
+    if job['status'] in ('concluido', 'falhou'):
+        st.rerun()
+
+    rotulos = {'pendente': "⏳ Na fila", 'processando': "⚙️ Gerando contrato"}
+    st.info(f"{rotulos.get(job['status'], job['status'])}... (tentativa {max(1, job['tentativas'])} de {job['max_tentativas']})")
+    if job['erro']:
+        st.caption(f"Última falha: {job['erro']}. Nova tentativa agendada automaticamente.")
+    st.caption("Você pode sair desta página: a geração continua em segundo plano.")
+
+def status_email(job: dict):
+    """Situação do e-mail do contrato na fila de envio."""
+    if job['status'] == 'concluido':
+        st.success(f"📧 Link enviado para {job['resultado']['destinatario']} em {job['resultado']['enviado_em']}.")
+    elif job['status'] == 'falhou':
+        st.error(f"❌ E-mail não enviado após {job['tentativas']} tentativas: {job['erro']}")
+    else:
+        rotulos = {'pendente': "⏳ E-mail na fila", 'processando': "📤 Enviando e-mail"}
+        st.info(f"{rotulos.get(job['status'], job['status'])}... (tentativa {max(1, job['tentativas'])} de {job['max_tentativas']})")
+        if job['erro']:
+            st.caption(f"Última falha: {job['erro']}. Nova tentativa agendada automaticamente.")
+
+def status_envio(envio: dict):
+    """Situação do e-mail gravada no contrato: vale também fora da sessão que pediu o envio."""
+    if envio.get('email_status') == 'enviado':
+        st.success(f"📧 {format_envio_email(envio)} para {envio['email_destinatario']}.")
+    elif envio.get('email_status') == 'falhou':
+        st.error(format_envio_email(envio))
+    elif envio.get('email_status') == 'na_fila':
+        st.info("⏳ E-mail na fila de envio.")
+
+@st.fragment(run_every=2)
+def acompanhar_email(job_id: int):
+    """Acompanha o envio em segundo plano; recarrega a página quando o e-mail sai (ou desiste)."""
+    job = get_job_queue().get(job_id)
+    if job is None:
+        return
+    if job['status'] in ('concluido', 'falhou'):
+        st.rerun()
+    status_email(job)
+
 def main():
     st.title("📄 Gerador de Contratos")
+    start_workers()
     
     if "step" not in st.session_state: st.session_state.step = 1
     if "form_data" not in st.session_state: st.session_state.form_data = {}
@@ -64,16 +108,23 @@ def main():
         st.subheader("Etapa 1: Selecionar Aluno")
         busca = st.text_input("Buscar Aluno por Nome ou CPF")
         if busca:
-            alunos = AlunoRepository.buscar_por_cpf(busca) if any(c.isdigit() for c in busca) else AlunoRepository.filtrar_por_nome(busca)
+            # Junto com a busca, já aquece o cache do catálogo usado na etapa 2
+            alunos, _ = em_paralelo(
+                AsyncAlunoRepository.buscar(busca, limite=10, perfil=GERACAO),
+                AsyncCursoRepository.listar_todos_com_turmas(),
+            )
+            alunos = ou_padrao(alunos, [], "busca de alunos")
             if alunos:
-                for a in (alunos if isinstance(alunos, list) else [alunos]):
+                for a in alunos:
                     with st.container(border=True):
                         c1, c2 = st.columns([3, 1])
-                        c1.markdown(f"**{a.get('nome_completo')}**")
+                        c1.markdown(f"**{a.get('nome_completo')}**  \nCPF: {format_cpf(a.get('cpf', ''))}")
                         if c2.button("Selecionar", key=f"sel_{a['id']}"):
                             st.session_state.form_data['aluno'] = a
                             st.session_state.step = 2
                             st.rerun()
+            else:
+                st.info("Nenhum aluno encontrado.")
 
     # --- PASSO 2: CURSO E TURMA ---
     elif st.session_state.step == 2:
@@ -103,18 +154,13 @@ def main():
         
         # 1. CÁLCULOS BASE
         valor_bruto = float(curso.get('valor_bruto', 0))
-        valor_material_calc = round(valor_bruto * 0.30, 2)
         
         st.info(f"💰 **Valor Bruto do Curso:** {format_currency(valor_bruto)}")
         
         percent_desc = st.number_input("Desconto Comercial (%)", 0.0, 100.0, 0.0, step=0.5)
         
-        # --- CORREÇÃO DO ERRO ---
-        # Criamos a variável com o nome que o restante do código espera
-        percentual_desconto = percent_desc 
-        
-        v_desconto = round(valor_bruto * (percent_desc / 100), 2)
-        v_final = round(valor_bruto - v_desconto, 2)
+        valores = calcular_valores(valor_bruto, percent_desc)
+        v_final = valores['valor_final']
         
         st.success(f"### Valor Final: {format_currency(v_final)}")
 
@@ -163,124 +209,63 @@ def main():
             d_saldo_ini = cs2.date_input("1º Vencimento Saldo", date.today() + relativedelta(months=1))
             f_saldo = cs3.selectbox("Forma Saldo", ["Boleto", "Cartão de Crédito", "PIX"])
             
-            v_base_saldo = round(saldo_restante / q_saldo, 2)
-            acc_saldo = 0
-            
-            for i in range(q_saldo):
-                vp = round(saldo_restante - acc_saldo, 2) if i == q_saldo - 1 else v_base_saldo
-                acc_saldo += vp
-                dt = d_saldo_ini + relativedelta(months=i)
-                lista_saldo.append({
-                    "Parcela": f"{i+1}/{q_saldo}", 
-                    "Vencimento": dt.strftime("%d/%m/%Y"), 
-                    "Valor": format_currency(vp), 
-                    "Forma": f_saldo, 
-                    "valor_num": vp
-                })
+            lista_saldo = parcelas_saldo(saldo_restante, q_saldo, d_saldo_ini, f_saldo)
             
             with st.expander("Ver Tabela de Saldo"):
                 st.dataframe(lista_saldo)
 
-        # 4. GERAR CONTRATO
+        # 4. GERAR CONTRATO (enfileirado: render, PDF, upload e insert rodam nos workers)
         if st.button("🚀 Gerar e Sincronizar com Servidor", type="primary", use_container_width=True):
-            with st.spinner("Processando..."):
-                try:
-                    token = str(uuid.uuid4())
-                    agora = datetime.now()
-                    
-                    def fmt(val, default=""): return str(val) if val is not None and str(val).strip() != "" else default
-
-                    # CONTEXTO
-                    ctx_doc = {
-                        'nome': fmt(aluno.get('nome_completo')).upper(),
-                        'cpf': format_cpf(fmt(aluno.get('cpf'))),
-                        'rg': fmt(aluno.get('rg'), "___________"),
-                        'orgao_emissor': fmt(aluno.get('orgao_emissor'), "SSP/RS"),
-                        'data_nascimento': format_date_br(aluno.get('data_nascimento')),
-                        'estado_civil': fmt(aluno.get('estado_civil'), "Solteiro(a)"),
-                        'nacionalidade': fmt(aluno.get('nacionalidade'), "Brasileira"),
-                        'email': fmt(aluno.get('email')),
-                        'telefone': fmt(aluno.get('telefone')),
-                        'celular': fmt(aluno.get('telefone')),
-                        'logradouro': fmt(aluno.get('logradouro')), 
-                        'endereco': fmt(aluno.get('logradouro')), 
-                        'numero': fmt(aluno.get('numero')),
-                        'complemento': fmt(aluno.get('complemento')),
-                        'bairro': fmt(aluno.get('bairro')),
-                        'cidade': fmt(aluno.get('cidade')),
-                        'uf': fmt(aluno.get('uf')), 
-                        'estado': fmt(aluno.get('uf')), 
-                        'cep': fmt(aluno.get('cep')),
-                        'crm': fmt(aluno.get('crm'), "___________"),
-                        'area_formacao': fmt(aluno.get('especialidade'), "Médica"),
-                        'curso': fmt(curso.get('nome')),
-                        'pos_graduacao': fmt(curso.get('nome')),
-                        'codigo_turma': fmt(dados_turma.get('codigo_turma')),
-                        'turma': fmt(dados_turma.get('codigo_turma')),
-                        'formato_curso': fmt(dados_turma.get('formato'), "Digital"),
-                        'atendimento': fmt(dados_turma.get('atendimento'), "Sim"),
-                        'valor_curso': format_currency(valor_bruto).replace("R$", "").strip(),
-                        'valor_bruto': format_currency(valor_bruto).replace("R$", "").strip(),
-                        'percentual_desconto': str(percentual_desconto).replace(".", ","), # Agora funciona
-                        'valor_desconto': format_currency(v_desconto).replace("R$", "").strip(),
-                        'valor_final': format_currency(v_final).replace("R$", "").strip(),
-                        'valor_material': format_currency(valor_material_calc).replace("R$", "").strip(),
-                        'bolsista': "SIM" if percentual_desconto > 0 else "NÃO",
-                        'dia': str(agora.day), 
-                        'mês': obter_mes_extenso(agora).lower(), 
-                        'ano': str(agora.year),
-                        'data_atual': format_date_br(agora)
-                    }
-
-                    tbl_ent_pdf = [{"n": str(p["numero"]), "vencimento": p["data"], "valor": p["valor"], "forma": p["forma"]} for p in lista_entrada]
-                    tbl_sal_pdf = [{"n": p["Parcela"], "vencimento": p["Vencimento"], "valor": p["Valor"], "forma": p["Forma"]} for p in lista_saldo]
-
-                    processor = ContractProcessor("assets/modelo_contrato_V2.docx")
-                    docx_buffer = processor.generate_docx(ctx_doc, tbl_ent_pdf, tbl_sal_pdf) 
-                    pdf_buffer = PDFManager.convert_docx_to_pdf(docx_buffer)
-                    
-                    url_pdf, erro_upload = StorageService.upload_minuta(pdf_buffer, aluno['nome_completo'], curso['nome'])
-                    if erro_upload: raise Exception(f"Erro Upload: {erro_upload}")
+            try:
+                token = str(uuid.uuid4())
+                agora = datetime.now()
+                
+                ctx_doc = montar_contexto(aluno, curso, dados_turma, valores, agora)
+                tbl_ent_pdf, tbl_sal_pdf = tabelas_pdf(lista_entrada, lista_saldo)
 
-                    forma_ent_db = lista_entrada[0]['forma'] if lista_entrada else "N/A"
-                    forma_sal_db = f_saldo if 'f_saldo' in locals() else "N/A"
+                dados_db = montar_registro_contrato(
+                    aluno, dados_turma, valores, v_entrada_total, q_entrada,
+                    lista_entrada, lista_saldo, token, None, agora
+                )
 
-                    dados_db = {
-                        "aluno_id": aluno['id'],
-                        "turma_id": int(dados_turma['id']),
-                        "valor_curso": float(valor_bruto),
-                        "valor_desconto": float(v_desconto),
-                        "percentual_desconto": float(percentual_desconto),
-                        "valor_final": float(v_final),
-                        "valor_material": float(valor_material_calc),
-                        "bolsista": True if percentual_desconto > 0 else False,
-                        "atendimento_paciente": True if dados_turma.get('atendimento') == 'Sim' else False,
-                        "entrada_valor": float(v_entrada_total),
-                        "entrada_qtd_parcelas": int(q_entrada),
-                        "saldo_valor": float(saldo_restante),
-                        "saldo_qtd_parcelas": int(q_saldo),
-                        "token_acesso": token,
-                        "status": "Pendente",
-                        "caminho_arquivo": url_pdf,
-                        "formato_curso": dados_turma.get('formato', 'Digital'),
-                        "entrada_forma_pagamento": forma_ent_db,
-                        "saldo_forma_pagamento": forma_sal_db,
-                        "created_at": agora.isoformat()
-                    }
-                    
-                    res = ContratoRepository.criar_contrato(dados_db)
-                    if res and isinstance(res, dict) and 'error' in res: raise Exception(res['error'])
+                job_id = get_job_queue().enqueue("gerar_contrato", {
+                    "template_path": TEMPLATE_CONTRATO,
+                    "ctx_doc": ctx_doc,
+                    "tbl_ent": tbl_ent_pdf,
+                    "tbl_sal": tbl_sal_pdf,
+                    "nome_aluno": aluno['nome_completo'],
+                    "nome_curso": curso['nome'],
+                    "dados_db": dados_db,
+                    "parcelas": montar_parcelas(lista_entrada, lista_saldo)
+                })
 
-                    st.session_state.url_pdf_oficial = url_pdf
-                    st.session_state.ultimo_token = token
-                    st.session_state.step = 4
-                    st.rerun()
+                st.session_state.job_id = job_id
+                st.session_state.email_job_id = None
+                st.session_state.url_pdf_oficial = None
+                st.session_state.ultimo_token = token
+                st.session_state.step = 4
+                st.rerun()
 
-                except Exception as e:
-                    st.error(f"❌ Erro Crítico: {e}")
+            except Exception as e:
+                st.error(f"❌ Erro Crítico: {e}")
 
     # --- PASSO 4: AUDITORIA E ENVIO ---
     elif st.session_state.step == 4:
+        job_id = st.session_state.get('job_id')
+        if job_id and not st.session_state.get('url_pdf_oficial'):
+            job = get_job_queue().get(job_id)
+            if job and job['status'] == 'concluido':
+                st.session_state.url_pdf_oficial = job['resultado']['url_pdf']
+            elif job and job['status'] == 'falhou':
+                st.error(f"❌ Falha ao gerar o contrato após {job['tentativas']} tentativas: {job['erro']}")
+                if st.button("⬅️ Voltar ao Financeiro"):
+                    st.session_state.step = 3
+                    st.rerun()
+                return
+            else:
+                acompanhar_job(job_id)
+                return
+
         st.success("✅ Contrato Gerado e Salvo com Sucesso!")
         url_oficial = st.session_state.get('url_pdf_oficial')
         token = st.session_state.ultimo_token
@@ -296,20 +281,34 @@ def main():
             if url_oficial:
                 c1.link_button("📥 Baixar PDF Oficial (Bucket)", url_oficial, use_container_width=True)
             
-            if c2.button("📧 Enviar para Aluno", type="primary", use_container_width=True):
-                with st.spinner("Enviando e-mail..."):
-                    try:
-                        sucesso = enviar_email_contrato(
-                            aluno['email'], 
-                            aluno['nome_completo'], 
-                            link_assinatura, 
-                            curso['nome']
-                        )
-                        if sucesso:
-                            st.toast("E-mail disparado!", icon="✅")
-                            st.success(f"Link enviado para: {aluno['email']}")
-                    except Exception as e: 
-                        st.error(f"Erro no envio: {e}")
+            # O envio vai para a fila (outbox) e é feito pelos workers, com novas tentativas em caso de falha
+            email_job_id = st.session_state.get('email_job_id')
+            job_email = get_job_queue().get(email_job_id) if email_job_id else None
+            envio = None
+            if job_email is None or job_email['status'] in ('concluido', 'falhou'):
+                envio = ContratoRepository.situacao_emails([token]).get(token) or {}
+            ja_enviado = email_job_id or (envio or {}).get('email_status')
+            rotulo = "📧 Reenviar para Aluno" if ja_enviado else "📧 Enviar para Aluno"
+            if c2.button(rotulo, type="primary", use_container_width=True):
+                # Situação gravada no contrato antes de enfileirar: o worker só grava depois
+                ContratoRepository.marcar_email_na_fila([token])
+                email_job_id = get_job_queue().enqueue("enviar_email", {
+                    "email": aluno['email'],
+                    "nome_aluno": aluno['nome_completo'],
+                    "link_assinatura": link_assinatura,
+                    "nome_curso": curso['nome'],
+                    "token": token
+                })
+                st.session_state.email_job_id = email_job_id
+                st.toast("E-mail na fila de envio.", icon="📨")
+                job_email, envio = get_job_queue().get(email_job_id), None
+
+            if envio is None:
+                acompanhar_email(email_job_id)
+            elif job_email is None or envio.get('email_status') in ('enviado', 'falhou'):
+                status_envio(envio)
+            else:
+                status_email(job_email)  # job terminou, mas o resultado não chegou ao contrato
 
             st.divider()
             st.text("Link direto de assinatura (copie se o e-mail falhar):")
@@ -318,6 +317,8 @@ def main():
         if st.button("⬅️ Iniciar Novo Contrato"):
             st.session_state.step = 1
             st.session_state.url_pdf_oficial = None
+            st.session_state.job_id = None
+            st.session_state.email_job_id = None
             st.rerun()
 
 if __name__ == "__main__":
@@ -2,6 +2,8 @@ import streamlit as st
 import time
 from datetime import date, datetime
 from src.database.repo_alunos import AlunoRepository
+from src.database.projections import LISTA
+from src.services.student_import import StudentImporter, COLUNAS, OBRIGATORIAS
 from src.utils.formatters import format_cpf, format_phone
 
 # Proteção de Acesso
@@ -12,6 +14,7 @@ if not st.session_state.get("authenticated"):
 # Listas Auxiliares
 LISTA_ESTADOS = ["AC", "AL", "AP", "AM", "BA", "CE", "DF", "ES", "GO", "MA", "MT", "MS", "MG", "PA", "PB", "PR", "PE", "PI", "RJ", "RN", "RS", "RO", "RR", "SC", "SP", "SE", "TO"]
 LISTA_ESTADO_CIVIL = ["Solteiro(a)", "Casado(a)", "Divorciado(a)", "Viúvo(a)", "União Estável"]
+TAMANHOS_PAGINA = [10, 25, 50, 100]
 
 def formatar_data_br(data_iso):
     if not data_iso: return "-"
@@ -20,111 +23,212 @@ def formatar_data_br(data_iso):
     except:
         return data_iso
 
+def exibir_detalhes(aluno_id: str):
+    aluno = AlunoRepository.buscar_por_id(aluno_id)
+    if not aluno:
+        st.warning("Não foi possível carregar os dados deste aluno.")
+        return
+    nome = aluno.get('nome_completo') or "Nome não informado"
+
+    # --- FORÇANDO FORMATO VERTICAL COM MARKDOWN ---
+
+    st.markdown("### 📄 Dados Pessoais")
+    st.markdown(f"**Nascimento:** \n{formatar_data_br(aluno.get('data_nascimento'))}")
+    st.markdown(f"**Nacionalidade:** \n{aluno.get('nacionalidade', '-')}")
+    st.markdown(f"**Estado Civil:** \n{aluno.get('estado_civil', '-')}")
+    st.markdown(f"**Email:** \n{aluno.get('email', '-')}")
+    st.markdown(f"**Telefone:** \n{format_phone(aluno.get('telefone', ''))}")
+
+    st.markdown("---")
+
+    st.markdown("### 📍 Endereço")
+    st.markdown(f"**Logradouro:** \n{aluno.get('logradouro', '-')}, {aluno.get('numero', '-')}")
+    st.markdown(f"**Complemento:** \n{aluno.get('complemento', '-')}")
+    st.markdown(f"**Bairro:** \n{aluno.get('bairro', '-')}")
+    st.markdown(f"**Cidade:** \n{aluno.get('cidade', '-')}")
+    st.markdown(f"**UF:** \n{aluno.get('uf', '-')}")
+    st.markdown(f"**CEP:** \n{aluno.get('cep', '-')}")
+
+    st.markdown("---")
+
+    st.markdown("### 💼 Dados Profissionais")
+    st.markdown(f"**CRM:** \n{aluno.get('crm', '-')}")
+    st.markdown(f"**Área de Formação:** \n{aluno.get('area_formacao', '-')}")
+
+    st.write("")
+
+    # Botão de Edição (Pop-over): o formulário só é montado quando aberto
+    with st.popover("✏️ Editar Cadastro Completo", use_container_width=True,
+                    key=f"pop_aluno_{aluno_id}", on_change="rerun") as pop:
+        if pop.open:
+            st.write(f"Editando: **{nome}**")
+            formulario_edicao(aluno)
+
+
+def formulario_edicao(aluno: dict):
+    with st.form(key=f"edit_form_{aluno.get('id')}"):
+        # Formulário também 100% Vertical
+        e_nome = st.text_input("Nome Completo", value=aluno.get('nome_completo', ''))
+        e_email = st.text_input("Email", value=aluno.get('email', ''))
+        e_tel = st.text_input("Telefone", value=aluno.get('telefone', ''))
+
+        try:
+            dt_at = datetime.fromisoformat(aluno.get('data_nascimento')).date() if aluno.get('data_nascimento') else None
+        except: dt_at = None
+        e_nasc = st.date_input("Nascimento", value=dt_at, min_value=date(1940, 1, 1))
+
+        e_nac = st.text_input("Nacionalidade", value=aluno.get('nacionalidade', 'Brasileira'))
+        civ_at = aluno.get('estado_civil', '')
+        idx_civ = LISTA_ESTADO_CIVIL.index(civ_at) if civ_at in LISTA_ESTADO_CIVIL else 0
+        e_civil = st.selectbox("Estado Civil", LISTA_ESTADO_CIVIL, index=idx_civ)
+
+        st.divider()
+        e_log = st.text_input("Logradouro", value=aluno.get('logradouro', ''))
+        e_num = st.text_input("Número", value=aluno.get('numero', ''))
+        e_comp = st.text_input("Complemento", value=aluno.get('complemento', ''))
+        e_bai = st.text_input("Bairro", value=aluno.get('bairro', ''))
+        e_cid = st.text_input("Cidade", value=aluno.get('cidade', ''))
+
+        uf_at = aluno.get('uf', '')
+        idx_uf = LISTA_ESTADOS.index(uf_at) if uf_at in LISTA_ESTADOS else 0
+        e_uf = st.selectbox("UF", LISTA_ESTADOS, index=idx_uf)
+
+        st.divider()
+        e_crm = st.text_input("CRM", value=aluno.get('crm', ''))
+        e_area = st.text_input("Área Formação", value=aluno.get('area_formacao', ''))
+
+        if st.form_submit_button("💾 Salvar Alterações"):
+            dados_up = {
+                "nome_completo": e_nome, "email": e_email, "telefone": e_tel,
+                "data_nascimento": e_nasc.isoformat(), "nacionalidade": e_nac,
+                "estado_civil": e_civil, "logradouro": e_log, "numero": e_num,
+                "complemento": e_comp, "bairro": e_bai, "cidade": e_cid,
+                "uf": e_uf, "crm": e_crm, "area_formacao": e_area
+            }
+            AlunoRepository.atualizar_aluno(aluno['id'], dados_up)
+            st.success("Atualizado!")
+            time.sleep(1)
+            st.rerun()
+
+
+def importar_planilha():
+    st.subheader("Importar Alunos (CSV ou XLSX)")
+    st.caption(
+        f"Colunas aceitas: {', '.join(COLUNAS)}. Obrigatórias: {', '.join(OBRIGATORIAS)}. "
+        "Alunos com CPF já cadastrado são atualizados com as colunas preenchidas no arquivo "
+        "(células vazias mantêm o valor atual)."
+    )
+    arquivo = st.file_uploader("Arquivo", type=["csv", "xlsx"], key="importacao_arquivo")
+    if not arquivo:
+        return
+
+    importador = StudentImporter()
+    conteudo = arquivo.getvalue()
+    arquivo_hash = importador.hash_arquivo(conteudo)
+    anterior = importador.progresso(arquivo_hash)
+
+    if anterior and anterior["concluido"]:
+        st.info(f"Este arquivo já foi importado ({anterior['importados']} aluno(s)).")
+        if st.button("Importar novamente"):
+            importador.descartar(arquivo_hash)
+            st.rerun()
+        exibir_erros_importacao(anterior["erros"])
+        return
+    if anterior:
+        st.warning(
+            f"Importação interrompida deste arquivo: {anterior['importados']} aluno(s) gravados "
+            f"até a linha {anterior['proxima_linha'] + 1}. Importar continua de onde parou."
+        )
+
+    if st.button("📥 Importar", type="primary"):
+        barra = st.progress(0.0, text="Importando...")
+        # Total aproximado só para a barra (no XLSX a contagem exigiria ler a planilha inteira antes)
+        total = max(1, conteudo.count(b"\n")) if not arquivo.name.lower().endswith(".xlsx") else None
+        inicio = time.perf_counter()
+        resultado = importador.importar(
+            conteudo, arquivo.name,
+            on_progress=lambda lidas, importados: barra.progress(
+                min(1.0, lidas / total) if total else 0.5, text=f"{importados} aluno(s) gravados ({lidas} linhas lidas)"
+            )
+        )
+        barra.empty()
+        duracao = time.perf_counter() - inicio
+        if resultado["concluido"]:
+            st.success(
+                f"✅ {resultado['importados']} aluno(s) importados em {duracao:.1f}s "
+                f"({resultado['requisicoes']} requisição(ões) ao banco)."
+            )
+        else:
+            st.error(
+                f"Importação interrompida: {resultado['erro_lote']}. {resultado['importados']} aluno(s) já gravados; "
+                "envie o mesmo arquivo e clique em Importar para continuar."
+            )
+        exibir_erros_importacao(resultado["erros"])
+
+def exibir_erros_importacao(erros: list):
+    if not erros:
+        return
+    st.warning(f"{len(erros)} linha(s) não importadas.")
+    st.dataframe(erros, hide_index=True, use_container_width=True)
+    csv_erros = "linha;cpf;motivo\n" + "\n".join(f"{e['linha']};{e['cpf']};{e['motivo']}" for e in erros)
+    st.download_button("Baixar erros (CSV)", csv_erros.encode("utf-8-sig"), "erros_importacao.csv", "text/csv")
+
+
 def main():
     st.title("👤 Gestão de Alunos")
     
-    tab_listar, tab_cadastrar = st.tabs(["Lista de Alunos", "Cadastrar Novo Aluno"])
+    tab_listar, tab_cadastrar, tab_importar = st.tabs(["Lista de Alunos", "Cadastrar Novo Aluno", "Importar Planilha"])
 
     # --- ABA 1: LISTA ---
     with tab_listar:
         st.subheader("Consultar Alunos")
-        termo_busca = st.text_input("Buscar por Nome ou CPF", placeholder="Digite aqui...")
-        
-        if st.button("🔍 Buscar Aluno", type="primary", use_container_width=True):
-            if termo_busca.isdigit():
-                alunos = AlunoRepository.buscar_por_cpf(termo_busca)
-            else:
-                alunos = AlunoRepository.filtrar_por_nome(termo_busca)
-        else:
-            alunos = AlunoRepository.listar_todos()
+        col_busca, col_tam = st.columns([4, 1])
+        termo_busca = col_busca.text_input("Buscar por Nome ou CPF", placeholder="Digite aqui e tecle Enter...")
+        tamanho = col_tam.selectbox("Por página", TAMANHOS_PAGINA, index=1)
+
+        # Pilha de cursores (nome_completo, id): o topo é o início da página atual.
+        # Mudou a busca ou o tamanho da página -> volta para a primeira página.
+        # O total é contado uma vez por busca, e não a cada página.
+        filtro = (termo_busca.strip(), tamanho)
+        if st.session_state.get("alunos_filtro") != filtro:
+            if st.session_state.get("alunos_filtro", (None,))[0] != filtro[0]:
+                st.session_state.alunos_total = AlunoRepository.contar(termo_busca)
+            st.session_state.alunos_filtro = filtro
+            st.session_state.alunos_cursores = [None]
+            st.session_state.alunos_posicao = [0]
+
+        cursores = st.session_state.alunos_cursores
+        posicoes = st.session_state.alunos_posicao
+        pagina = AlunoRepository.listar_pagina(tamanho, cursores[-1], termo_busca)
+        alunos = pagina["itens"]
+        # Cadastros e exclusões feitos depois da contagem não podem deixar a legenda incoerente
+        total = max(st.session_state.alunos_total, posicoes[-1] + len(alunos) + (1 if pagina["proximo"] else 0))
 
         st.divider()
 
-        if isinstance(alunos, list) and alunos:
-            st.caption(f"Encontrados: {len(alunos)} registros.")
-            
-            for aluno in alunos:
-                # Segurança contra dados malformados
-                if not isinstance(aluno, dict): continue
+        if alunos:
+            inicio = posicoes[-1] + 1
+            st.caption(f"Exibindo {inicio}–{inicio + len(alunos) - 1} de {total} registros.")
 
+            for aluno in alunos:
                 nome = aluno.get('nome_completo') or "Nome não informado"
                 cpf = format_cpf(aluno.get('cpf', ''))
-                
-                with st.expander(f"👤 {nome} | CPF: {cpf}"):
-                    
-                    # --- FORÇANDO FORMATO VERTICAL COM MARKDOWN ---
-                    
-                    st.markdown("### 📄 Dados Pessoais")
-                    st.markdown(f"**Nascimento:** \n{formatar_data_br(aluno.get('data_nascimento'))}")
-                    st.markdown(f"**Nacionalidade:** \n{aluno.get('nacionalidade', '-')}")
-                    st.markdown(f"**Estado Civil:** \n{aluno.get('estado_civil', '-')}")
-                    st.markdown(f"**Email:** \n{aluno.get('email', '-')}")
-                    st.markdown(f"**Telefone:** \n{format_phone(aluno.get('telefone', ''))}")
-
-                    st.markdown("---")
-                    
-                    st.markdown("### 📍 Endereço")
-                    st.markdown(f"**Logradouro:** \n{aluno.get('logradouro', '-')}, {aluno.get('numero', '-')}")
-                    st.markdown(f"**Complemento:** \n{aluno.get('complemento', '-')}")
-                    st.markdown(f"**Bairro:** \n{aluno.get('bairro', '-')}")
-                    st.markdown(f"**Cidade:** \n{aluno.get('cidade', '-')}")
-                    st.markdown(f"**UF:** \n{aluno.get('uf', '-')}")
-                    st.markdown(f"**CEP:** \n{aluno.get('cep', '-')}")
-
-                    st.markdown("---")
-                    
-                    st.markdown("### 💼 Dados Profissionais")
-                    st.markdown(f"**CRM:** \n{aluno.get('crm', '-')}")
-                    st.markdown(f"**Área de Formação:** \n{aluno.get('area_formacao', '-')}")
-                    
-                    st.write("") 
-
-                    # Botão de Edição (Pop-over)
-                    with st.popover("✏️ Editar Cadastro Completo", use_container_width=True):
-                        st.write(f"Editando: **{nome}**")
-                        with st.form(key=f"edit_form_{aluno.get('id')}"):
-                            # Formulário também 100% Vertical
-                            e_nome = st.text_input("Nome Completo", value=aluno.get('nome_completo', ''))
-                            e_email = st.text_input("Email", value=aluno.get('email', ''))
-                            e_tel = st.text_input("Telefone", value=aluno.get('telefone', ''))
-                            
-                            try:
-                                dt_at = datetime.fromisoformat(aluno.get('data_nascimento')).date() if aluno.get('data_nascimento') else None
-                            except: dt_at = None
-                            e_nasc = st.date_input("Nascimento", value=dt_at, min_value=date(1940, 1, 1))
-                            
-                            e_nac = st.text_input("Nacionalidade", value=aluno.get('nacionalidade', 'Brasileira'))
-                            civ_at = aluno.get('estado_civil', '')
-                            idx_civ = LISTA_ESTADO_CIVIL.index(civ_at) if civ_at in LISTA_ESTADO_CIVIL else 0
-                            e_civil = st.selectbox("Estado Civil", LISTA_ESTADO_CIVIL, index=idx_civ)
-
-                            st.divider()
-                            e_log = st.text_input("Logradouro", value=aluno.get('logradouro', ''))
-                            e_num = st.text_input("Número", value=aluno.get('numero', ''))
-                            e_comp = st.text_input("Complemento", value=aluno.get('complemento', ''))
-                            e_bai = st.text_input("Bairro", value=aluno.get('bairro', ''))
-                            e_cid = st.text_input("Cidade", value=aluno.get('cidade', ''))
-                            
-                            uf_at = aluno.get('uf', '')
-                            idx_uf = LISTA_ESTADOS.index(uf_at) if uf_at in LISTA_ESTADOS else 0
-                            e_uf = st.selectbox("UF", LISTA_ESTADOS, index=idx_uf)
-
-                            st.divider()
-                            e_crm = st.text_input("CRM", value=aluno.get('crm', ''))
-                            e_area = st.text_input("Área Formação", value=aluno.get('area_formacao', ''))
-
-                            if st.form_submit_button("💾 Salvar Alterações"):
-                                dados_up = {
-                                    "nome_completo": e_nome, "email": e_email, "telefone": e_tel,
-                                    "data_nascimento": e_nasc.isoformat(), "nacionalidade": e_nac,
-                                    "estado_civil": e_civil, "logradouro": e_log, "numero": e_num,
-                                    "complemento": e_comp, "bairro": e_bai, "cidade": e_cid,
-                                    "uf": e_uf, "crm": e_crm, "area_formacao": e_area
-                                }
-                                AlunoRepository.atualizar_aluno(aluno['id'], dados_up)
-                                st.success("Atualizado!")
-                                time.sleep(1)
-                                st.rerun()
+
+                # Detalhes e formulário só são montados (e buscados) com o expander aberto
+                with st.expander(f"👤 {nome} | CPF: {cpf}", key=f"exp_aluno_{aluno['id']}", on_change="rerun") as exp:
+                    if exp.open:
+                        exibir_detalhes(aluno['id'])
+
+            col_ant, col_pag, col_prox = st.columns([1, 2, 1])
+            if col_ant.button("⬅️ Anterior", disabled=len(cursores) == 1, use_container_width=True):
+                cursores.pop()
+                posicoes.pop()
+                st.rerun()
+            col_pag.caption(f"Página {len(cursores)} de {max(1, -(-total // tamanho))}")
+            if col_prox.button("Próxima ➡️", disabled=pagina["proximo"] is None, use_container_width=True):
+                cursores.append(pagina["proximo"])
+                posicoes.append(posicoes[-1] + len(alunos))
+                st.rerun()
         else:
             st.info("Nenhum aluno encontrado.")
 
@@ -134,7 +238,7 @@ def main():
         cpf_input = st.text_input("Informe o CPF para iniciar (Somente Números)", key="cadastro_cpf")
         
         if cpf_input:
-            existe = AlunoRepository.buscar_por_cpf(cpf_input)
+            existe = AlunoRepository.buscar_por_cpf(cpf_input, perfil=LISTA)
             if existe:
                 st.warning("⚠️ Aluno já cadastrado. Acesse a aba 'Lista de Alunos' para editar.")
             else:
@@ -174,5 +278,9 @@ def main():
                             time.sleep(1)
                             st.rerun()
 
+    # --- ABA 3: IMPORTAÇÃO EM MASSA ---
+    with tab_importar:
+        importar_planilha()
+
 if __name__ == "__main__":
     main()
@@ -1,7 +1,9 @@
 import streamlit as st
 import time  # <--- IMPORTANTE PARA O DELAY VISUAL
 from datetime import datetime
-from src.database.repo_cursos import CursoRepository
+from src.database.repo_cursos import CursoRepository, AsyncCursoRepository
+from src.database.async_connection import em_paralelo, ou_padrao
+from src.database.projections import LISTA
 from src.utils.formatters import format_currency
 
 # Verificação de Segurança (Proteção da página)
@@ -17,9 +19,15 @@ def main():
         "Cursos & Turmas Ativas", "Cadastrar Curso", "Abrir Nova Turma"
     ])
 
+    # As abas são renderizadas juntas: as duas leituras do catálogo vão ao banco ao mesmo tempo
+    cursos, cursos_ativos = em_paralelo(
+        AsyncCursoRepository.listar_todos_com_turmas(),
+        AsyncCursoRepository.listar_cursos_ativos(perfil=LISTA),
+    )
+
     # --- ABA: LISTAGEM ---
     with tab_lista:
-        cursos = CursoRepository.listar_todos_com_turmas()
+        cursos = ou_padrao(cursos, [], "listagem de cursos e turmas")
         if not cursos:
             st.info("Nenhum curso cadastrado no sistema.")
         else:
@@ -102,6 +110,12 @@ def main():
                     else:
                         st.caption("Nenhuma turma cadastrada.")
 
+        cache = CursoRepository.cache_stats()
+        st.caption(
+            f"Cache do catálogo: {cache['hit_rate']:.0%} de acertos "
+            f"({cache['hits']} leituras em cache / {cache['misses']} consultas ao banco)"
+        )
+
     # --- ABA: NOVO CURSO ---
     with tab_novo_curso:
         with st.form("form_curso", clear_on_submit=True):
@@ -130,7 +144,7 @@ def main():
 
     # --- ABA: NOVA TURMA ---
     with tab_nova_turma:
-        cursos_ativos = CursoRepository.listar_cursos_ativos()
+        cursos_ativos = ou_padrao(cursos_ativos, [], "listagem de cursos ativos")
         if not cursos_ativos:
             st.warning("Crie um curso antes de abrir uma turma.")
         else:
@@ -0,0 +1,239 @@
+import io
+import csv
+import streamlit as st
+from datetime import date
+from dateutil.relativedelta import relativedelta
+from src.database.repo_alunos import AlunoRepository, AsyncAlunoRepository
+from src.database.async_connection import em_paralelo, ou_padrao
+from src.database.repo_cursos import CursoRepository
+from src.database.repo_contratos import ContratoRepository
+from src.database.projections import LISTA, GERACAO
+from src.services.contract_batch import BatchContractGenerator, ETAPAS
+from src.utils.formatters import format_currency, format_cpf, format_envio_email
+from src.services.job_queue import get_job_queue
+from src.services.job_worker import start_workers
+
+BASE_URL = "https://nexusmed-contratos.streamlit.app"
+
+# Proteção de Acesso: geração em lote é restrita a administradores
+if not st.session_state.get("authenticated"):
+    st.error("Acesso negado.")
+    st.stop()
+
+if st.session_state.get("user_perfil") != "admin":
+    st.warning("Você não tem permissão de administrador para acessar esta página.")
+    st.stop()
+
+def ler_csv_alunos(arquivo) -> tuple:
+    """Lê um CSV com coluna 'cpf' ou 'id'. Retorna (cpfs, ids)."""
+    conteudo = arquivo.getvalue().decode("utf-8-sig")
+    dialeto = csv.Sniffer().sniff(conteudo[:2048], delimiters=",;") if conteudo.strip() else csv.excel
+    leitor = csv.DictReader(io.StringIO(conteudo), dialect=dialeto)
+    cpfs, ids = [], []
+    for linha in leitor:
+        linha = {(k or "").strip().lower(): (v or "").strip() for k, v in linha.items()}
+        if linha.get("cpf"):
+            cpfs.append(linha["cpf"])
+        elif linha.get("id"):
+            ids.append(linha["id"])
+    return cpfs, ids
+
+def situacao_email(job) -> str:
+    """Coluna 'E-mail' da tabela do lote, a partir do job de envio na fila."""
+    if job is None:
+        return ""
+    if job['status'] == 'concluido':
+        return f"✅ Enviado {job['resultado']['enviado_em']}"
+    if job['status'] == 'falhou':
+        return f"❌ {job['erro']}"
+    if job['erro']:
+        return f"🔁 Nova tentativa ({job['tentativas']}/{job['max_tentativas']}): {job['erro']}"
+    return "📤 Enviando" if job['status'] == 'processando' else "⏳ Na fila"
+
+def tabela_lote(resultado: dict, jobs_email: dict, envios: dict = None):
+    """
+    Tabela do lote. E-mails ainda na fila aparecem pelo job (tentativa, último erro);
+    os já resolvidos, pela situação gravada no contrato (`envios`, ContratoRepository.situacao_emails).
+    """
+    emails = resultado["emails"]
+    envios = envios or {}
+
+    def coluna_email(token):
+        job = jobs_email.get(emails.get(token))
+        envio = envios.get(token) or {}
+        if job is None or envio.get('email_status') in ('enviado', 'falhou') and job['status'] in ('concluido', 'falhou'):
+            return format_envio_email(envio)
+        return situacao_email(job)
+
+    if emails:
+        final = [j for j in jobs_email.values() if j['status'] in ('concluido', 'falhou')]
+        enviados = sum(1 for j in final if j['status'] == 'concluido')
+        st.info(
+            f"📧 {enviados}/{len(emails)} e-mail(s) enviado(s)"
+            + (f", {len(final) - enviados} com falha" if len(final) > enviados else "")
+            + (f", {len(emails) - len(final)} na fila de envio." if len(final) < len(emails) else ".")
+        )
+    st.dataframe([
+        {**linha, "E-mail": coluna_email(linha["Token"])}
+        for linha in resultado["linhas"]
+    ], use_container_width=True)
+
+@st.fragment(run_every=2)
+def acompanhar_lote(resultado: dict):
+    """Acompanha os envios em segundo plano; recarrega a página quando todos terminam."""
+    jobs_email = get_job_queue().get_many(list(resultado["emails"].values()))
+    if all(j['status'] in ('concluido', 'falhou') for j in jobs_email.values()):
+        st.rerun()
+    tabela_lote(resultado, jobs_email)
+
+def main():
+    st.title("🗂️ Geração de Contratos em Lote")
+    start_workers()
+    st.write("Gere os contratos de uma turma inteira com um plano financeiro comum.")
+
+    # --- 1. CURSO E TURMA ---
+    st.subheader("1. Curso e Turma")
+    cursos = CursoRepository.listar_todos_com_turmas()
+    map_cursos = {c['nome']: c for c in cursos}
+    sel_curso = st.selectbox("Curso", [""] + list(map_cursos.keys()))
+    if not sel_curso:
+        return
+    curso = map_cursos[sel_curso]
+    turmas = [t for t in curso.get('turmas', []) if t.get('ativo', True)]
+    if not turmas:
+        st.warning("Este curso não possui turmas ativas.")
+        return
+    map_turmas = {f"{t['codigo_turma']} ({t.get('formato','-')})": t for t in turmas}
+    turma = map_turmas[st.selectbox("Turma", list(map_turmas.keys()))]
+
+    # --- 2. ALUNOS ---
+    st.subheader("2. Alunos")
+    origem = st.radio("Origem da lista", ["Selecionar alunos", "Arquivo CSV (coluna cpf ou id)"], horizontal=True)
+    alunos = []
+    if origem == "Selecionar alunos":
+        # Busca no banco (rpc buscar_alunos) em vez de baixar o cadastro inteiro;
+        # os já escolhidos continuam nas opções quando a busca muda
+        if "lote_mapa_alunos" not in st.session_state:
+            st.session_state.lote_mapa_alunos = {}
+        mapa = st.session_state.lote_mapa_alunos
+        termo = st.text_input("Buscar aluno por nome ou CPF")
+        encontrados = AlunoRepository.buscar(termo, limite=20, perfil=LISTA) if termo.strip() else []
+        rotulos = []
+        for a in encontrados:
+            rotulo = f"{a['nome_completo']} | {format_cpf(a.get('cpf', ''))}"
+            mapa[rotulo] = a['id']
+            rotulos.append(rotulo)
+        opcoes = list(dict.fromkeys(st.session_state.get("lote_escolhidos", []) + rotulos))
+        escolhidos = st.multiselect("Alunos", opcoes, key="lote_escolhidos")
+        # Cadastro completo (contexto do contrato) só dos escolhidos
+        alunos = AlunoRepository.buscar_por_ids([mapa[k] for k in escolhidos], perfil=GERACAO)
+    else:
+        arquivo = st.file_uploader("Arquivo CSV", type=["csv"])
+        if arquivo:
+            cpfs, ids = ler_csv_alunos(arquivo)
+            por_cpf, por_id = em_paralelo(
+                AsyncAlunoRepository.buscar_por_cpfs(cpfs, perfil=GERACAO),
+                AsyncAlunoRepository.buscar_por_ids(ids, perfil=GERACAO),
+            )
+            alunos = ou_padrao(por_cpf, [], "busca de alunos por CPF") + ou_padrao(por_id, [], "busca de alunos por id")
+            nao_encontrados = len(cpfs) + len(ids) - len(alunos)
+            if nao_encontrados > 0:
+                st.warning(f"{nao_encontrados} linha(s) do CSV não correspondem a alunos cadastrados.")
+    st.caption(f"{len(alunos)} aluno(s) selecionado(s).")
+
+    # --- 3. PLANO FINANCEIRO ---
+    st.subheader("3. Plano Financeiro")
+    valor_bruto = float(curso.get('valor_bruto', 0))
+    st.info(f"💰 **Valor Bruto do Curso:** {format_currency(valor_bruto)}")
+    percent_desc = st.number_input("Desconto Comercial (%)", 0.0, 100.0, 0.0, step=0.5)
+    v_final = round(valor_bruto - round(valor_bruto * (percent_desc / 100), 2), 2)
+    st.success(f"### Valor Final: {format_currency(v_final)}")
+
+    c1, c2, c3, c4 = st.columns(4)
+    entrada_total = c1.number_input("Valor Total Entrada", 0.0, v_final, 0.0)
+    entrada_qtd = c2.selectbox("Qtd. Parcelas Entrada", [1, 2, 3])
+    entrada_venc = c3.date_input("1º Vencimento Entrada", date.today())
+    entrada_forma = c4.selectbox("Forma Entrada", ["PIX", "Cartão de Crédito", "Boleto", "Transferência"])
+
+    s1, s2, s3 = st.columns(3)
+    saldo_qtd = s1.number_input("Qtd Parcelas Saldo", 1, 36, 12)
+    saldo_venc = s2.date_input("1º Vencimento Saldo", date.today() + relativedelta(months=1))
+    saldo_forma = s3.selectbox("Forma Saldo", ["Boleto", "Cartão de Crédito", "PIX"])
+
+    plano = {
+        "percentual_desconto": percent_desc,
+        "entrada_total": entrada_total,
+        "entrada_qtd": entrada_qtd,
+        "entrada_primeiro_vencimento": entrada_venc,
+        "entrada_forma": entrada_forma,
+        "saldo_qtd": int(saldo_qtd),
+        "saldo_primeiro_vencimento": saldo_venc,
+        "saldo_forma": saldo_forma,
+    }
+
+    # --- 4. GERAÇÃO ---
+    enviar_links = st.checkbox("📧 Enviar o link de assinatura por e-mail a cada aluno", value=True)
+    if st.button(f"🚀 Gerar {len(alunos)} Contrato(s)", type="primary", use_container_width=True, disabled=not alunos):
+        barra = st.progress(0.0, text="Preparando...")
+        total_passos = len(alunos) * (len(ETAPAS) - 1)
+        progresso = {}
+
+        def on_progress(job):
+            # Contratos com erro contam como concluídos para a barra
+            passo = len(ETAPAS) - 1 if job["etapa"] == "erro" else ETAPAS.index(job["etapa"])
+            progresso[job["token"]] = passo
+            concluidos = sum(1 for p in progresso.values() if p == len(ETAPAS) - 1)
+            barra.progress(
+                min(1.0, sum(progresso.values()) / total_passos),
+                text=f"{job['aluno']['nome_completo']}: {job['etapa']} ({concluidos}/{len(alunos)})"
+            )
+
+        jobs = BatchContractGenerator().executar(alunos, curso, turma, plano, on_progress=on_progress)
+        barra.progress(1.0, text="Concluído.")
+
+        sucesso = [j for j in jobs if j["etapa"] == "salvo"]
+        falhas = [j for j in jobs if j["etapa"] == "erro"]
+        st.success(f"✅ {len(sucesso)} contrato(s) gerado(s) e salvo(s).")
+        if falhas:
+            st.error(f"❌ {len(falhas)} contrato(s) com falha.")
+
+        # Envio pela fila de jobs (outbox), como na geração individual: a página não
+        # espera o SMTP, e falhas são reenviadas pelo worker com backoff
+        com_email = [j for j in sucesso if j["aluno"].get("email")] if enviar_links else []
+        # Situação gravada nos contratos antes de enfileirar: o worker só grava depois
+        ContratoRepository.marcar_email_na_fila([j["token"] for j in com_email])
+        ids_email = get_job_queue().enqueue_many("enviar_email", [
+            {
+                "email": j["aluno"]["email"],
+                "nome_aluno": j["aluno"]["nome_completo"],
+                "link_assinatura": f"{BASE_URL}/Assinatura?token={j['token']}",
+                "nome_curso": curso["nome"],
+                "token": j["token"],
+            }
+            for j in com_email
+        ])
+        st.session_state.lote_resultado = {
+            "emails": {j["token"]: job_id for j, job_id in zip(com_email, ids_email)},
+            "linhas": [
+                {
+                    "Aluno": j["aluno"]["nome_completo"],
+                    "CPF": format_cpf(j["aluno"].get("cpf", "")),
+                    "Status": "✅ Salvo" if j["etapa"] == "salvo" else "❌ Erro",
+                    "Detalhe": j["erro"] or "",
+                    "Token": j["token"] if j["etapa"] == "salvo" else "",
+                }
+                for j in jobs
+            ],
+        }
+
+    # Resultado do último lote, com a situação dos e-mails atualizada pela fila
+    resultado = st.session_state.get("lote_resultado")
+    if resultado:
+        jobs_email = get_job_queue().get_many(list(resultado["emails"].values()))
+        if all(j['status'] in ('concluido', 'falhou') for j in jobs_email.values()):
+            tabela_lote(resultado, jobs_email, ContratoRepository.situacao_emails(list(resultado["emails"])))
+        else:
+            acompanhar_lote(resultado)
+
+if __name__ == "__main__":
+    main()
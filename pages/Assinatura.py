@@ -1,13 +1,13 @@
 import streamlit as st
 import hashlib
 from datetime import datetime, timedelta
-import io
 import re
-import requests
 from src.database.repo_contratos import ContratoRepository
+from src.database.projections import ASSINATURA
 from src.document_engine.pdf_converter import PDFManager
 from src.utils.formatters import format_currency, format_cpf, format_date_br
 from src.utils.storage import StorageService
+from src.services.signature_recovery import interrompida, reconciliar
 from src.database.connection import supabase
 
 # Configuração da página
@@ -35,12 +35,21 @@ def main():
         st.error("Link inválido.")
         return
 
-    contrato = ContratoRepository.buscar_por_token(token)
+    contrato = ContratoRepository.buscar_por_token(token, perfil=ASSINATURA)
     
     if not contrato:
         st.error("Contrato não encontrado.")
         return
 
+    # --- ASSINATURA EM ANDAMENTO (ou interrompida no meio) ---
+    if contrato['status'] == 'Assinando':
+        if interrompida(contrato):
+            # O processo que assinava caiu: conclui com a via já enviada ou devolve para 'Pendente'
+            reconciliar(contrato['id'], token, contrato['hash_aceite'], contrato['alunos']['nome_completo'])
+            st.rerun()
+        st.info("⏳ Sua assinatura está sendo processada. Atualize a página em instantes.")
+        return
+
     # --- TELA 1: JÁ ASSINADO ---
     if contrato['status'] == 'Assinado':
         st.success(f"✅ Contrato assinado com sucesso em {format_date_br(contrato.get('data_aceite'))}.")
@@ -107,28 +116,49 @@ def main():
             st.error("Você precisa confirmar a leitura e o aceite dos termos.")
         else:
             with st.spinner("Registrando assinatura e gerando via final..."):
+                # 1. Dados de Auditoria
                 try:
-                    # 1. Download do Original
-                    response = requests.get(url_original)
-                    if response.status_code != 200:
-                        raise Exception("Falha ao baixar contrato original para processamento.")
-                    pdf_buffer = io.BytesIO(response.content)
-
-                    # 2. Dados de Auditoria
-                    try:
-                        from streamlit.web.server.websocket_headers import _get_websocket_headers
-                        ip_usuario = _get_websocket_headers().get("X-Forwarded-For", "0.0.0.0").split(",")[0]
-                    except:
-                        ip_usuario = "0.0.0.0"
-
-                    # Ajuste de Fuso Horário (GMT-3)
-                    timestamp_gmt3 = datetime.now() - timedelta(hours=3)
-                    
-                    # Link e Hash
-                    link_completo = f"{BASE_URL}/Assinatura?token={token}"
-                    hash_auth = hashlib.sha256(f"{token}{input_cpf_limpo}{timestamp_gmt3.isoformat()}".encode()).hexdigest().upper()
+                    from streamlit.web.server.websocket_headers import _get_websocket_headers
+                    ip_usuario = _get_websocket_headers().get("X-Forwarded-For", "0.0.0.0").split(",")[0]
+                except:
+                    ip_usuario = "0.0.0.0"
+
+                # Ajuste de Fuso Horário (GMT-3)
+                timestamp_gmt3 = datetime.now() - timedelta(hours=3)
+
+                # Link e Hash
+                link_completo = f"{BASE_URL}/Assinatura?token={token}"
+                hash_auth = hashlib.sha256(f"{token}{input_cpf_limpo}{timestamp_gmt3.isoformat()}".encode()).hexdigest().upper()
+
+                # Caminho da via assinada (determinístico por contrato: a recuperação de
+                # assinaturas interrompidas procura a via no mesmo lugar)
+                path = StorageService.caminho_via_assinada(aluno['nome_completo'], token)
+
+                # 2. Reserva a assinatura antes de carimbar ('Pendente' -> 'Assinando'):
+                # só um signatário passa daqui, e caminho_arquivo ainda é o original
+                payload = {
+                    "data_aceite": timestamp_gmt3.isoformat(),
+                    "ip_aceite": ip_usuario,
+                    "hash_aceite": hash_auth,
+                    "recibo_aceite_texto": f"Assinado digitalmente. Hash: {hash_auth}",
+                }
+                if not ContratoRepository.registrar_assinatura(contrato['id'], payload):
+                    atual = ContratoRepository.buscar_por_token(token, perfil=ASSINATURA)
+                    if atual and atual['status'] in ('Assinando', 'Assinado'):
+                        st.rerun()  # outra sessão assinou primeiro: mostra o andamento ou o contrato assinado
+                    st.error("Não foi possível registrar a assinatura. Tente novamente.")
+                    st.stop()
 
-                    # 3. Gera Carimbo
+                try:
+                    # 3. Download do Original (Storage com streaming e cópia local por ETag)
+                    caminho_original = StorageService.caminho_do_objeto(url_original)
+                    if not caminho_original:
+                        raise Exception("Contrato original fora do Storage.")
+                    pdf_buffer, erro_download = StorageService.baixar(caminho_original)
+                    if erro_download:
+                        raise Exception(f"Falha ao baixar contrato original para processamento: {erro_download}")
+
+                    # 4. Gera Carimbo
                     stamp_text = PDFManager.create_signature_stamp(
                         data_assinatura=timestamp_gmt3,
                         nome_aluno=nome_input.upper(),
@@ -139,38 +169,34 @@ def main():
                         hash_auth=hash_auth
                     )
                     
-                    # Aplica Carimbo
-                    pdf_final = PDFManager.apply_stamp_to_pdf(pdf_buffer, stamp_text)
-
-                    # 4. Upload do Assinado
-                    nome_arq = f"Contrato_{StorageService.sanitizar_nome(aluno['nome_completo'])}_ASSINADO.pdf"
-                    path = f"minutas/{nome_arq}"
+                    # Aplica Carimbo (lê o original direto do arquivo baixado)
+                    with pdf_buffer:
+                        pdf_final = PDFManager.apply_stamp_to_pdf(pdf_buffer, stamp_text)
+                        pdf_final.seek(0)
+                        conteudo_final = pdf_final.read()
 
+                    # 5. Upload do Assinado
                     supabase.storage.from_("contratos").upload(
                         path=path, 
-                        file=pdf_final.getvalue(), 
+                        file=conteudo_final, 
                         file_options={"content-type": "application/pdf", "upsert": "true"}
                     )
-                    
-                    nova_url = supabase.storage.from_("contratos").get_public_url(path)
-
-                    # 5. Atualiza Banco
-                    payload = {
-                        "status": "Assinado",
-                        "data_aceite": timestamp_gmt3.isoformat(),
-                        "ip_aceite": ip_usuario,
-                        "hash_aceite": hash_auth,
-                        "recibo_aceite_texto": f"Assinado digitalmente. Hash: {hash_auth}", 
-                        "caminho_arquivo": nova_url
-                    }
-                    ContratoRepository.registrar_assinatura(contrato['id'], payload)
-
-                    st.balloons()
-                    st.success("Assinado com sucesso!")
-                    st.rerun()
 
                 except Exception as e:
+                    # Sem a via assinada, a reserva do passo 2 é desfeita
+                    ContratoRepository.desfazer_assinatura(contrato['id'], hash_auth)
                     st.error(f"Erro ao processar assinatura: {e}")
+                    st.stop()
+
+                # 6. Conclui: 'Assinado' e caminho_arquivo apontando para a via que já existe.
+                # Se falhar aqui, o contrato fica em 'Assinando' e a recuperação o conclui
+                if not ContratoRepository.concluir_assinatura(contrato['id'], hash_auth, StorageService.url_publica(path)):
+                    st.warning("Assinatura registrada; a via assinada será disponibilizada em instantes.")
+                    st.stop()
+
+                st.balloons()
+                st.success("Assinado com sucesso!")
+                st.rerun()
 
 if __name__ == "__main__":
     main()
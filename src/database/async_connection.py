@@ -0,0 +1,82 @@
+"""
+Cliente Supabase assíncrono e o event loop dedicado em que ele roda.
+
+Os repositórios têm uma versão assíncrona (Async*Repository) sobre este cliente;
+a API síncrona de sempre (AlunoRepository etc.) só chama run_sync() nela.
+Páginas e jobs que precisam de várias consultas independentes usam em_paralelo(),
+que espera todas ao mesmo tempo: o tempo total fica perto da consulta mais lenta.
+"""
+import asyncio
+import threading
+import streamlit as st
+from supabase import acreate_client, AsyncClient
+from supabase.lib.client_options import AsyncClientOptions
+from src.database.instrumentation import registrar_resposta_async
+from src.database.transport import build_async_http_client, pool_stats
+
+
+@st.cache_resource
+def _event_loop() -> asyncio.AbstractEventLoop:
+    """Loop único do processo, numa thread própria (o Streamlit roda os scripts em threads sem loop)."""
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, name="supabase-async", daemon=True).start()
+    return loop
+
+
+def run_sync(coro):
+    """Executa a corrotina no loop do cliente assíncrono e espera o resultado."""
+    loop = _event_loop()
+    if threading.current_thread().name == "supabase-async":
+        coro.close()
+        raise RuntimeError("run_sync chamado de dentro do loop assíncrono; use await.")
+    return asyncio.run_coroutine_threadsafe(coro, loop).result()
+
+
+def em_paralelo(*coros) -> list:
+    """
+    Espera várias consultas independentes ao mesmo tempo.
+    Retorna os resultados na ordem das corrotinas; exceções voltam na lista, na posição da consulta.
+    """
+    async def juntar():
+        return await asyncio.gather(*coros, return_exceptions=True)
+    return run_sync(juntar())
+
+
+def ou_padrao(resultado, padrao, contexto: str = "consulta"):
+    """Resultado de uma posição do em_paralelo, ou `padrao` (com log) se a consulta falhou."""
+    if isinstance(resultado, Exception):
+        print(f"Erro em {contexto}: {resultado}")
+        return padrao
+    return resultado
+
+
+@st.cache_resource
+def get_async_supabase_client() -> AsyncClient:
+    """Mesmas credenciais e configuração de transporte ([http]) do cliente síncrono."""
+    try:
+        url = st.secrets["supabase_url"]
+        key = st.secrets["supabase_key"]
+
+        async def criar():
+            # O AsyncClient do httpx precisa nascer no loop em que vai rodar
+            http_client = build_async_http_client(response_hooks=[registrar_resposta_async])
+            return await acreate_client(url, key, options=AsyncClientOptions(httpx_client=http_client))
+
+        return run_sync(criar())
+    except KeyError as e:
+        st.error(f"Erro: Chave {e} não encontrada no secrets.toml.")
+        st.stop()
+    except Exception as e:
+        st.error(f"Erro ao conectar ao Supabase: {e}")
+        st.stop()
+
+
+# Instância global para ser importada nos repositórios assíncronos
+supabase_async = get_async_supabase_client()
+
+
+def async_pool_stats() -> dict:
+    """Ocupação do pool HTTP do cliente assíncrono."""
+    if supabase_async is None:
+        return {}
+    return pool_stats(supabase_async.postgrest.session)
@@ -0,0 +1,113 @@
+import copy
+import time
+import threading
+
+
+class TTLCache:
+    """
+    Cache de leituras do banco, compartilhado por todas as sessões do processo.
+    Cada entrada expira após `ttl` segundos; escritas no banco chamam invalidate()
+    para que a próxima leitura vá ao Supabase mesmo antes de expirar.
+    Entradas vencidas saem do dicionário (na leitura e a cada gravação), e
+    `max_entries` limita o tamanho descartando as mais antigas: com chaves que
+    não se repetem (ex.: tokens de assinatura), o cache não cresce sem limite.
+    """
+
+    def __init__(self, ttl: float, max_entries: int = None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = {}  # ordem de inserção = ordem de expiração (ttl fixo)
+        self._lock = threading.Lock()
+        self._geracao = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.evictions = 0
+
+    def _guardar(self, key, valor):
+        """Grava no fim da fila e descarta as vencidas e o excesso do início (chamar com o lock)."""
+        agora = time.monotonic()
+        self._entries.pop(key, None)
+        self._entries[key] = (agora + self.ttl, valor)
+        while self._entries:
+            chave = next(iter(self._entries))
+            excesso = self.max_entries is not None and len(self._entries) > self.max_entries
+            if self._entries[chave][0] > agora and not excesso:
+                break
+            del self._entries[chave]
+            self.evictions += 1
+
+    def _ler(self, key, agora):
+        """Valor válido da chave ou None; a entrada vencida é removida (chamar com o lock)."""
+        entrada = self._entries.get(key)
+        if entrada is None:
+            return None
+        if entrada[0] <= agora:
+            del self._entries[key]
+            self.evictions += 1
+            return None
+        return entrada
+
+    def get_or_load(self, key, loader):
+        """
+        Retorna uma cópia do valor em cache ou chama loader() e guarda o resultado.
+        Exceções do loader se propagam e nada é guardado.
+        """
+        agora = time.monotonic()
+        with self._lock:
+            entrada = self._ler(key, agora)
+            if entrada is not None:
+                self.hits += 1
+                return copy.deepcopy(entrada[1])
+            self.misses += 1
+            geracao = self._geracao
+
+        valor = loader()
+
+        with self._lock:
+            # Uma escrita durante o load pode ter deixado o valor lido desatualizado
+            if geracao == self._geracao:
+                self._guardar(key, valor)
+        return copy.deepcopy(valor)
+
+    async def aget_or_load(self, key, loader):
+        """Igual ao get_or_load, para loaders assíncronos (loader() retorna uma corrotina)."""
+        agora = time.monotonic()
+        with self._lock:
+            entrada = self._ler(key, agora)
+            if entrada is not None:
+                self.hits += 1
+                return copy.deepcopy(entrada[1])
+            self.misses += 1
+            geracao = self._geracao
+
+        valor = await loader()
+
+        with self._lock:
+            if geracao == self._geracao:
+                self._guardar(key, valor)
+        return copy.deepcopy(valor)
+
+    def invalidate(self, *keys):
+        """Remove as chaves informadas (ou todas, se nenhuma for informada)."""
+        with self._lock:
+            self._geracao += 1
+            self.invalidations += 1
+            if not keys:
+                self._entries.clear()
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "invalidations": self.invalidations,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+            }
@@ -1,5 +1,8 @@
 import streamlit as st
 from supabase import create_client, Client
+from supabase.lib.client_options import SyncClientOptions
+from src.database.instrumentation import registrar_resposta
+from src.database.transport import build_http_client, pool_stats
 
 @st.cache_resource
 def get_supabase_client() -> Client:
@@ -11,7 +14,10 @@ def get_supabase_client() -> Client:
     try:
         url = st.secrets["supabase_url"]
         key = st.secrets["supabase_key"]
-        return create_client(url, key)
+        # Um único pool HTTP para PostgREST e Storage (src/database/transport.py, seção [http]),
+        # com a medição de bytes recebidos por consulta
+        http_client = build_http_client(response_hooks=[registrar_resposta])
+        return create_client(url, key, options=SyncClientOptions(httpx_client=http_client))
     except KeyError as e:
         st.error(f"Erro: Chave {e} não encontrada no secrets.toml.")
         st.stop()
@@ -21,3 +27,10 @@ def get_supabase_client() -> Client:
 
 # Instância global para ser importada nos repositórios
 supabase = get_supabase_client()
+
+
+def http_pool_stats() -> dict:
+    """Ocupação do pool HTTP compartilhado pelo cliente Supabase."""
+    if supabase is None:
+        return {}
+    return pool_stats(supabase.postgrest.session)
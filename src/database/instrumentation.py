@@ -0,0 +1,91 @@
+"""
+Medição dos bytes recebidos do Supabase por método de repositório.
+
+O hook de resposta do cliente HTTP (connection.get_supabase_client) soma o tamanho
+do corpo de cada resposta na chamada em andamento, identificada pelo decorator
+@medir nos repositórios (nome do método + perfil de projeção).
+"""
+import inspect
+import threading
+import functools
+import contextvars
+
+_chamada = contextvars.ContextVar("chamada_repositorio", default=None)
+_lock = threading.Lock()
+_stats = {}
+
+
+def medir(fn):
+    """
+    Atribui as respostas HTTP feitas dentro de `fn` a 'Classe.metodo[perfil]'.
+    Em corrotinas o rótulo é definido dentro da própria corrotina, para valer
+    na task do event loop em que ela roda.
+    """
+    assinatura = inspect.signature(fn)
+    tem_perfil = "perfil" in assinatura.parameters
+    # AsyncAlunoRepository.x e AlunoRepository.x são a mesma consulta
+    nome = fn.__qualname__.removeprefix("Async")
+
+    def rotulo(args, kwargs) -> str:
+        if not tem_perfil:
+            return nome
+        argumentos = assinatura.bind_partial(*args, **kwargs)
+        argumentos.apply_defaults()
+        return f"{nome}[{argumentos.arguments['perfil']}]"
+
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def wrapper_async(*args, **kwargs):
+            token = _chamada.set(rotulo(args, kwargs))
+            try:
+                return await fn(*args, **kwargs)
+            finally:
+                _chamada.reset(token)
+        return wrapper_async
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        token = _chamada.set(rotulo(args, kwargs))
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _chamada.reset(token)
+    return wrapper
+
+
+def _contabilizar(response):
+    rotulo = _chamada.get() or f"{response.request.method} {response.request.url.path}"
+    with _lock:
+        item = _stats.setdefault(rotulo, {"chamadas": 0, "bytes": 0})
+        item["chamadas"] += 1
+        item["bytes"] += len(response.content)
+
+
+def registrar_resposta(response):
+    """Event hook de resposta do httpx (só consultas do PostgREST; o Storage não é medido)."""
+    if "/rest/v1/" not in response.request.url.path:
+        return
+    response.read()
+    _contabilizar(response)
+
+
+async def registrar_resposta_async(response):
+    """Versão do registrar_resposta para o httpx.AsyncClient."""
+    if "/rest/v1/" not in response.request.url.path:
+        return
+    await response.aread()
+    _contabilizar(response)
+
+
+def transfer_stats() -> dict:
+    """Bytes e chamadas HTTP por método, com a média de bytes por chamada."""
+    with _lock:
+        return {
+            rotulo: {**item, "bytes_por_chamada": item["bytes"] / item["chamadas"]}
+            for rotulo, item in sorted(_stats.items())
+        }
+
+
+def reset_transfer_stats():
+    with _lock:
+        _stats.clear()
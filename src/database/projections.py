@@ -0,0 +1,76 @@
+"""
+Perfis de projeção de colunas por caso de uso.
+
+Cada método de repositório recebe um `perfil` e seleciona só as colunas dele,
+em vez de `select("*")` com todos os JOINs. Os perfis que abrem o cadastro
+inteiro ("*") ficam restritos a quem realmente precisa dele: o contexto do
+template de contrato pode referenciar qualquer campo do aluno.
+"""
+
+LISTA = "lista"            # linhas de listagem/seletores
+ASSINATURA = "assinatura"  # página pública de assinatura
+GERACAO = "geracao"        # contexto de geração do contrato
+EXPORTACAO = "exportacao"  # exportação/relatórios
+ENVIO_EMAIL = "envio_email"  # situação do e-mail com o link de assinatura
+COMPLETO = "completo"      # todas as colunas (comportamento anterior)
+
+_ENVIO_EMAIL = "email_status, email_destinatario, email_tentativas, email_erro, email_enviado_em"
+
+_ALUNO_CADASTRO = (
+    "id, nome_completo, cpf, email, telefone, data_nascimento, nacionalidade, estado_civil, "
+    "logradouro, numero, complemento, bairro, cidade, uf, crm, area_formacao"
+)
+
+PERFIS = {
+    "alunos": {
+        LISTA: "id, nome_completo, cpf",
+        ASSINATURA: "id, nome_completo, cpf, email",
+        GERACAO: "*",
+        EXPORTACAO: _ALUNO_CADASTRO,
+        COMPLETO: "*",
+    },
+    "contratos": {
+        LISTA: f"id, status, valor_final, created_at, {_ENVIO_EMAIL}, alunos(nome_completo, cpf), turmas(codigo_turma, cursos(nome))",
+        ASSINATURA: "id, status, data_aceite, caminho_arquivo, hash_aceite, assinatura_iniciada_em, "
+                    "alunos(nome_completo, cpf, email)",
+        GERACAO: "id, caminho_arquivo",
+        ENVIO_EMAIL: f"token_acesso, {_ENVIO_EMAIL}",
+        EXPORTACAO: f"*, alunos({_ALUNO_CADASTRO}), turmas(codigo_turma, formato, data_inicio, data_fim, cursos(nome, valor_bruto))",
+        COMPLETO: "*, alunos(*), turmas(*, cursos(*))",
+    },
+    "cursos": {
+        LISTA: "id, nome, valor_bruto, ativo",
+        GERACAO: "*",
+        EXPORTACAO: "*",
+        COMPLETO: "*",
+    },
+    "turmas": {
+        LISTA: "id, curso_id, codigo_turma, formato, ativo",
+        GERACAO: "*",
+        EXPORTACAO: "*",
+        COMPLETO: "*",
+    },
+    "parcelas": {
+        LISTA: "id, contrato_id, tipo, numero, total_parcelas, vencimento, valor, forma_pagamento, status",
+        EXPORTACAO: "*, contratos(id, status, alunos(nome_completo, cpf, email))",
+        COMPLETO: "*",
+    },
+    "contratos_por_status": {
+        COMPLETO: "status, quantidade, valor",
+    },
+    "metricas_mensais": {
+        COMPLETO: "mes, metrica, quantidade, valor",
+    },
+    "usuarios": {
+        LISTA: "id, nome, email, perfil, ativo",
+        COMPLETO: "*",
+    },
+}
+
+
+def colunas(tabela: str, perfil: str) -> str:
+    """Lista de colunas (sintaxe do select do PostgREST) de um perfil da tabela."""
+    try:
+        return PERFIS[tabela][perfil]
+    except KeyError:
+        raise ValueError(f"Perfil de projeção '{perfil}' não definido para a tabela '{tabela}'.")
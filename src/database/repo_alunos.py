@@ -1,61 +1,235 @@
-from src.database.connection import supabase
+from src.database.async_connection import supabase_async, run_sync
+from src.database.instrumentation import medir
+from src.database.projections import colunas, LISTA, COMPLETO
+from src.utils.formatters import remover_acentos
+from postgrest.types import ReturnMethod
 import streamlit as st
 
+
+def _valor_filtro(valor) -> str:
+    """Valor entre aspas para filtros or=(...) do PostgREST (nomes podem ter vírgula e parênteses)."""
+    return '"' + str(valor).replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+
+def _so_digitos(valor) -> str:
+    return "".join(filter(str.isdigit, str(valor)))
+
+
+class AsyncAlunoRepository:
+    """
+    Versão assíncrona do AlunoRepository. Não trata erros: exceções sobem para
+    quem chama (o AlunoRepository ou a página que junta consultas com em_paralelo).
+    """
+
+    @staticmethod
+    @medir
+    async def listar_todos(perfil: str = COMPLETO):
+        response = await supabase_async.table("alunos").select(colunas("alunos", perfil)).order("nome_completo").execute()
+        return response.data
+
+    @staticmethod
+    @medir
+    async def listar_pagina(tamanho: int = 25, apos: tuple = None, termo: str = "", perfil: str = LISTA):
+        termo = (termo or "").strip()
+        # Uma linha a mais só para saber se existe próxima página, sem contar a tabela
+        response = await supabase_async.rpc("listar_alunos_pagina", {
+            "apos_nome": apos[0] if apos else None,
+            "apos_id": apos[1] if apos else None,
+            "nome_trecho": AlunoRepository.dobrar(termo) if termo and not termo.isdigit() else None,
+            "cpf_trecho": termo if termo.isdigit() else None,
+            "limite": tamanho + 1,
+        }).select(colunas("alunos", perfil)).execute()
+        itens = response.data or []
+        proximo = None
+        if len(itens) > tamanho:
+            itens = itens[:tamanho]
+            proximo = (itens[-1]["nome_completo"], itens[-1]["id"])
+        return {"itens": itens, "proximo": proximo}
+
+    @staticmethod
+    @medir
+    async def contar(termo: str = ""):
+        query = supabase_async.table("alunos").select("id", count="exact", head=True)
+        termo = (termo or "").strip()
+        if termo.isdigit():
+            query = query.like("cpf", f"%{termo}%")
+        elif termo:
+            query = query.like("nome_busca", f"%{AlunoRepository.dobrar(termo)}%")
+        response = await query.execute()
+        return response.count or 0
+
+    @staticmethod
+    @medir
+    async def buscar(termo: str, limite: int = 10, perfil: str = COMPLETO):
+        termo_dobrado = AlunoRepository.dobrar(termo)
+        if not termo_dobrado: return []
+        response = await supabase_async.rpc("buscar_alunos", {"termo": termo_dobrado, "limite": limite})\
+            .select(colunas("alunos", perfil))\
+            .execute()
+        return response.data or []
+
+    @staticmethod
+    @medir
+    async def buscar_por_cpf(cpf: str, perfil: str = COMPLETO):
+        response = await supabase_async.table("alunos").select(colunas("alunos", perfil)).eq("cpf", _so_digitos(cpf)).execute()
+        # Retorna o objeto único se encontrado
+        return response.data[0] if response.data else None
+
+    @staticmethod
+    @medir
+    async def buscar_por_id(aluno_id: str, perfil: str = COMPLETO):
+        response = await supabase_async.table("alunos").select(colunas("alunos", perfil)).eq("id", aluno_id).execute()
+        return response.data[0] if response.data else None
+
+    @staticmethod
+    @medir
+    async def buscar_por_ids(aluno_ids: list, perfil: str = COMPLETO):
+        if not aluno_ids: return []
+        response = await supabase_async.table("alunos").select(colunas("alunos", perfil)).in_("id", list(aluno_ids)).execute()
+        return response.data
+
+    @staticmethod
+    @medir
+    async def buscar_por_cpfs(cpfs: list, perfil: str = COMPLETO):
+        cpfs_limpos = [c for c in (_so_digitos(c) for c in cpfs) if c]
+        if not cpfs_limpos: return []
+        response = await supabase_async.table("alunos").select(colunas("alunos", perfil)).in_("cpf", cpfs_limpos).execute()
+        return response.data
+
+    @staticmethod
+    @medir
+    async def criar_aluno(dados: dict):
+        if 'cpf' in dados:
+            dados['cpf'] = _so_digitos(dados['cpf'])
+        response = await supabase_async.table("alunos").insert(dados).execute()
+        return response.data[0] if response.data else None
+
+    @staticmethod
+    @medir
+    async def atualizar_aluno(aluno_id: str, dados: dict):
+        # Remove o ID dos dados se presente para evitar erro de alteração de chave primária
+        dados.pop('id', None)
+        if 'cpf' in dados:
+            dados['cpf'] = _so_digitos(dados['cpf'])
+        response = await supabase_async.table("alunos").update(dados).eq("id", aluno_id).execute()
+        return response.data[0] if response.data else None
+
+    @staticmethod
+    @medir
+    async def upsert_em_lote(linhas: list):
+        if not linhas: return 0
+        # O PostgREST atualiza, no conflito, todas as colunas do payload (e completa com
+        # NULL as que faltam numa linha): cada conjunto de colunas vai numa requisição,
+        # para que uma célula vazia não apague o valor já cadastrado
+        grupos = {}
+        for linha in linhas:
+            grupos.setdefault(frozenset(linha), []).append(linha)
+        for grupo in grupos.values():
+            # returning=minimal: a resposta não traz as linhas de volta (só o status)
+            await supabase_async.table("alunos")\
+                .upsert(grupo, on_conflict="cpf", returning=ReturnMethod.minimal)\
+                .execute()
+        return len(linhas)
+
+
 class AlunoRepository:
     """
     Repositório oficial para a tabela 'alunos'.
     Validado com esquema: id (uuid), nome_completo, cpf, email, etc.
+    Fachada síncrona sobre o AsyncAlunoRepository.
     """
 
     @staticmethod
-    def listar_todos():
+    def listar_todos(perfil: str = COMPLETO):
         try:
-            response = supabase.table("alunos").select("*").order("nome_completo").execute()
-            return response.data
+            return run_sync(AsyncAlunoRepository.listar_todos(perfil))
         except Exception as e:
             print(f"Erro ao listar: {e}")
             return []
 
     @staticmethod
-    def filtrar_por_nome(termo: str):
+    def listar_pagina(tamanho: int = 25, apos: tuple = None, termo: str = "", perfil: str = LISTA):
+        """
+        Página da listagem em ordem de (nome_completo, id), paginada por keyset
+        (rpc listar_alunos_pagina, comparação de linha sobre o índice idx_alunos_nome_id).
+        `apos` é o (nome_completo, id) da última linha da página anterior (None na primeira).
+        `termo` filtra no banco: só dígitos -> trecho do CPF; senão -> trecho do nome.
+        Retorna {"itens": [...], "proximo": (nome, id) | None}. O total fica com contar().
+        """
         try:
-            response = supabase.table("alunos")\
-                .select("*")\
-                .ilike("nome_completo", f"%{termo}%")\
-                .order("nome_completo")\
-                .execute()
-            return response.data
+            return run_sync(AsyncAlunoRepository.listar_pagina(tamanho, apos, termo, perfil))
+        except Exception as e:
+            st.error(f"Erro ao listar alunos: {e}")
+            return {"itens": [], "proximo": None}
+
+    @staticmethod
+    def contar(termo: str = "") -> int:
+        """Total de alunos do filtro da listagem (count exato: chamar uma vez por filtro, não por página)."""
+        try:
+            return run_sync(AsyncAlunoRepository.contar(termo))
+        except Exception as e:
+            print(f"Erro ao contar alunos: {e}")
+            return 0
+
+    @staticmethod
+    def dobrar(termo: str) -> str:
+        """Forma de comparação da busca: minúsculas e sem acentos (mesma regra da coluna nome_busca)."""
+        return remover_acentos(termo or "").lower().strip()
+
+    @staticmethod
+    def buscar(termo: str, limite: int = 10, perfil: str = COMPLETO):
+        """
+        Busca por relevância (rpc buscar_alunos): ignora acentos, tolera erros de digitação
+        via similaridade de trigramas e aceita prefixo do nome ou trecho do CPF.
+        Retorna os `limite` melhores resultados.
+        """
+        try:
+            return run_sync(AsyncAlunoRepository.buscar(termo, limite, perfil))
         except Exception as e:
             st.error(f"Erro na busca: {e}")
             return []
 
     @staticmethod
-    def buscar_por_cpf(cpf: str):
+    def filtrar_por_nome(termo: str, perfil: str = COMPLETO):
+        return AlunoRepository.buscar(termo, limite=50, perfil=perfil)
+
+    @staticmethod
+    def buscar_por_cpf(cpf: str, perfil: str = COMPLETO):
         try:
-            cpf_limpo = "".join(filter(str.isdigit, cpf))
-            response = supabase.table("alunos").select("*").eq("cpf", cpf_limpo).execute()
-            # Retorna o objeto único se encontrado
-            return response.data[0] if response.data else None
+            return run_sync(AsyncAlunoRepository.buscar_por_cpf(cpf, perfil))
         except Exception as e:
             st.error(f"Erro ao buscar CPF: {e}")
             return None
 
     @staticmethod
-    def buscar_por_id(aluno_id: str): # Alterado para str (UUID)
+    def buscar_por_id(aluno_id: str, perfil: str = COMPLETO): # Alterado para str (UUID)
         try:
-            response = supabase.table("alunos").select("*").eq("id", aluno_id).execute()
-            return response.data[0] if response.data else None
+            return run_sync(AsyncAlunoRepository.buscar_por_id(aluno_id, perfil))
         except Exception as e:
             return None
 
+    @staticmethod
+    def buscar_por_ids(aluno_ids: list, perfil: str = COMPLETO):
+        """Busca vários alunos em uma única requisição."""
+        try:
+            return run_sync(AsyncAlunoRepository.buscar_por_ids(aluno_ids, perfil))
+        except Exception as e:
+            print(f"Erro ao buscar alunos por id: {e}")
+            return []
+
+    @staticmethod
+    def buscar_por_cpfs(cpfs: list, perfil: str = COMPLETO):
+        """Busca vários alunos pelo CPF (com ou sem máscara) em uma única requisição."""
+        try:
+            return run_sync(AsyncAlunoRepository.buscar_por_cpfs(cpfs, perfil))
+        except Exception as e:
+            print(f"Erro ao buscar alunos por CPF: {e}")
+            return []
+
     @staticmethod
     def criar_aluno(dados: dict):
         try:
-            if 'cpf' in dados:
-                dados['cpf'] = "".join(filter(str.isdigit, dados['cpf']))
-                
-            response = supabase.table("alunos").insert(dados).execute()
-            return response.data[0] if response.data else None
+            return run_sync(AsyncAlunoRepository.criar_aluno(dados))
         except Exception as e:
             st.error(f"Erro ao criar aluno: {e}")
             return None
@@ -63,13 +237,19 @@ class AlunoRepository:
     @staticmethod
     def atualizar_aluno(aluno_id: str, dados: dict): # Alterado para str (UUID)
         try:
-            # Remove o ID dos dados se presente para evitar erro de alteração de chave primária
-            dados.pop('id', None)
-            if 'cpf' in dados:
-                dados['cpf'] = "".join(filter(str.isdigit, dados['cpf']))
-                
-            response = supabase.table("alunos").update(dados).eq("id", aluno_id).execute()
-            return response.data[0] if response.data else None
+            return run_sync(AsyncAlunoRepository.atualizar_aluno(aluno_id, dados))
         except Exception as e:
             st.error(f"Erro ao atualizar: {e}")
             return None
+
+    @staticmethod
+    def upsert_em_lote(linhas: list):
+        """
+        Insere ou atualiza (conflito em 'cpf') vários alunos, uma requisição por conjunto
+        de colunas: na atualização, só as colunas presentes em cada linha são gravadas.
+        Retorna a quantidade de linhas enviadas ou dicionário com a chave 'error'.
+        """
+        try:
+            return run_sync(AsyncAlunoRepository.upsert_em_lote(linhas))
+        except Exception as e:
+            return {"error": str(e)}
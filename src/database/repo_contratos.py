@@ -1,69 +1,271 @@
-from src.database.connection import supabase
-from datetime import datetime
+from src.database.async_connection import supabase_async, run_sync
+from src.database.cache import TTLCache
+from src.database.instrumentation import medir
+from src.database.projections import colunas, PERFIS, LISTA, COMPLETO, ENVIO_EMAIL
+from postgrest.types import ReturnMethod
+from src.utils.settings import get_section
+from datetime import datetime, timedelta, timezone
+import threading
+
+# Contrato por token: a página de assinatura roda de novo a cada tecla/checkbox.
+# TTL configurável em [cache] assinatura_ttl (segundos) e tamanho máximo em
+# [cache] assinatura_max (entradas) no secrets.toml: cada link aberto é uma chave nova.
+# Escritas de assinatura invalidam pelo id (mapeado para o token na leitura).
+_MAX_TOKENS = int(get_section("cache").get("assinatura_max", 5000))
+token_cache = TTLCache(ttl=float(get_section("cache").get("assinatura_ttl", 300)), max_entries=_MAX_TOKENS)
+_token_por_id = {}
+_token_lock = threading.Lock()
+
+
+class _NaoEncontrado(Exception):
+    """Token sem contrato: não vai para o cache (o contrato pode ser criado logo depois)."""
+
+
+def _lembrar_token(contrato_id, token):
+    """id -> token para a invalidação, com o mesmo limite de tamanho do token_cache (sai o mais antigo)."""
+    with _token_lock:
+        _token_por_id.pop(contrato_id, None)
+        _token_por_id[contrato_id] = token
+        while len(_token_por_id) > _MAX_TOKENS:
+            del _token_por_id[next(iter(_token_por_id))]
+
+
+def _invalidar_tokens(tokens):
+    token_cache.invalidate(*[(token, perfil) for token in tokens for perfil in PERFIS["contratos"]])
+
+
+def _invalidar_contrato(contrato_id):
+    with _token_lock:
+        token = _token_por_id.pop(contrato_id, None)
+    if token is not None:
+        _invalidar_tokens([token])
+    else:
+        # Sem o token (mapeamento descartado, ou leitura ainda em andamento neste
+        # processo): limpa o cache inteiro, o que também avança a geração e impede
+        # que uma leitura em curso grave o contrato com o status antigo
+        token_cache.invalidate()
+
+
+class AsyncContratoRepository:
+    """
+    Versão assíncrona do ContratoRepository. Não trata erros: exceções sobem para
+    quem chama (o ContratoRepository ou a página que junta consultas com em_paralelo).
+    """
+
+    @staticmethod
+    @medir
+    async def listar_todos(perfil: str = LISTA):
+        response = await supabase_async.table("contratos")\
+            .select(colunas("contratos", perfil))\
+            .order("created_at", desc=True)\
+            .execute()
+        return response.data
+
+    @staticmethod
+    @medir
+    async def buscar_por_id_detalhado(contrato_id: str, perfil: str = COMPLETO):
+        response = await supabase_async.table("contratos").select(colunas("contratos", perfil)).eq("id", contrato_id).execute()
+        return response.data[0] if response.data else None
+
+    @staticmethod
+    @medir
+    async def buscar_por_token(token: str, perfil: str = COMPLETO):
+        async def carregar():
+            response = await supabase_async.table("contratos").select(colunas("contratos", perfil)).eq("token_acesso", token).execute()
+            if not response.data:
+                raise _NaoEncontrado()
+            _lembrar_token(response.data[0]["id"], token)
+            return response.data[0]
+        try:
+            return await token_cache.aget_or_load((token, perfil), carregar)
+        except _NaoEncontrado:
+            return None
+
+    @staticmethod
+    @medir
+    async def criar_contrato(dados: dict, parcelas: list = None):
+        # Garante status padrão se não vier
+        if "status" not in dados:
+            dados["status"] = "Pendente"
+        if parcelas is not None:
+            criados = await AsyncContratoRepository._inserir_com_parcelas([dados], parcelas)
+            return criados[0] if criados else None
+        response = await supabase_async.table("contratos").insert(dados).execute()
+        return response.data[0] if response.data else None
+
+    @staticmethod
+    @medir
+    async def criar_contratos_em_lote(lista_dados: list, parcelas: list = None):
+        if not lista_dados:
+            return []
+        for dados in lista_dados:
+            dados.setdefault("status", "Pendente")
+        if parcelas is not None:
+            return await AsyncContratoRepository._inserir_com_parcelas(lista_dados, parcelas)
+        response = await supabase_async.table("contratos").insert(lista_dados).execute()
+        return response.data
+
+    @staticmethod
+    async def _inserir_com_parcelas(lista_dados: list, parcelas: list):
+        """Contratos + parcelas (as mesmas para todos) numa requisição e numa transação (rpc)."""
+        itens = [{**dados, "parcelas": parcelas} for dados in lista_dados]
+        response = await supabase_async.rpc("criar_contratos_com_parcelas", {"contratos": itens}).execute()
+        return response.data
+
+    @staticmethod
+    @medir
+    async def registrar_assinatura(contrato_id: str, payload_assinatura: dict):
+        payload_assinatura["status"] = "Assinando"
+        payload_assinatura["assinatura_iniciada_em"] = datetime.now(timezone.utc).isoformat()
+        if "data_aceite" not in payload_assinatura:
+            payload_assinatura["data_aceite"] = datetime.now().isoformat()
+        # Só um signatário vence: o UPDATE ... WHERE status = 'Pendente' trava a linha, e quem
+        # chegar depois reavalia o filtro com o contrato já reservado (zero linhas)
+        response = await supabase_async.table("contratos")\
+            .update(payload_assinatura)\
+            .eq("id", contrato_id)\
+            .eq("status", "Pendente")\
+            .execute()
+        # Vencendo ou perdendo a corrida, a próxima leitura precisa ver o status atual
+        _invalidar_contrato(contrato_id)
+        return response.data[0] if response.data else None
+
+    @staticmethod
+    @medir
+    async def concluir_assinatura(contrato_id: str, hash_aceite: str, caminho_arquivo: str):
+        response = await supabase_async.table("contratos")\
+            .update({"status": "Assinado", "caminho_arquivo": caminho_arquivo})\
+            .eq("id", contrato_id)\
+            .eq("hash_aceite", hash_aceite)\
+            .eq("status", "Assinando")\
+            .execute()
+        _invalidar_contrato(contrato_id)
+        return True if response.data else False
+
+    @staticmethod
+    @medir
+    async def desfazer_assinatura(contrato_id: str, hash_aceite: str):
+        response = await supabase_async.table("contratos")\
+            .update({
+                "status": "Pendente", "data_aceite": None, "ip_aceite": None, "hash_aceite": None,
+                "recibo_aceite_texto": None, "assinatura_iniciada_em": None,
+            })\
+            .eq("id", contrato_id)\
+            .eq("hash_aceite", hash_aceite)\
+            .eq("status", "Assinando")\
+            .execute()
+        _invalidar_contrato(contrato_id)
+        return True if response.data else False
+
+    @staticmethod
+    @medir
+    async def listar_assinaturas_interrompidas(minutos: float, limite: int = 100):
+        limite_inicio = datetime.now(timezone.utc) - timedelta(minutes=minutos)
+        response = await supabase_async.table("contratos")\
+            .select("id, token_acesso, hash_aceite, assinatura_iniciada_em, alunos(nome_completo)")\
+            .eq("status", "Assinando")\
+            .lt("assinatura_iniciada_em", limite_inicio.isoformat())\
+            .order("assinatura_iniciada_em")\
+            .limit(limite)\
+            .execute()
+        return response.data or []
+
+    @staticmethod
+    @medir
+    async def atualizar_caminho_arquivo(contrato_id: str, caminho: str):
+        await supabase_async.table("contratos").update({"caminho_arquivo": caminho}).eq("id", contrato_id).execute()
+        _invalidar_contrato(contrato_id)
+        return True
+
+    @staticmethod
+    @medir
+    async def tokens_gravados(tokens: list):
+        if not tokens: return set()
+        response = await supabase_async.table("contratos")\
+            .select("token_acesso")\
+            .in_("token_acesso", list(tokens))\
+            .execute()
+        return {c["token_acesso"] for c in response.data or []}
+
+    @staticmethod
+    @medir
+    async def marcar_email_na_fila(tokens: list):
+        if not tokens: return 0
+        await supabase_async.table("contratos")\
+            .update({"email_status": "na_fila", "email_erro": None}, returning=ReturnMethod.minimal)\
+            .in_("token_acesso", list(tokens))\
+            .execute()
+        _invalidar_tokens(tokens)
+        return len(tokens)
+
+    @staticmethod
+    @medir
+    async def registrar_envio_email(token: str, destinatario: str, erro: str = None):
+        await supabase_async.rpc("registrar_envio_email", {
+            "token": token, "destinatario": destinatario, "erro": erro,
+        }).execute()
+        _invalidar_tokens([token])
+
+    @staticmethod
+    @medir
+    async def situacao_emails(tokens: list):
+        if not tokens: return {}
+        response = await supabase_async.table("contratos")\
+            .select(colunas("contratos", ENVIO_EMAIL))\
+            .in_("token_acesso", list(tokens))\
+            .execute()
+        return {c["token_acesso"]: c for c in response.data or []}
+
 
 class ContratoRepository:
     """
     Repositório para a tabela 'contratos'.
     Lida com a criação, consulta e atualização de assinaturas.
+    Fachada síncrona sobre o AsyncContratoRepository.
     """
 
     @staticmethod
-    def listar_todos():
+    def listar_todos(perfil: str = LISTA):
         """
         Retorna todos os contratos com dados básicos.
         """
         try:
-            query = "id, status, valor_final, created_at, alunos(nome_completo, cpf), turmas(codigo_turma, cursos(nome))"
-            
-            response = supabase.table("contratos")\
-                .select(query)\
-                .order("created_at", desc=True)\
-                .execute()
-            return response.data
+            return run_sync(AsyncContratoRepository.listar_todos(perfil))
         except Exception as e:
             print(f"Erro ao listar contratos: {e}")
             return []
 
     @staticmethod
-    def buscar_por_id_detalhado(contrato_id: str):
-        """Busca todos os campos de um contrato."""
+    def buscar_por_id_detalhado(contrato_id: str, perfil: str = COMPLETO):
+        """Busca um contrato com aluno, turma e curso (colunas conforme o perfil)."""
         try:
-            query = "*, alunos(*), turmas(*, cursos(*))"
-            response = supabase.table("contratos").select(query).eq("id", contrato_id).execute()
-            return response.data[0] if response.data else None
+            return run_sync(AsyncContratoRepository.buscar_por_id_detalhado(contrato_id, perfil))
         except Exception as e:
             print(f"Erro ao buscar contrato {contrato_id}: {e}")
             return None
 
     @staticmethod
-    def buscar_por_token(token: str):
-        """Busca contrato pelo token de acesso."""
+    def buscar_por_token(token: str, perfil: str = COMPLETO):
+        """Busca contrato pelo token de acesso. Servido pelo token_cache (só tokens encontrados)."""
         try:
-            query = "*, alunos(*), turmas(*, cursos(*))"
-            response = supabase.table("contratos").select(query).eq("token_acesso", token).execute()
-            return response.data[0] if response.data else None
+            return run_sync(AsyncContratoRepository.buscar_por_token(token, perfil))
         except Exception as e:
             print(f"Erro ao buscar token {token}: {e}")
             return None
 
     @staticmethod
-    def criar_contrato(dados: dict):
+    def criar_contrato(dados: dict, parcelas: list = None):
         """
-        Insere um novo contrato.
+        Insere um novo contrato (e suas parcelas, se informadas, na mesma requisição).
         ALTERAÇÃO CRÍTICA: Se der erro, retorna um dicionário com a chave 'error'
         para que o Streamlit possa exibir o motivo na tela.
         """
         try:
-            # Garante status padrão se não vier
-            if "status" not in dados:
-                dados["status"] = "Pendente"
-            
-            # Tenta inserir
-            response = supabase.table("contratos").insert(dados).execute()
-            
+            criado = run_sync(AsyncContratoRepository.criar_contrato(dados, parcelas))
+
             # Se inseriu com sucesso, retorna os dados da linha criada
-            if response.data and len(response.data) > 0:
-                return response.data[0]
+            if criado:
+                return criado
             else:
                 return {"error": "O Supabase não retornou dados de confirmação."}
 
@@ -72,31 +274,122 @@ class ContratoRepository:
             # Retornamos o erro como texto para aparecer na tela do usuário
             return {"error": str(e)}
 
+    @staticmethod
+    def criar_contratos_em_lote(lista_dados: list, parcelas: list = None):
+        """
+        Insere vários contratos em uma única requisição.
+        `parcelas` (comuns a todos os contratos do lote) são gravadas na mesma requisição.
+        Mesmo contrato de retorno do criar_contrato: lista das linhas criadas
+        ou dicionário com a chave 'error'.
+        """
+        if not lista_dados:
+            return []
+        try:
+            criados = run_sync(AsyncContratoRepository.criar_contratos_em_lote(lista_dados, parcelas))
+            if criados:
+                return criados
+            return {"error": "O Supabase não retornou dados de confirmação."}
+        except Exception as e:
+            return {"error": str(e)}
+
     @staticmethod
     def registrar_assinatura(contrato_id: str, payload_assinatura: dict):
         """
-        Atualiza o contrato com os dados da assinatura digital.
+        Reserva a assinatura: grava os dados do aceite e passa o contrato de 'Pendente'
+        para 'Assinando', só se ainda estiver 'Pendente' (caminho_arquivo não muda).
+        O contrato só vira 'Assinado' em concluir_assinatura, com a via assinada já no Storage.
+        Retorna a linha atualizada, ou None se o contrato já foi assinado (ou em erro).
         """
         try:
-            payload_assinatura["status"] = "Assinado"
-            if "data_aceite" not in payload_assinatura:
-                payload_assinatura["data_aceite"] = datetime.now().isoformat()
-            
-            response = supabase.table("contratos")\
-                .update(payload_assinatura)\
-                .eq("id", contrato_id)\
-                .execute()
-            return True
+            return run_sync(AsyncContratoRepository.registrar_assinatura(contrato_id, payload_assinatura))
         except Exception as e:
             print(f"Erro ao registrar assinatura: {e}")
+            return None
+
+    @staticmethod
+    def concluir_assinatura(contrato_id: str, hash_aceite: str, caminho_arquivo: str):
+        """
+        'Assinando' -> 'Assinado', apontando caminho_arquivo para a via assinada já enviada.
+        O filtro pelo hash garante que só a assinatura reservada por quem chama é concluída.
+        """
+        try:
+            return run_sync(AsyncContratoRepository.concluir_assinatura(contrato_id, hash_aceite, caminho_arquivo))
+        except Exception as e:
+            print(f"Erro ao concluir assinatura: {e}")
             return False
 
+    @staticmethod
+    def desfazer_assinatura(contrato_id: str, hash_aceite: str):
+        """
+        Volta o contrato de 'Assinando' para 'Pendente' quando a via assinada não pôde ser gerada.
+        O filtro pelo hash garante que só a assinatura que falhou é desfeita.
+        """
+        try:
+            return run_sync(AsyncContratoRepository.desfazer_assinatura(contrato_id, hash_aceite))
+        except Exception as e:
+            print(f"Erro ao desfazer assinatura: {e}")
+            return False
+
+    @staticmethod
+    def listar_assinaturas_interrompidas(minutos: float = 10, limite: int = 100):
+        """Contratos parados em 'Assinando' há mais de `minutos` (processo caiu no meio da assinatura)."""
+        try:
+            return run_sync(AsyncContratoRepository.listar_assinaturas_interrompidas(minutos, limite))
+        except Exception as e:
+            print(f"Erro ao listar assinaturas interrompidas: {e}")
+            return []
+
     @staticmethod
     def atualizar_caminho_arquivo(contrato_id: str, caminho: str):
         """Salva o link do PDF gerado no storage."""
         try:
-            supabase.table("contratos").update({"caminho_arquivo": caminho}).eq("id", contrato_id).execute()
-            return True
+            return run_sync(AsyncContratoRepository.atualizar_caminho_arquivo(contrato_id, caminho))
         except Exception as e:
             print(f"Erro ao atualizar caminho: {e}")
             return False
+
+    @staticmethod
+    def tokens_gravados(tokens: list):
+        """
+        Quais destes tokens já têm contrato gravado (set), ex. para conferir um insert
+        que devolveu erro. None se a consulta falhar: não dá para saber.
+        """
+        try:
+            return run_sync(AsyncContratoRepository.tokens_gravados(tokens))
+        except Exception as e:
+            print(f"Erro ao conferir contratos gravados: {e}")
+            return None
+
+    @staticmethod
+    def marcar_email_na_fila(tokens: list):
+        """
+        Registra o pedido de envio do link ('na_fila') nos contratos, antes de enfileirar
+        os jobs: o resultado gravado pelo worker nunca é sobrescrito por este pedido.
+        """
+        try:
+            return run_sync(AsyncContratoRepository.marcar_email_na_fila(tokens))
+        except Exception as e:
+            print(f"Erro ao registrar e-mails na fila: {e}")
+            return 0
+
+    @staticmethod
+    def registrar_envio_email(token: str, destinatario: str, erro: str = None):
+        """Grava o resultado de uma tentativa de envio do link (erro=None: enviado)."""
+        try:
+            run_sync(AsyncContratoRepository.registrar_envio_email(token, destinatario, erro))
+            return True
+        except Exception as e:
+            print(f"Erro ao registrar envio de e-mail do contrato: {e}")
+            return False
+
+    @staticmethod
+    def situacao_emails(tokens: list):
+        """
+        Situação do e-mail de cada contrato numa consulta: {token: {email_status,
+        email_destinatario, email_tentativas, email_erro, email_enviado_em}}.
+        """
+        try:
+            return run_sync(AsyncContratoRepository.situacao_emails(tokens))
+        except Exception as e:
+            print(f"Erro ao consultar envio de e-mails: {e}")
+            return {}
@@ -1,43 +1,118 @@
-from src.database.connection import supabase
+from src.database.async_connection import supabase_async, run_sync
+from src.database.cache import TTLCache
+from src.database.instrumentation import medir
+from src.database.projections import colunas, PERFIS, COMPLETO
+from src.utils.settings import get_section
 import streamlit as st
 
+# Catálogo de cursos/turmas: muda raramente e é lido a cada rerun das páginas.
+# TTL configurável em [cache] catalogo_ttl (segundos) no secrets.toml.
+_CATALOGO = "cursos_com_turmas"
+_CURSOS_ATIVOS = "cursos_ativos"
+catalogo_cache = TTLCache(ttl=float(get_section("cache").get("catalogo_ttl", 300)))
+
+
+def _chaves(*consultas):
+    """Chaves do cache (consulta, perfil) de todas as projeções das consultas informadas."""
+    return [(consulta, perfil) for consulta in consultas for perfil in PERFIS["cursos"]]
+
+
+class AsyncCursoRepository:
+    """
+    Versão assíncrona do CursoRepository. Não trata erros: exceções sobem para
+    quem chama (o CursoRepository ou a página que junta consultas com em_paralelo).
+    """
+
+    @staticmethod
+    @medir
+    async def listar_todos_com_turmas(perfil: str = COMPLETO):
+        async def carregar():
+            response = await supabase_async.table("cursos")\
+                .select(f"{colunas('cursos', perfil)}, turmas({colunas('turmas', perfil)})")\
+                .order("nome")\
+                .execute()
+            return response.data
+        return await catalogo_cache.aget_or_load((_CATALOGO, perfil), carregar)
+
+    @staticmethod
+    @medir
+    async def listar_cursos_ativos(perfil: str = COMPLETO):
+        async def carregar():
+            response = await supabase_async.table("cursos")\
+                .select(colunas("cursos", perfil))\
+                .eq("ativo", True)\
+                .order("nome")\
+                .execute()
+            return response.data
+        return await catalogo_cache.aget_or_load((_CURSOS_ATIVOS, perfil), carregar)
+
+    @staticmethod
+    @medir
+    async def criar_curso(dados: dict):
+        response = await supabase_async.table("cursos").insert(dados).execute()
+        catalogo_cache.invalidate(*_chaves(_CATALOGO, _CURSOS_ATIVOS))
+        return response.data[0] if response.data else None
+
+    @staticmethod
+    @medir
+    async def atualizar_curso(curso_id: int, dados: dict):
+        # Garante que o ID não seja alterado
+        dados.pop('id', None)
+        response = await supabase_async.table("cursos").update(dados).eq("id", curso_id).execute()
+        catalogo_cache.invalidate(*_chaves(_CATALOGO, _CURSOS_ATIVOS))
+        return response.data[0] if response.data else None
+
+    @staticmethod
+    @medir
+    async def criar_turma(dados: dict):
+        response = await supabase_async.table("turmas").insert(dados).execute()
+        catalogo_cache.invalidate(*_chaves(_CATALOGO))
+        return response.data[0] if response.data else None
+
+    @staticmethod
+    @medir
+    async def atualizar_turma(turma_id: int, dados: dict):
+        dados.pop('id', None)
+        response = await supabase_async.table("turmas").update(dados).eq("id", turma_id).execute()
+        catalogo_cache.invalidate(*_chaves(_CATALOGO))
+        return response.data[0] if response.data else None
+
+    @staticmethod
+    @medir
+    async def inativar_turma(turma_id: int, status: bool):
+        response = await supabase_async.table("turmas").update({"ativo": status}).eq("id", turma_id).execute()
+        catalogo_cache.invalidate(*_chaves(_CATALOGO))
+        return True if response.data else False
+
+
 class CursoRepository:
     """
     Repositório para operações nas tabelas 'cursos' e 'turmas'.
     Esquema validado: IDs tipo bigint, campos ativo (boolean).
+    Fachada síncrona sobre o AsyncCursoRepository.
     """
 
     @staticmethod
-    def listar_todos_com_turmas():
-        """Lista cursos e aninha as turmas relacionadas (JOIN)."""
+    def listar_todos_com_turmas(perfil: str = COMPLETO):
+        """Lista cursos e aninha as turmas relacionadas (JOIN). Servido pelo catalogo_cache."""
         try:
-            response = supabase.table("cursos")\
-                .select("*, turmas(*)")\
-                .order("nome")\
-                .execute()
-            return response.data
+            return run_sync(AsyncCursoRepository.listar_todos_com_turmas(perfil))
         except Exception as e:
             print(f"Erro ao listar cursos e turmas: {e}")
             return []
 
     @staticmethod
-    def listar_cursos_ativos():
+    def listar_cursos_ativos(perfil: str = COMPLETO):
         """Lista apenas cursos ativos para preenchimento de seletores."""
         try:
-            response = supabase.table("cursos")\
-                .select("*")\
-                .eq("ativo", True)\
-                .order("nome")\
-                .execute()
-            return response.data
+            return run_sync(AsyncCursoRepository.listar_cursos_ativos(perfil))
         except Exception as e:
             return []
 
     @staticmethod
     def criar_curso(dados: dict):
         try:
-            response = supabase.table("cursos").insert(dados).execute()
-            return response.data[0] if response.data else None
+            return run_sync(AsyncCursoRepository.criar_curso(dados))
         except Exception as e:
             st.error(f"Erro ao criar curso: {e}")
             return None
@@ -46,10 +121,7 @@ class CursoRepository:
     def atualizar_curso(curso_id: int, dados: dict):
         """Atualiza dados do curso (nome, valor_bruto, ativo)."""
         try:
-            # Garante que o ID não seja alterado
-            dados.pop('id', None)
-            response = supabase.table("cursos").update(dados).eq("id", curso_id).execute()
-            return response.data[0] if response.data else None
+            return run_sync(AsyncCursoRepository.atualizar_curso(curso_id, dados))
         except Exception as e:
             st.error(f"Erro ao atualizar curso: {e}")
             return None
@@ -60,8 +132,7 @@ class CursoRepository:
     def criar_turma(dados: dict):
         """Cria nova turma vinculada a um curso_id."""
         try:
-            response = supabase.table("turmas").insert(dados).execute()
-            return response.data[0] if response.data else None
+            return run_sync(AsyncCursoRepository.criar_turma(dados))
         except Exception as e:
             st.error(f"Erro ao criar turma: {e}")
             return None
@@ -70,9 +141,7 @@ class CursoRepository:
     def atualizar_turma(turma_id: int, dados: dict):
         """Atualiza dados da turma (data_inicio, data_fim, formato, ativo)."""
         try:
-            dados.pop('id', None)
-            response = supabase.table("turmas").update(dados).eq("id", turma_id).execute()
-            return response.data[0] if response.data else None
+            return run_sync(AsyncCursoRepository.atualizar_turma(turma_id, dados))
         except Exception as e:
             st.error(f"Erro ao atualizar turma: {e}")
             return None
@@ -81,7 +150,11 @@ class CursoRepository:
     def inativar_turma(turma_id: int, status: bool):
         """Helper para ativar/inativar (soft delete) uma turma específica."""
         try:
-            response = supabase.table("turmas").update({"ativo": status}).eq("id", turma_id).execute()
-            return True if response.data else False
+            return run_sync(AsyncCursoRepository.inativar_turma(turma_id, status))
         except Exception as e:
             return False
+
+    @staticmethod
+    def cache_stats() -> dict:
+        """Hits/misses do cache do catálogo (cada hit é uma consulta a menos no Supabase)."""
+        return catalogo_cache.stats()
@@ -0,0 +1,90 @@
+from datetime import datetime, timezone
+from src.database.async_connection import supabase_async, run_sync
+from src.database.instrumentation import medir
+from postgrest.types import ReturnMethod
+
+
+class AsyncLembreteRepository:
+    """
+    Versão assíncrona do LembreteRepository. Não trata erros: exceções sobem para
+    quem chama (o LembreteRepository).
+    """
+
+    @staticmethod
+    @medir
+    async def reservar(etapa_dias: int, proxima_dias: int = None, limite: int = 50,
+                       max_tentativas: int = 3, reenviar_apos_minutos: int = 30,
+                       enviando_timeout_minutos: int = 30):
+        response = await supabase_async.rpc("reservar_lembretes", {
+            "etapa_dias": etapa_dias,
+            "proxima_dias": proxima_dias,
+            "limite": limite,
+            "max_tentativas": max_tentativas,
+            "reenviar_apos_minutos": reenviar_apos_minutos,
+            "enviando_timeout_minutos": enviando_timeout_minutos,
+        }).execute()
+        return response.data or []
+
+    @staticmethod
+    @medir
+    async def registrar_envios(etapa: int, contrato_ids: list):
+        if not contrato_ids: return 0
+        await supabase_async.table("lembretes_assinatura")\
+            .update({"status": "enviado", "erro": None, "enviado_em": datetime.now(timezone.utc).isoformat()},
+                    returning=ReturnMethod.minimal)\
+            .eq("etapa", etapa)\
+            .in_("contrato_id", list(contrato_ids))\
+            .execute()
+        return len(contrato_ids)
+
+    @staticmethod
+    @medir
+    async def registrar_falha(etapa: int, contrato_id: str, erro: str):
+        await supabase_async.table("lembretes_assinatura")\
+            .update({"status": "falhou", "erro": erro}, returning=ReturnMethod.minimal)\
+            .eq("etapa", etapa)\
+            .eq("contrato_id", contrato_id)\
+            .execute()
+
+
+class LembreteRepository:
+    """
+    Lembretes de assinatura enviados para contratos pendentes ('lembretes_assinatura').
+    Cada (contrato, etapa) é reservado no banco antes do envio: o mesmo lembrete
+    não sai duas vezes, mesmo com mais de um agendador rodando.
+    """
+
+    @staticmethod
+    def reservar(etapa_dias: int, proxima_dias: int = None, limite: int = 50,
+                 max_tentativas: int = 3, reenviar_apos_minutos: int = 30,
+                 enviando_timeout_minutos: int = 30):
+        """
+        Reserva até `limite` lembretes devidos da etapa (rpc reservar_lembretes).
+        Também retoma reservas presas em 'enviando' há mais de `enviando_timeout_minutos`
+        (processo caiu antes de registrar o resultado).
+        Retorna [{contrato_id, etapa, tentativas, token_acesso, nome_aluno, email, nome_curso}].
+        """
+        try:
+            return run_sync(AsyncLembreteRepository.reservar(
+                etapa_dias, proxima_dias, limite, max_tentativas, reenviar_apos_minutos, enviando_timeout_minutos
+            ))
+        except Exception as e:
+            print(f"Erro ao reservar lembretes: {e}")
+            return []
+
+    @staticmethod
+    def registrar_envios(etapa: int, contrato_ids: list):
+        """Marca os lembretes da etapa como enviados (uma requisição para o lote)."""
+        try:
+            return run_sync(AsyncLembreteRepository.registrar_envios(etapa, contrato_ids))
+        except Exception as e:
+            print(f"Erro ao registrar lembretes enviados: {e}")
+            return 0
+
+    @staticmethod
+    def registrar_falha(etapa: int, contrato_id: str, erro: str):
+        """Marca o lembrete como 'falhou': volta na próxima execução, até max_tentativas."""
+        try:
+            run_sync(AsyncLembreteRepository.registrar_falha(etapa, contrato_id, erro))
+        except Exception as e:
+            print(f"Erro ao registrar falha de lembrete: {e}")
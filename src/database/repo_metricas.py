@@ -0,0 +1,89 @@
+import asyncio
+from datetime import date
+from dateutil.relativedelta import relativedelta
+from src.database.async_connection import supabase_async, run_sync
+from src.database.cache import TTLCache
+from src.database.instrumentation import medir
+from src.database.projections import colunas, COMPLETO
+from src.utils.settings import get_section
+
+# Métricas do painel: somadas no banco por triggers (contratos_por_status e
+# metricas_mensais), lidas em duas consultas de poucas linhas e guardadas por
+# [cache] painel_ttl segundos (padrão 30) para todas as sessões.
+painel_cache = TTLCache(ttl=float(get_section("cache").get("painel_ttl", 30)))
+
+
+class AsyncMetricaRepository:
+    """
+    Versão assíncrona do MetricaRepository. Não trata erros: exceções sobem para
+    quem chama (o MetricaRepository ou a página que junta consultas com em_paralelo).
+    """
+
+    @staticmethod
+    @medir
+    async def por_status():
+        response = await supabase_async.table("contratos_por_status").select(colunas("contratos_por_status", COMPLETO)).execute()
+        return response.data
+
+    @staticmethod
+    @medir
+    async def mensais(meses: list):
+        response = await supabase_async.table("metricas_mensais")\
+            .select(colunas("metricas_mensais", COMPLETO))\
+            .in_("mes", [m.isoformat() for m in meses])\
+            .execute()
+        return response.data
+
+    @staticmethod
+    async def painel(referencia: date):
+        mes = referencia.replace(day=1)
+        anterior = mes - relativedelta(months=1)
+
+        async def carregar():
+            por_status, mensais = await asyncio.gather(
+                AsyncMetricaRepository.por_status(), AsyncMetricaRepository.mensais([mes, anterior])
+            )
+            return _montar_painel(por_status, mensais, mes, anterior)
+        return await painel_cache.aget_or_load(("painel", mes), carregar)
+
+
+def _montar_painel(por_status: list, mensais: list, mes: date, anterior: date) -> dict:
+    status = {l["status"]: l for l in por_status}
+    eventos = {(l["mes"][:10], l["metrica"]): l for l in mensais}
+
+    def evento(metrica, quando):
+        return eventos.get((quando.isoformat(), metrica), {"quantidade": 0, "valor": 0})
+
+    return {
+        # 'Assinando': aceite registrado, via assinada ainda sendo gerada
+        "pendentes": int(sum(status.get(s, {}).get("quantidade", 0) for s in ("Pendente", "Assinando"))),
+        "assinados_total": int(status.get("Assinado", {}).get("quantidade", 0)),
+        "assinados_mes": int(evento("contratos_assinados", mes)["quantidade"]),
+        "assinados_mes_anterior": int(evento("contratos_assinados", anterior)["quantidade"]),
+        "criados_mes": int(evento("contratos_criados", mes)["quantidade"]),
+        "alunos_novos_mes": int(evento("alunos_novos", mes)["quantidade"]),
+        "alunos_novos_mes_anterior": int(evento("alunos_novos", anterior)["quantidade"]),
+        "receita_mes": float(evento("contratos_assinados", mes)["valor"]),
+        "receita_mes_anterior": float(evento("contratos_assinados", anterior)["valor"]),
+        "receita_total": float(status.get("Assinado", {}).get("valor", 0)),
+    }
+
+
+class MetricaRepository:
+    """
+    Leitura das métricas agregadas do painel principal.
+    O custo não depende do volume de contratos: os totais são mantidos pelo banco.
+    """
+
+    @staticmethod
+    def painel(referencia: date = None):
+        """
+        Contratos pendentes, assinaturas, alunos novos e receita (soma de valor_final
+        dos contratos assinados) do mês de `referencia` e do mês anterior.
+        Retorna None se as métricas não puderem ser lidas.
+        """
+        try:
+            return run_sync(AsyncMetricaRepository.painel(referencia or date.today()))
+        except Exception as e:
+            print(f"Erro ao carregar métricas do painel: {e}")
+            return None
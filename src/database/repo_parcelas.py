@@ -0,0 +1,89 @@
+from datetime import date
+from dateutil.relativedelta import relativedelta
+from src.database.async_connection import supabase_async, run_sync
+from src.database.instrumentation import medir
+from src.database.projections import colunas, LISTA
+
+
+def intervalo_mes(referencia: date = None, deslocamento: int = 0) -> tuple:
+    """(primeiro dia, primeiro dia do mês seguinte) do mês de `referencia` + `deslocamento` meses."""
+    inicio = (referencia or date.today()).replace(day=1) + relativedelta(months=deslocamento)
+    return inicio, inicio + relativedelta(months=1)
+
+
+class AsyncParcelaRepository:
+    """
+    Versão assíncrona do ParcelaRepository. Não trata erros: exceções sobem para
+    quem chama (o ParcelaRepository ou a página que junta consultas com em_paralelo).
+    """
+
+    @staticmethod
+    @medir
+    async def listar_por_vencimento(inicio: date, fim: date, status: str = None, perfil: str = LISTA):
+        query = supabase_async.table("parcelas")\
+            .select(colunas("parcelas", perfil))\
+            .gte("vencimento", inicio.isoformat())\
+            .lt("vencimento", fim.isoformat())
+        if status:
+            query = query.eq("status", status)
+        response = await query.order("vencimento").order("id").execute()
+        return response.data
+
+    @staticmethod
+    @medir
+    async def listar_por_contrato(contrato_id: str, perfil: str = LISTA):
+        response = await supabase_async.table("parcelas")\
+            .select(colunas("parcelas", perfil))\
+            .eq("contrato_id", contrato_id)\
+            .order("tipo")\
+            .order("numero")\
+            .execute()
+        return response.data
+
+    @staticmethod
+    @medir
+    async def atualizar_status(parcela_id: int, status: str, pago_em: str = None):
+        response = await supabase_async.table("parcelas")\
+            .update({"status": status, "pago_em": pago_em})\
+            .eq("id", parcela_id)\
+            .execute()
+        return True if response.data else False
+
+
+class ParcelaRepository:
+    """
+    Repositório para a tabela 'parcelas' (entrada e saldo de cada contrato).
+    As parcelas são criadas junto com o contrato (ContratoRepository com `parcelas`);
+    aqui ficam as consultas de recebíveis e a baixa.
+    """
+
+    @staticmethod
+    def listar_por_vencimento(inicio: date, fim: date, status: str = None, perfil: str = LISTA):
+        """
+        Parcelas com vencimento em [inicio, fim), opcionalmente só de um status.
+        Atendida pelos índices (vencimento) e (status, vencimento).
+        Ex.: listar_por_vencimento(*intervalo_mes(deslocamento=1), status="Aberta")
+        """
+        try:
+            return run_sync(AsyncParcelaRepository.listar_por_vencimento(inicio, fim, status, perfil))
+        except Exception as e:
+            print(f"Erro ao listar parcelas: {e}")
+            return []
+
+    @staticmethod
+    def listar_por_contrato(contrato_id: str, perfil: str = LISTA):
+        """Parcelas de um contrato: entradas e depois saldo, em ordem."""
+        try:
+            return run_sync(AsyncParcelaRepository.listar_por_contrato(contrato_id, perfil))
+        except Exception as e:
+            print(f"Erro ao listar parcelas do contrato {contrato_id}: {e}")
+            return []
+
+    @staticmethod
+    def atualizar_status(parcela_id: int, status: str, pago_em: str = None):
+        """Muda o status ('Aberta', 'Paga', 'Cancelada'); pago_em em ISO na baixa."""
+        try:
+            return run_sync(AsyncParcelaRepository.atualizar_status(parcela_id, status, pago_em))
+        except Exception as e:
+            print(f"Erro ao atualizar parcela {parcela_id}: {e}")
+            return False
@@ -1,33 +1,75 @@
-from src.database.connection import supabase
+from src.database.async_connection import supabase_async, run_sync
+from src.database.instrumentation import medir
+from src.database.projections import colunas, LISTA, COMPLETO
 import streamlit as st
 
+
+class AsyncUsuarioRepository:
+    """
+    Versão assíncrona do UsuarioRepository. Não trata erros: exceções sobem para
+    quem chama (o UsuarioRepository ou a página que junta consultas com em_paralelo).
+    """
+
+    @staticmethod
+    @medir
+    async def listar_todos(perfil: str = LISTA):
+        response = await supabase_async.table("usuarios").select(colunas("usuarios", perfil)).order("nome").execute()
+        return response.data
+
+    @staticmethod
+    @medir
+    async def buscar_por_email(email: str, perfil: str = COMPLETO):
+        # Busca apenas utilizadores ativos para login
+        response = await supabase_async.table("usuarios")\
+            .select(colunas("usuarios", perfil))\
+            .eq("email", email)\
+            .eq("ativo", True)\
+            .execute()
+        return response.data[0] if response.data else None
+
+    @staticmethod
+    @medir
+    async def criar_usuario(dados: dict):
+        response = await supabase_async.table("usuarios").insert(dados).execute()
+        return response.data[0] if response.data else None
+
+    @staticmethod
+    @medir
+    async def atualizar_status(user_id: str, novo_status: bool):
+        response = await supabase_async.table("usuarios")\
+            .update({"ativo": novo_status})\
+            .eq("id", user_id)\
+            .execute()
+        return True if response.data else False
+
+    @staticmethod
+    @medir
+    async def eliminar_usuario(user_id: str):
+        response = await supabase_async.table("usuarios").delete().eq("id", user_id).execute()
+        return True if response.data else False
+
+
 class UsuarioRepository:
     """
     Repositório para operações CRUD na tabela 'usuarios'.
     Esquema validado: id (uuid), nome, email, senha_hash, perfil, ativo (bool).
+    Fachada síncrona sobre o AsyncUsuarioRepository.
     """
     
     @staticmethod
-    def listar_todos():
-        """Retorna todos os utilizadores registados ordenados por nome."""
+    def listar_todos(perfil: str = LISTA):
+        """Retorna todos os utilizadores registados ordenados por nome (sem senha_hash no perfil 'lista')."""
         try:
-            response = supabase.table("usuarios").select("*").order("nome").execute()
-            return response.data
+            return run_sync(AsyncUsuarioRepository.listar_todos(perfil))
         except Exception as e:
             st.error(f"Erro ao listar utilizadores: {e}")
             return []
 
     @staticmethod
-    def buscar_por_email(email: str):
+    def buscar_por_email(email: str, perfil: str = COMPLETO):
         """Procura um utilizador ativo pelo e-mail para o processo de login."""
         try:
-            # Busca apenas utilizadores ativos para login
-            response = supabase.table("usuarios")\
-                .select("*")\
-                .eq("email", email)\
-                .eq("ativo", True)\
-                .execute()
-            return response.data[0] if response.data else None
+            return run_sync(AsyncUsuarioRepository.buscar_por_email(email, perfil))
         except Exception as e:
             return None
 
@@ -38,8 +80,7 @@ class UsuarioRepository:
         Retorna o registo criado ou None em caso de erro.
         """
         try:
-            response = supabase.table("usuarios").insert(dados).execute()
-            return response.data[0] if response.data else None
+            return run_sync(AsyncUsuarioRepository.criar_usuario(dados))
         except Exception as e:
             st.error(f"Erro ao criar utilizador: {e}")
             return None
@@ -48,11 +89,7 @@ class UsuarioRepository:
     def atualizar_status(user_id: str, novo_status: bool):
         """Ativa ou desativa um utilizador (soft delete) usando UUID."""
         try:
-            response = supabase.table("usuarios")\
-                .update({"ativo": novo_status})\
-                .eq("id", user_id)\
-                .execute()
-            return True if response.data else False
+            return run_sync(AsyncUsuarioRepository.atualizar_status(user_id, novo_status))
         except Exception as e:
             return False
 
@@ -60,8 +97,7 @@ class UsuarioRepository:
     def eliminar_usuario(user_id: str):
         """Remove permanentemente um utilizador do banco de dados pelo UUID."""
         try:
-            response = supabase.table("usuarios").delete().eq("id", user_id).execute()
-            return True if response.data else False
+            return run_sync(AsyncUsuarioRepository.eliminar_usuario(user_id))
         except Exception as e:
             st.error(f"Erro ao eliminar utilizador: {e}")
             return False
@@ -0,0 +1,202 @@
+"""
+Transporte HTTP compartilhado pelo PostgREST e pelo Storage do cliente Supabase.
+
+Um único httpx.Client com pool de conexões configurável (tamanho, keep-alive, HTTP/2)
+e timeouts por operação: o hook de requisição escolhe o timeout pelo tipo de chamada
+(consulta, rpc, upload ou download), já que as bibliotecas do Supabase não repassam
+timeout por requisição.
+
+Configuração opcional no secrets.toml (valores em segundos):
+    [http]
+    max_connections = 20
+    max_keepalive_connections = 20
+    keepalive_expiry = 30
+    http2 = true
+    connect_timeout = 5
+    pool_timeout = 10
+    rest_timeout = 30
+    rpc_timeout = 60
+    upload_timeout = 120
+    download_timeout = 120
+"""
+import threading
+import httpx
+from src.utils.settings import get_section
+
+try:
+    import h2  # noqa: F401  (dependência opcional do HTTP/2 no httpx)
+    HAS_HTTP2 = True
+except ImportError:
+    HAS_HTTP2 = False
+
+OPERACOES = ("rest", "rpc", "upload", "download")
+
+_PADRAO = {
+    "max_connections": 20,
+    "max_keepalive_connections": 20,
+    "keepalive_expiry": 30.0,
+    "http2": True,
+    "connect_timeout": 5.0,
+    "pool_timeout": 10.0,
+    "rest_timeout": 30.0,
+    "rpc_timeout": 60.0,
+    "upload_timeout": 120.0,
+    "download_timeout": 120.0,
+}
+
+
+def transport_settings() -> dict:
+    cfg = dict(_PADRAO)
+    cfg.update(get_section("http"))
+    return cfg
+
+
+def operacao(request: httpx.Request) -> str:
+    """Classifica a requisição: rest, rpc, upload, download (ou 'outro', ex.: auth)."""
+    path = request.url.path
+    if "/rest/v1/rpc/" in path:
+        return "rpc"
+    if "/rest/v1/" in path:
+        return "rest"
+    if "/storage/v1/" in path:
+        return "upload" if request.method in ("POST", "PUT") else "download"
+    return "outro"
+
+
+class PoolMetrics:
+    """Contadores de requisições por operação e ocupação do pool de conexões."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.em_andamento = 0
+        self.pico_em_andamento = 0
+        self.requisicoes = {}
+
+    def inicio(self, request: httpx.Request):
+        op = operacao(request)
+        request.extensions["nexus_operacao"] = op
+        with self._lock:
+            self.em_andamento += 1
+            self.pico_em_andamento = max(self.pico_em_andamento, self.em_andamento)
+            self.requisicoes[op] = self.requisicoes.get(op, 0) + 1
+
+    def fim(self, response: httpx.Response):
+        with self._lock:
+            self.em_andamento = max(0, self.em_andamento - 1)
+
+
+class _TransporteMedido(httpx.HTTPTransport):
+    """HTTPTransport que fecha a contagem de requisições em andamento também em erros."""
+
+    def __init__(self, metrics: PoolMetrics, **kwargs):
+        super().__init__(**kwargs)
+        self.metrics = metrics
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        try:
+            return super().handle_request(request)
+        except Exception:
+            self.metrics.fim(None)
+            raise
+
+
+class _TransporteMedidoAsync(httpx.AsyncHTTPTransport):
+    """Versão assíncrona do _TransporteMedido."""
+
+    def __init__(self, metrics: PoolMetrics, **kwargs):
+        super().__init__(**kwargs)
+        self.metrics = metrics
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        try:
+            return await super().handle_async_request(request)
+        except Exception:
+            self.metrics.fim(None)
+            raise
+
+
+def _componentes(cfg: dict):
+    """Peças comuns aos clientes síncrono e assíncrono: http2, limites, timeout padrão e hook de timeout."""
+    http2 = bool(cfg["http2"]) and HAS_HTTP2
+    if cfg["http2"] and not HAS_HTTP2:
+        print("HTTP/2 desativado: pacote 'h2' não instalado.")
+
+    timeouts = {
+        op: httpx.Timeout(
+            float(cfg[f"{op}_timeout"]), connect=float(cfg["connect_timeout"]), pool=float(cfg["pool_timeout"])
+        ).as_dict()
+        for op in OPERACOES
+    }
+    metrics = PoolMetrics()
+
+    def aplicar_timeout(request: httpx.Request):
+        metrics.inicio(request)
+        op = request.extensions["nexus_operacao"]
+        if op in timeouts:
+            request.extensions["timeout"] = timeouts[op]
+
+    limits = httpx.Limits(
+        max_connections=int(cfg["max_connections"]),
+        max_keepalive_connections=int(cfg["max_keepalive_connections"]),
+        keepalive_expiry=float(cfg["keepalive_expiry"]),
+    )
+    padrao = httpx.Timeout(float(cfg["rest_timeout"]), connect=float(cfg["connect_timeout"]), pool=float(cfg["pool_timeout"]))
+    return http2, limits, padrao, metrics, aplicar_timeout
+
+
+def build_http_client(cfg: dict = None, response_hooks: list = None) -> httpx.Client:
+    """httpx.Client com pool, HTTP/2 (se o pacote h2 estiver instalado) e timeout por operação."""
+    cfg = cfg or transport_settings()
+    http2, limits, padrao, metrics, aplicar_timeout = _componentes(cfg)
+    client = httpx.Client(
+        transport=_TransporteMedido(metrics, http2=http2, limits=limits),
+        timeout=padrao,
+        follow_redirects=True,
+        event_hooks={"request": [aplicar_timeout], "response": [metrics.fim] + list(response_hooks or [])},
+    )
+    client.nexus_metrics = metrics
+    client.nexus_config = {**cfg, "http2": http2}
+    return client
+
+
+def build_async_http_client(cfg: dict = None, response_hooks: list = None) -> httpx.AsyncClient:
+    """Equivalente assíncrono do build_http_client (hooks de resposta devem ser corrotinas)."""
+    cfg = cfg or transport_settings()
+    http2, limits, padrao, metrics, aplicar_timeout = _componentes(cfg)
+
+    async def inicio(request):
+        aplicar_timeout(request)
+
+    async def fim(response):
+        metrics.fim(response)
+
+    client = httpx.AsyncClient(
+        transport=_TransporteMedidoAsync(metrics, http2=http2, limits=limits),
+        timeout=padrao,
+        follow_redirects=True,
+        event_hooks={"request": [inicio], "response": [fim] + list(response_hooks or [])},
+    )
+    client.nexus_metrics = metrics
+    client.nexus_config = {**cfg, "http2": http2}
+    return client
+
+
+def pool_stats(client) -> dict:
+    """Ocupação do pool: conexões abertas/ociosas/ativas, HTTP/2 e requisições por operação."""
+    metrics = getattr(client, "nexus_metrics", None)
+    pool = getattr(client._transport, "_pool", None)
+    conexoes = list(pool.connections) if pool is not None else []
+    ativas = sum(1 for c in conexoes if not c.is_idle() and not c.is_closed())
+    cfg = getattr(client, "nexus_config", {})
+    return {
+        "max_connections": cfg.get("max_connections"),
+        "conexoes_abertas": len(conexoes),
+        "conexoes_ativas": ativas,
+        "conexoes_ociosas": sum(1 for c in conexoes if c.is_idle()),
+        "conexoes_http2": sum(1 for c in conexoes if "HTTP/2" in c.info()),
+        "aguardando_conexao": sum(1 for r in getattr(pool, "_requests", []) if r.connection is None),
+        "utilizacao": ativas / cfg["max_connections"] if cfg.get("max_connections") else 0.0,
+        "em_andamento": metrics.em_andamento if metrics else 0,
+        "pico_em_andamento": metrics.pico_em_andamento if metrics else 0,
+        "requisicoes": dict(metrics.requisicoes) if metrics else {},
+    }
@@ -0,0 +1,178 @@
+from datetime import date, datetime
+from dateutil.relativedelta import relativedelta
+from src.utils.formatters import format_currency, format_cpf, format_date_br
+
+MESES = {
+    1: "Janeiro", 2: "Fevereiro", 3: "Março", 4: "Abril",
+    5: "Maio", 6: "Junho", 7: "Julho", 8: "Agosto",
+    9: "Setembro", 10: "Outubro", 11: "Novembro", 12: "Dezembro"
+}
+
+
+def obter_mes_extenso(dt):
+    return MESES[dt.month]
+
+
+def fmt(val, default=""):
+    return str(val) if val is not None and str(val).strip() != "" else default
+
+
+def _valor_sem_simbolo(valor) -> str:
+    return format_currency(valor).replace("R$", "").strip()
+
+
+def calcular_valores(valor_bruto: float, percentual_desconto: float) -> dict:
+    """Valores base do contrato: desconto comercial, valor final e material (30% do bruto)."""
+    valor_bruto = float(valor_bruto or 0)
+    valor_desconto = round(valor_bruto * (percentual_desconto / 100), 2)
+    return {
+        "valor_bruto": valor_bruto,
+        "percentual_desconto": percentual_desconto,
+        "valor_desconto": valor_desconto,
+        "valor_final": round(valor_bruto - valor_desconto, 2),
+        "valor_material": round(valor_bruto * 0.30, 2),
+    }
+
+
+def parcelas_entrada(total: float, qtd: int, primeiro_vencimento: date, forma: str) -> list:
+    """Divide a entrada em parcelas iguais a cada 30 dias; a última absorve o arredondamento."""
+    if total <= 0 or qtd <= 0:
+        return []
+    v_base = round(total / qtd, 2)
+    lista = []
+    for i in range(qtd):
+        v_p = max(0.0, round(total - (v_base * (qtd - 1)), 2) if i == qtd - 1 else v_base)
+        d_p = primeiro_vencimento + relativedelta(days=i * 30)
+        lista.append({
+            "numero": i + 1,
+            "data": d_p.strftime("%d/%m/%Y"),
+            "valor": format_currency(v_p),
+            "forma": forma,
+            "valor_num": v_p
+        })
+    return lista
+
+
+def parcelas_saldo(saldo: float, qtd: int, primeiro_vencimento: date, forma: str) -> list:
+    """Parcelas mensais do saldo; a última absorve o arredondamento."""
+    if saldo <= 0 or qtd <= 0:
+        return []
+    v_base_saldo = round(saldo / qtd, 2)
+    acc_saldo = 0
+    lista = []
+    for i in range(qtd):
+        vp = round(saldo - acc_saldo, 2) if i == qtd - 1 else v_base_saldo
+        acc_saldo += vp
+        dt = primeiro_vencimento + relativedelta(months=i)
+        lista.append({
+            "Parcela": f"{i + 1}/{qtd}",
+            "Vencimento": dt.strftime("%d/%m/%Y"),
+            "Valor": format_currency(vp),
+            "Forma": forma,
+            "valor_num": vp
+        })
+    return lista
+
+
+def tabelas_pdf(lista_entrada: list, lista_saldo: list):
+    """Converte as listas da tela para as linhas das tabelas das Cláusulas 5ª/6ª."""
+    tbl_ent = [{"n": str(p["numero"]), "vencimento": p["data"], "valor": p["valor"], "forma": p["forma"]} for p in lista_entrada]
+    tbl_sal = [{"n": p["Parcela"], "vencimento": p["Vencimento"], "valor": p["Valor"], "forma": p["Forma"]} for p in lista_saldo]
+    return tbl_ent, tbl_sal
+
+
+def montar_parcelas(lista_entrada: list, lista_saldo: list) -> list:
+    """Linhas da tabela 'parcelas' (sem contrato_id: o rpc criar_contratos_com_parcelas preenche)."""
+    def iso(data_br: str) -> str:
+        return datetime.strptime(data_br, "%d/%m/%Y").date().isoformat()
+
+    parcelas = [{
+        "tipo": "entrada",
+        "numero": int(p["numero"]),
+        "total_parcelas": len(lista_entrada),
+        "vencimento": iso(p["data"]),
+        "valor": float(p["valor_num"]),
+        "forma_pagamento": p["forma"],
+    } for p in lista_entrada]
+    parcelas += [{
+        "tipo": "saldo",
+        "numero": i + 1,
+        "total_parcelas": len(lista_saldo),
+        "vencimento": iso(p["Vencimento"]),
+        "valor": float(p["valor_num"]),
+        "forma_pagamento": p["Forma"],
+    } for i, p in enumerate(lista_saldo)]
+    return parcelas
+
+
+def montar_contexto(aluno: dict, curso: dict, turma: dict, valores: dict, agora: datetime) -> dict:
+    """Variáveis {{ }} do modelo de contrato."""
+    percentual_desconto = valores["percentual_desconto"]
+    return {
+        'nome': fmt(aluno.get('nome_completo')).upper(),
+        'cpf': format_cpf(fmt(aluno.get('cpf'))),
+        'rg': fmt(aluno.get('rg'), "___________"),
+        'orgao_emissor': fmt(aluno.get('orgao_emissor'), "SSP/RS"),
+        'data_nascimento': format_date_br(aluno.get('data_nascimento')),
+        'estado_civil': fmt(aluno.get('estado_civil'), "Solteiro(a)"),
+        'nacionalidade': fmt(aluno.get('nacionalidade'), "Brasileira"),
+        'email': fmt(aluno.get('email')),
+        'telefone': fmt(aluno.get('telefone')),
+        'celular': fmt(aluno.get('telefone')),
+        'logradouro': fmt(aluno.get('logradouro')),
+        'endereco': fmt(aluno.get('logradouro')),
+        'numero': fmt(aluno.get('numero')),
+        'complemento': fmt(aluno.get('complemento')),
+        'bairro': fmt(aluno.get('bairro')),
+        'cidade': fmt(aluno.get('cidade')),
+        'uf': fmt(aluno.get('uf')),
+        'estado': fmt(aluno.get('uf')),
+        'cep': fmt(aluno.get('cep')),
+        'crm': fmt(aluno.get('crm'), "___________"),
+        'area_formacao': fmt(aluno.get('especialidade'), "Médica"),
+        'curso': fmt(curso.get('nome')),
+        'pos_graduacao': fmt(curso.get('nome')),
+        'codigo_turma': fmt(turma.get('codigo_turma')),
+        'turma': fmt(turma.get('codigo_turma')),
+        'formato_curso': fmt(turma.get('formato'), "Digital"),
+        'atendimento': fmt(turma.get('atendimento'), "Sim"),
+        'valor_curso': _valor_sem_simbolo(valores["valor_bruto"]),
+        'valor_bruto': _valor_sem_simbolo(valores["valor_bruto"]),
+        'percentual_desconto': str(percentual_desconto).replace(".", ","),
+        'valor_desconto': _valor_sem_simbolo(valores["valor_desconto"]),
+        'valor_final': _valor_sem_simbolo(valores["valor_final"]),
+        'valor_material': _valor_sem_simbolo(valores["valor_material"]),
+        'bolsista': "SIM" if percentual_desconto > 0 else "NÃO",
+        'dia': str(agora.day),
+        'mês': obter_mes_extenso(agora).lower(),
+        'ano': str(agora.year),
+        'data_atual': format_date_br(agora)
+    }
+
+
+def montar_registro_contrato(aluno: dict, turma: dict, valores: dict, entrada_total: float, entrada_qtd: int,
+                             lista_entrada: list, lista_saldo: list, token: str, url_pdf: str, agora: datetime) -> dict:
+    """Linha da tabela 'contratos' correspondente ao PDF gerado."""
+    percentual_desconto = valores["percentual_desconto"]
+    return {
+        "aluno_id": aluno['id'],
+        "turma_id": int(turma['id']),
+        "valor_curso": float(valores["valor_bruto"]),
+        "valor_desconto": float(valores["valor_desconto"]),
+        "percentual_desconto": float(percentual_desconto),
+        "valor_final": float(valores["valor_final"]),
+        "valor_material": float(valores["valor_material"]),
+        "bolsista": True if percentual_desconto > 0 else False,
+        "atendimento_paciente": True if turma.get('atendimento') == 'Sim' else False,
+        "entrada_valor": float(entrada_total),
+        "entrada_qtd_parcelas": int(entrada_qtd),
+        "saldo_valor": round(float(valores["valor_final"]) - float(entrada_total), 2),
+        "saldo_qtd_parcelas": len(lista_saldo),
+        "token_acesso": token,
+        "status": "Pendente",
+        "caminho_arquivo": url_pdf,
+        "formato_curso": turma.get('formato', 'Digital'),
+        "entrada_forma_pagamento": lista_entrada[0]['forma'] if lista_entrada else "N/A",
+        "saldo_forma_pagamento": lista_saldo[0]['Forma'] if lista_saldo else "N/A",
+        "created_at": agora.isoformat()
+    }
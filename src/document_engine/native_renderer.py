@@ -0,0 +1,445 @@
+import io
+import os
+from xml.sax.saxutils import escape
+from docx import Document
+from docx.oxml.ns import qn
+from docx.enum.text import WD_ALIGN_PARAGRAPH
+from docx.table import Table as DocxTable
+from docx.text.paragraph import Paragraph as DocxParagraph
+from docx.text.run import Run
+from reportlab import rl_config
+from reportlab.lib.utils import ImageReader
+from reportlab.lib.styles import ParagraphStyle
+from reportlab.lib.enums import TA_LEFT, TA_CENTER, TA_RIGHT, TA_JUSTIFY
+from reportlab.lib.colors import black
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, PageBreak
+
+# Imagens e fluxos binários no PDF, sem ASCII85: sem o rl_accel, o codificador em
+# Python puro gastava ~0,25 s por contrato só com os JPEGs do cabeçalho
+rl_config.useA85 = 0
+
+EMU_POR_PT = 12700
+TWIPS_POR_PT = 20
+
+_ALINHAMENTOS = {
+    WD_ALIGN_PARAGRAPH.CENTER: TA_CENTER,
+    WD_ALIGN_PARAGRAPH.RIGHT: TA_RIGHT,
+    WD_ALIGN_PARAGRAPH.JUSTIFY: TA_JUSTIFY,
+}
+
+# Fontes TrueType com cobertura Unicode completa (■, –, º...); Helvetica é o último recurso
+_FONTES_TTF = [
+    # Carlito tem as mesmas métricas da Calibri usada no modelo (fonts-crosextra-carlito)
+    ("Carlito", "/usr/share/fonts/truetype/crosextra/Carlito-Regular.ttf",
+     "/usr/share/fonts/truetype/crosextra/Carlito-Bold.ttf",
+     "/usr/share/fonts/truetype/crosextra/Carlito-Italic.ttf",
+     "/usr/share/fonts/truetype/crosextra/Carlito-BoldItalic.ttf"),
+    ("DejaVuSans", "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+     "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf",
+     "/usr/share/fonts/truetype/dejavu/DejaVuSans-Oblique.ttf",
+     "/usr/share/fonts/truetype/dejavu/DejaVuSans-BoldOblique.ttf"),
+    ("LiberationSans", "/usr/share/fonts/truetype/liberation/LiberationSans-Regular.ttf",
+     "/usr/share/fonts/truetype/liberation/LiberationSans-Bold.ttf",
+     "/usr/share/fonts/truetype/liberation/LiberationSans-Italic.ttf",
+     "/usr/share/fonts/truetype/liberation/LiberationSans-BoldItalic.ttf"),
+]
+
+
+def _registrar_fonte() -> str:
+    """Registra (uma vez) a primeira família TTF disponível e retorna seu nome."""
+    for nome, regular, negrito, italico, negrito_italico in _FONTES_TTF:
+        if nome in pdfmetrics.getRegisteredFontNames():
+            return nome
+        if all(os.path.exists(p) for p in (regular, negrito, italico, negrito_italico)):
+            pdfmetrics.registerFont(TTFont(nome, regular))
+            pdfmetrics.registerFont(TTFont(f"{nome}-Bold", negrito))
+            pdfmetrics.registerFont(TTFont(f"{nome}-Italic", italico))
+            pdfmetrics.registerFont(TTFont(f"{nome}-BoldItalic", negrito_italico))
+            pdfmetrics.registerFontFamily(
+                nome, normal=nome, bold=f"{nome}-Bold", italic=f"{nome}-Italic", boldItalic=f"{nome}-BoldItalic"
+            )
+            return nome
+    return "Helvetica"
+
+
+class _Numeracao:
+    """Resolve os marcadores de listas (w:numPr) a partir do numbering.xml do DOCX."""
+
+    _ROMANOS = [(1000, "m"), (900, "cm"), (500, "d"), (400, "cd"), (100, "c"), (90, "xc"),
+                (50, "l"), (40, "xl"), (10, "x"), (9, "ix"), (5, "v"), (4, "iv"), (1, "i")]
+
+    def __init__(self, doc):
+        self.niveis = {}      # (numId, ilvl) -> (numFmt, lvlText, start)
+        self.contadores = {}  # (numId, ilvl) -> valor atual
+        try:
+            numbering = doc.part.numbering_part.element
+        except Exception:
+            return
+        abstratos = {}
+        for abstrato in numbering.findall(qn('w:abstractNum')):
+            lvls = {}
+            for lvl in abstrato.findall(qn('w:lvl')):
+                fmt = lvl.find(qn('w:numFmt'))
+                texto = lvl.find(qn('w:lvlText'))
+                inicio = lvl.find(qn('w:start'))
+                lvls[lvl.get(qn('w:ilvl'))] = (
+                    fmt.get(qn('w:val')) if fmt is not None else "bullet",
+                    texto.get(qn('w:val')) if texto is not None else "•",
+                    int(inicio.get(qn('w:val'))) if inicio is not None else 1,
+                )
+            abstratos[abstrato.get(qn('w:abstractNumId'))] = lvls
+        for num in numbering.findall(qn('w:num')):
+            ref = num.find(qn('w:abstractNumId'))
+            if ref is None:
+                continue
+            for ilvl, definicao in abstratos.get(ref.get(qn('w:val')), {}).items():
+                self.niveis[(num.get(qn('w:numId')), ilvl)] = definicao
+
+    def _formatar(self, fmt: str, n: int) -> str:
+        if fmt == "decimal":
+            return str(n)
+        if fmt in ("lowerLetter", "upperLetter"):
+            letra = chr(ord('a') + (n - 1) % 26)
+            return letra if fmt == "lowerLetter" else letra.upper()
+        if fmt in ("lowerRoman", "upperRoman"):
+            romano, resto = "", n
+            for valor, simbolo in self._ROMANOS:
+                while resto >= valor:
+                    romano += simbolo
+                    resto -= valor
+            return romano if fmt == "lowerRoman" else romano.upper()
+        return ""
+
+    def marcador(self, p_element) -> str:
+        num_pr = p_element.find(f"{qn('w:pPr')}/{qn('w:numPr')}")
+        if num_pr is None:
+            return ""
+        num_id = num_pr.find(qn('w:numId'))
+        ilvl = num_pr.find(qn('w:ilvl'))
+        chave = (num_id.get(qn('w:val')) if num_id is not None else "0",
+                 ilvl.get(qn('w:val')) if ilvl is not None else "0")
+        fmt, texto, inicio = self.niveis.get(chave, ("bullet", "•", 1))
+        if fmt == "none":
+            return ""
+        if fmt == "bullet":
+            return "•"
+
+        atual = self.contadores.get(chave, inicio - 1) + 1
+        self.contadores[chave] = atual
+        # Reinicia os níveis mais profundos da mesma lista
+        for outra in list(self.contadores):
+            if outra[0] == chave[0] and int(outra[1]) > int(chave[1]):
+                del self.contadores[outra]
+        return texto.replace(f"%{int(chave[1]) + 1}", self._formatar(fmt, atual))
+
+
+class NativeContractRenderer:
+    """
+    Renderizador DOCX -> PDF em Python puro (reportlab), sem suíte de escritório.
+    Cobre o subconjunto usado pelo modelo de contrato: parágrafos com negrito/itálico/
+    sublinhado (inclusive dentro de hyperlinks e controles de conteúdo), alinhamento,
+    recuos, listas numeradas, quebras de página, tabelas, as imagens do cabeçalho e
+    o número de página do rodapé.
+    """
+
+    def __init__(self, docx_bytes: io.BytesIO):
+        docx_bytes.seek(0)
+        self.doc = Document(docx_bytes)
+        self.fonte = _registrar_fonte()
+        self.numeracao = _Numeracao(self.doc)
+        self._alinhamento_estilo = {}
+
+        normal = self.doc.styles['Normal'].font.size
+        self.tamanho_padrao = normal.pt if normal else self._tamanho_doc_defaults()
+
+    def _tamanho_doc_defaults(self) -> float:
+        sz = self.doc.styles.element.find(
+            f"{qn('w:docDefaults')}/{qn('w:rPrDefault')}/{qn('w:rPr')}/{qn('w:sz')}"
+        )
+        return int(sz.get(qn('w:val'))) / 2 if sz is not None else 11
+
+    # --- Conversão de blocos ---
+
+    @staticmethod
+    def _runs(p_element):
+        """
+        Runs do parágrafo em ordem de leitura, inclusive os aninhados em w:hyperlink,
+        w:sdt, w:ins, w:smartTag e w:fldSimple (paragraph.runs só traz os filhos diretos).
+        Runs de caixas de texto dentro do parágrafo pertencem aos parágrafos delas.
+        """
+        for r in p_element.iter(qn('w:r')):
+            if next(r.iterancestors(qn('w:p'))) is p_element:
+                yield r
+
+    def _runs_markup(self, paragraph):
+        """Converte os runs em markup do reportlab; devolve lista de trechos separados por quebra de página."""
+        trechos, atual, tamanho = [], [], None
+        for r in self._runs(paragraph._p):
+            run = Run(r, paragraph)
+            for filho in r:
+                if filho.tag == qn('w:br') and filho.get(qn('w:type')) == "page":
+                    trechos.append("".join(atual))
+                    atual = []
+                elif filho.tag == qn('w:t'):
+                    texto = escape(filho.text or "")
+                    if run.bold:
+                        texto = f"<b>{texto}</b>"
+                    if run.italic:
+                        texto = f"<i>{texto}</i>"
+                    if run.underline:
+                        texto = f"<u>{texto}</u>"
+                    atual.append(texto)
+                    if run.font.size and tamanho is None:
+                        tamanho = run.font.size.pt
+                elif filho.tag == qn('w:tab'):
+                    atual.append("&nbsp;&nbsp;&nbsp;&nbsp;")
+                elif filho.tag == qn('w:br'):
+                    atual.append("<br/>")
+        trechos.append("".join(atual))
+        return trechos, tamanho
+
+    def _alinhamento(self, paragraph):
+        """Alinhamento do parágrafo ou, na falta dele, do estilo (cacheado por estilo: o lookup do python-docx é caro)."""
+        if paragraph.alignment is not None:
+            return paragraph.alignment
+        p_style = paragraph._p.pPr.pStyle if paragraph._p.pPr is not None else None
+        estilo_id = p_style.val if p_style is not None else None
+        if estilo_id not in self._alinhamento_estilo:
+            estilo = paragraph.style
+            self._alinhamento_estilo[estilo_id] = estilo.paragraph_format.alignment if estilo is not None else None
+        return self._alinhamento_estilo[estilo_id]
+
+    def _estilo(self, paragraph, tamanho, marcador: str) -> ParagraphStyle:
+        fmt = paragraph.paragraph_format
+        alinhamento = self._alinhamento(paragraph)
+        tamanho = tamanho or self.tamanho_padrao
+        recuo = fmt.left_indent.pt if fmt.left_indent else (18 if marcador else 0)
+        primeira = fmt.first_line_indent.pt if fmt.first_line_indent else 0
+        return ParagraphStyle(
+            "p",
+            fontName=self.fonte,
+            fontSize=tamanho,
+            leading=tamanho * 1.2,
+            alignment=_ALINHAMENTOS.get(alinhamento, TA_LEFT),
+            leftIndent=recuo,
+            firstLineIndent=primeira,
+            bulletIndent=max(0, recuo - 14),
+            bulletFontName=self.fonte,
+            bulletFontSize=tamanho,
+            spaceBefore=fmt.space_before.pt if fmt.space_before else 0,
+            spaceAfter=fmt.space_after.pt if fmt.space_after is not None else tamanho * 0.4,
+        )
+
+    def _paragrafo(self, paragraph) -> list:
+        marcador = self.numeracao.marcador(paragraph._p)
+        trechos, tamanho = self._runs_markup(paragraph)
+        estilo = self._estilo(paragraph, tamanho, marcador)
+
+        flowables = []
+        for i, markup in enumerate(trechos):
+            if i > 0:
+                flowables.append(PageBreak())
+            if markup.strip():
+                flowables.append(Paragraph(markup, estilo, bulletText=marcador if i == 0 and marcador else None))
+            elif i == 0 and len(trechos) == 1:
+                flowables.append(Spacer(1, estilo.leading * 0.6))
+        return flowables
+
+    @staticmethod
+    def _blocos(container):
+        """
+        Parágrafos e tabelas de um container (corpo, célula, cabeçalho/rodapé) em ordem,
+        abrindo os controles de conteúdo (w:sdt) e w:customXml que os envolvem.
+        """
+        for elemento in container.iterchildren():
+            if elemento.tag in (qn('w:p'), qn('w:tbl')):
+                yield elemento
+            elif elemento.tag == qn('w:sdt'):
+                conteudo = elemento.find(qn('w:sdtContent'))
+                if conteudo is not None:
+                    yield from NativeContractRenderer._blocos(conteudo)
+            elif elemento.tag == qn('w:customXml'):
+                yield from NativeContractRenderer._blocos(elemento)
+
+    def _conteudo(self, container, parent, em_celula: bool = False) -> list:
+        flowables = []
+        for elemento in self._blocos(container):
+            if elemento.tag == qn('w:p'):
+                novos = self._paragrafo(DocxParagraph(elemento, parent))
+                if em_celula:
+                    # Quebra de página dentro de célula não faz sentido para o reportlab
+                    novos = [f for f in novos if not isinstance(f, PageBreak)]
+                flowables.extend(novos)
+            else:
+                flowables.extend(self._tabela(DocxTable(elemento, parent)))
+        return flowables
+
+    def _tabela(self, table) -> list:
+        grid = table._tbl.find(qn('w:tblGrid'))
+        larguras = [int(col.get(qn('w:w'))) / TWIPS_POR_PT for col in grid.findall(qn('w:gridCol'))] if grid is not None else None
+
+        linhas = []
+        for row in table.rows:
+            celulas, vistas = [], set()
+            for cell in row.cells:
+                # Células mescladas horizontalmente aparecem repetidas em row.cells
+                if id(cell._tc) in vistas:
+                    celulas.append("")
+                    continue
+                vistas.add(id(cell._tc))
+                celulas.append(self._conteudo(cell._tc, cell, em_celula=True))
+            linhas.append(celulas)
+
+        if not linhas:
+            return []
+        colunas = max(len(r) for r in linhas)
+        linhas = [r + [""] * (colunas - len(r)) for r in linhas]
+        if larguras and len(larguras) != colunas:
+            larguras = None
+
+        tabela = Table(linhas, colWidths=larguras, repeatRows=1)
+        tabela.setStyle(TableStyle([
+            ("GRID", (0, 0), (-1, -1), 0.5, black),
+            ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
+            ("TOPPADDING", (0, 0), (-1, -1), 2),
+            ("BOTTOMPADDING", (0, 0), (-1, -1), 2),
+        ]))
+        return [tabela, Spacer(1, 6)]
+
+    def _flowables(self) -> list:
+        return self._conteudo(self.doc.element.body, self.doc)
+
+    # --- Cabeçalho e rodapé ---
+
+    _PAGINA = object()  # marca o campo PAGE nas partes do rodapé
+
+    def _rodape(self) -> list:
+        """
+        Linhas do rodapé da 1ª seção: (alinhamento, tamanho, partes), em que cada parte
+        é texto ou _PAGINA, o campo PAGE (o texto em cache no DOCX é descartado).
+        """
+        try:
+            footer = self.doc.sections[0].footer
+            if footer.is_linked_to_previous:
+                return []
+            elemento = footer._element
+        except Exception:
+            return []
+
+        linhas = []
+        for p in self._blocos(elemento):
+            if p.tag != qn('w:p'):
+                continue
+            paragraph = DocxParagraph(p, footer)
+            partes, instrucao, estado, tamanho = [], "", None, None
+            for r in self._runs(p):
+                pai = r.getparent()
+                simples = pai.get(qn('w:instr')) if pai.tag == qn('w:fldSimple') else None
+                for filho in r:
+                    if filho.tag == qn('w:fldChar'):
+                        tipo = filho.get(qn('w:fldCharType'))
+                        if tipo == "begin":
+                            estado, instrucao = "instrucao", ""
+                        elif tipo == "separate":
+                            estado = "resultado"
+                            if instrucao.split()[:1] == ["PAGE"]:
+                                partes.append(self._PAGINA)
+                        elif tipo == "end":
+                            estado = None
+                    elif filho.tag == qn('w:instrText'):
+                        instrucao += filho.text or ""
+                    elif filho.tag == qn('w:t'):
+                        if simples is not None and simples.split()[:1] == ["PAGE"]:
+                            if self._PAGINA not in partes:
+                                partes.append(self._PAGINA)
+                        elif not (estado == "resultado" and instrucao.split()[:1] == ["PAGE"]):
+                            partes.append(filho.text or "")
+                        if tamanho is None and r.find(f"{qn('w:rPr')}/{qn('w:sz')}") is not None:
+                            tamanho = Run(r, paragraph).font.size.pt
+            if any(parte is self._PAGINA or parte.strip() for parte in partes):
+                linhas.append((_ALINHAMENTOS.get(self._alinhamento(paragraph), TA_LEFT), tamanho or self.tamanho_padrao, partes))
+        return linhas
+
+
+    def _imagens_cabecalho(self) -> list:
+        """Imagens do cabeçalho da 1ª seção: (ImageReader, x, y_topo, largura, altura) em pontos."""
+        secao = self.doc.sections[0]
+        try:
+            header = secao.header
+            part = header.part
+        except Exception:
+            return []
+        imagens = []
+        for desenho in header._element.iter(qn('w:drawing')):
+            ancora = desenho[0] if len(desenho) else None
+            extent = ancora.find(qn('wp:extent')) if ancora is not None else None
+            blip = desenho.find(f".//{qn('a:blip')}")
+            if extent is None or blip is None:
+                continue
+            rel = part.rels.get(blip.get(qn('r:embed')))
+            if rel is None:
+                continue
+            pos_x = ancora.find(f"{qn('wp:positionH')}/{qn('wp:posOffset')}")
+            pos_y = ancora.find(f"{qn('wp:positionV')}/{qn('wp:posOffset')}")
+            imagens.append((
+                ImageReader(io.BytesIO(rel.target_part.blob)),
+                int(pos_x.text) / EMU_POR_PT if pos_x is not None else 0,
+                int(pos_y.text) / EMU_POR_PT if pos_y is not None else 0,
+                int(extent.get("cx")) / EMU_POR_PT,
+                int(extent.get("cy")) / EMU_POR_PT,
+            ))
+        return imagens
+
+    def render(self) -> io.BytesIO:
+        secao = self.doc.sections[0]
+        imagens = self._imagens_cabecalho()
+        rodape = self._rodape()
+        margem_esq = secao.left_margin.pt
+        margem_dir = secao.page_width.pt - secao.right_margin.pt
+        topo_cabecalho = secao.page_height.pt - (secao.header_distance.pt if secao.header_distance else 35)
+        # Rodapé colado na borda (footer = 0, como no modelo) fica no meio da margem inferior
+        base_rodape = max(secao.footer_distance.pt if secao.footer_distance else 0, secao.bottom_margin.pt / 2)
+
+        def desenhar_pagina(canvas, _doc):
+            for imagem, x, y, largura, altura in imagens:
+                canvas.drawImage(imagem, margem_esq + x, topo_cabecalho - y - altura, largura, altura, mask="auto")
+            y = base_rodape + sum(tamanho * 1.2 for _, tamanho, _ in rodape[1:])
+            for alinhamento, tamanho, partes in rodape:
+                texto = "".join(
+                    str(canvas.getPageNumber()) if parte is self._PAGINA else parte for parte in partes
+                )
+                canvas.setFont(self.fonte, tamanho)
+                if alinhamento == TA_RIGHT:
+                    canvas.drawRightString(margem_dir, y, texto)
+                elif alinhamento == TA_CENTER:
+                    canvas.drawCentredString((margem_esq + margem_dir) / 2, y, texto)
+                else:
+                    canvas.drawString(margem_esq, y, texto)
+                y -= tamanho * 1.2
+
+        buffer = io.BytesIO()
+        pdf = SimpleDocTemplate(
+            buffer,
+            pagesize=(secao.page_width.pt, secao.page_height.pt),
+            leftMargin=margem_esq,
+            rightMargin=secao.right_margin.pt,
+            topMargin=secao.top_margin.pt,
+            bottomMargin=secao.bottom_margin.pt,
+        )
+        pdf.build(self._flowables(), onFirstPage=desenhar_pagina, onLaterPages=desenhar_pagina)
+        buffer.seek(0)
+        return buffer
+
+
+def render_docx_native(docx_bytes: io.BytesIO) -> io.BytesIO:
+    """Atalho: DOCX renderizado (ContractProcessor) -> PDF via reportlab."""
+    return NativeContractRenderer(docx_bytes).render()
+
+
+def render_contract_pdf_bytes(template_path: str, context: dict, entry_rows: list, installment_rows: list) -> bytes:
+    """Ponto de entrada picklable: contexto + parcelas -> PDF, para processos separados (lote)."""
+    from src.document_engine.processor import ContractProcessor
+    docx = ContractProcessor(template_path).generate_docx(context, entry_rows, installment_rows)
+    return render_docx_native(docx).getvalue()
@@ -0,0 +1,527 @@
+import io
+import os
+import sys
+import json
+import time
+import select
+import signal
+import shutil
+import socket
+import atexit
+import tempfile
+import threading
+import subprocess
+from functools import lru_cache
+from contextlib import contextmanager
+import streamlit as st
+from src.utils.settings import get_section
+
+# O pacote python3-uno (packages.txt) instala o módulo 'uno' para o python3 do
+# sistema, fora do sys.path do ambiente virtual do app. Ordem de tentativa:
+#   1. "uno": import direto, ou com os diretórios de [libreoffice] uno_path (ou os
+#      padrões abaixo) no fim do sys.path. Só funciona se a versão do Python do
+#      app for a mesma do python3-uno.
+#   2. "ponte": um processo uno_bridge.py no interpretador que importa 'uno'
+#      ([libreoffice] uno_python, ou /usr/bin/python3), ligado ao soffice do worker.
+#   3. "cli": soffice --convert-to a cada conversão (lento: sobe o office a cada chamada).
+# Nos modos 1 e 2 cada worker mantém um soffice escutando no socket UNO.
+_UNO_PATHS = ["/usr/lib/python3/dist-packages", "/usr/lib/libreoffice/program", "/opt/libreoffice/program"]
+_UNO_PYTHONS = ["/usr/bin/python3", "/usr/lib/libreoffice/program/python", "/opt/libreoffice/program/python"]
+_PONTE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "uno_bridge.py")
+
+
+def _como_lista(valor) -> list:
+    if not valor:
+        return []
+    return [valor] if isinstance(valor, str) else list(valor)
+
+
+def _importar_uno(caminhos: list):
+    """Importa 'uno', acrescentando `caminhos` ao sys.path se preciso (desfeito em caso de falha)."""
+    try:
+        import uno
+        return uno
+    except ImportError:
+        pass
+    antes = list(sys.path)
+    sys.path.extend(c for c in caminhos if os.path.isdir(c) and c not in sys.path)
+    try:
+        import uno
+        return uno
+    except ImportError:
+        sys.path[:] = antes
+        return None
+
+
+uno = _importar_uno(_como_lista(get_section("libreoffice").get("uno_path")) + _UNO_PATHS)
+if uno is not None:
+    from com.sun.star.beans import PropertyValue
+    HAS_UNO = True
+else:
+    PropertyValue = None
+    HAS_UNO = False
+
+
+@lru_cache(maxsize=1)
+def python_com_uno():
+    """Interpretador externo que importa 'uno' (para a ponte), ou None."""
+    candidatos = _como_lista(get_section("libreoffice").get("uno_python")) + _como_lista(os.environ.get("UNO_PYTHON")) + _UNO_PYTHONS
+    for python in candidatos:
+        if not os.path.exists(python):
+            continue
+        try:
+            if subprocess.run([python, "-c", "import uno"], capture_output=True, timeout=15).returncode == 0:
+                return python
+        except (OSError, subprocess.TimeoutExpired):
+            continue
+    return None
+
+
+@lru_cache(maxsize=1)
+def modo_conversao() -> str:
+    """"uno", "ponte" ou "cli" (ver o comentário no topo do módulo)."""
+    if HAS_UNO:
+        return "uno"
+    if python_com_uno():
+        return "ponte"
+    print("LibreOffice sem UNO: conversão por soffice --convert-to a cada chamada. "
+          "Instale python3-uno ou configure [libreoffice] uno_python/uno_path.")
+    return "cli"
+
+
+class OfficePoolBusyError(Exception):
+    """Fila de espera cheia ou tempo de espera por um worker esgotado."""
+
+
+class OfficeConversionTimeout(RuntimeError):
+    """O LibreOffice não terminou a conversão no prazo (conversion_timeout)."""
+
+
+def _matar_grupo(processo):
+    """Mata o processo e os filhos (soffice -> oosplash -> soffice.bin), iniciados numa sessão própria."""
+    try:
+        if hasattr(os, "killpg"):
+            os.killpg(processo.pid, signal.SIGKILL)
+        else:
+            processo.kill()
+    except OSError:
+        pass
+    processo.wait()
+
+
+def _free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _office_binary() -> str:
+    return shutil.which("soffice") or shutil.which("libreoffice") or "soffice"
+
+
+def _prop(name, value):
+    p = PropertyValue()
+    p.Name = name
+    p.Value = value
+    return p
+
+
+class OfficeWorker:
+    """
+    Instância headless do LibreOffice com perfil de usuário próprio,
+    escutando em um socket UNO local.
+    """
+
+    STARTUP_TIMEOUT = 30
+    PING_TIMEOUT = 10
+
+    def __init__(self, index: int, base_dir: str, max_conversions: int, modo: str = None,
+                 conversion_timeout: float = 120):
+        self.index = index
+        self.modo = modo or modo_conversao()
+        self.max_conversions = max_conversions
+        self.conversion_timeout = conversion_timeout  # segundos por documento (0 = sem limite)
+        self.profile_dir = os.path.join(base_dir, f"profile_{index}")
+        self.port = None
+        self.process = None
+        self.desktop = None
+        self.ponte = None
+        self.conversions = 0
+        self.ultimo_erro = None
+
+    @property
+    def profile_url(self) -> str:
+        return "file://" + os.path.abspath(self.profile_dir)
+
+    def start(self):
+        """Sobe o processo soffice e conecta ao listener UNO (direto ou pela ponte)."""
+        os.makedirs(self.profile_dir, exist_ok=True)
+        self.conversions = 0
+        if self.modo == "cli":
+            return
+
+        self.port = _free_port()
+        self.process = subprocess.Popen([
+            _office_binary(), '--headless', '--invisible', '--nologo',
+            '--nodefault', '--norestore', '--nolockcheck',
+            f'-env:UserInstallation={self.profile_url}',
+            f'--accept=socket,host=127.0.0.1,port={self.port};urp;StarOffice.ComponentContext'
+        ], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True)
+
+        try:
+            if self.modo == "uno":
+                self._conectar_uno()
+            else:
+                self._iniciar_ponte()
+        except Exception:
+            self.stop()
+            raise
+
+    def _conectar_uno(self):
+        local_ctx = uno.getComponentContext()
+        resolver = local_ctx.ServiceManager.createInstanceWithContext(
+            "com.sun.star.bridge.UnoUrlResolver", local_ctx
+        )
+        deadline = time.monotonic() + self.STARTUP_TIMEOUT
+        while True:
+            try:
+                ctx = resolver.resolve(
+                    f"uno:socket,host=127.0.0.1,port={self.port};urp;StarOffice.ComponentContext"
+                )
+                self.desktop = ctx.ServiceManager.createInstanceWithContext("com.sun.star.frame.Desktop", ctx)
+                return
+            except Exception:
+                if self.process.poll() is not None or time.monotonic() > deadline:
+                    raise RuntimeError(f"LibreOffice (worker {self.index}) não respondeu no socket UNO.")
+                time.sleep(0.25)
+
+    def _iniciar_ponte(self):
+        self.ponte = subprocess.Popen(
+            [python_com_uno(), _PONTE, "--port", str(self.port), "--timeout", str(self.STARTUP_TIMEOUT)],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True, bufsize=1
+        )
+        resposta = self._ler_ponte(self.STARTUP_TIMEOUT + 5)
+        if not resposta.get("ok"):
+            raise RuntimeError(f"LibreOffice (worker {self.index}): {resposta.get('erro')}")
+
+    def _ler_ponte(self, timeout: float = None) -> dict:
+        """Uma resposta da ponte; com `timeout`, levanta OfficeConversionTimeout se ela não vier no prazo."""
+        # Uma linha por pedido: não sobra resposta no buffer do pipe entre um select e outro
+        if timeout and not select.select([self.ponte.stdout], [], [], timeout)[0]:
+            raise OfficeConversionTimeout(f"Ponte UNO do worker {self.index} sem resposta em {timeout:g}s.")
+        linha = self.ponte.stdout.readline()
+        if not linha:
+            raise RuntimeError(f"Ponte UNO do worker {self.index} encerrada.")
+        return json.loads(linha)
+
+    def _pedir_ponte(self, pedido: dict, timeout: float = None) -> dict:
+        self.ponte.stdin.write(json.dumps(pedido) + "\n")
+        self.ponte.stdin.flush()
+        return self._ler_ponte(timeout)
+
+    @contextmanager
+    def _prazo_uno(self):
+        """
+        No modo uno a conversão bloqueia dentro do próprio processo: um timer mata o
+        soffice se ela passar do prazo, e a chamada UNO volta com erro. O evento
+        devolvido indica se o prazo estourou.
+        """
+        estourou = threading.Event()
+        if not self.conversion_timeout:
+            yield estourou
+            return
+        processo = self.process
+
+        def matar():
+            estourou.set()
+            _matar_grupo(processo)
+
+        timer = threading.Timer(self.conversion_timeout, matar)
+        timer.daemon = True
+        timer.start()
+        try:
+            yield estourou
+        finally:
+            timer.cancel()
+
+    def kill(self):
+        """Encerra à força a ponte e o soffice (conversão travada), sem pedir o encerramento."""
+        if self.ponte is not None:
+            self.ponte.kill()
+            self.ponte.wait()
+            self.ponte = None
+        self.desktop = None
+        if self.process is not None:
+            _matar_grupo(self.process)
+            self.process = None
+
+    def stop(self):
+        if self.ponte is not None:
+            try:
+                self.ponte.stdin.write(json.dumps({"encerrar": True}) + "\n")
+                self.ponte.stdin.flush()
+                self.ponte.wait(timeout=5)
+            except Exception:
+                self.ponte.kill()
+            self.ponte = None
+        if self.desktop is not None:
+            try:
+                self.desktop.terminate()
+            except Exception:
+                pass
+            self.desktop = None
+        if self.process is not None:
+            try:
+                self.process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                _matar_grupo(self.process)
+            self.process = None
+
+    def restart(self):
+        self.stop()
+        self.start()
+
+    def is_healthy(self) -> bool:
+        """Processo vivo e listener respondendo."""
+        if self.modo == "cli":
+            return True
+        if self.process is None or self.process.poll() is not None:
+            return False
+        try:
+            if self.modo == "uno":
+                self.desktop.getComponents()
+                return True
+            return self.ponte.poll() is None and self._pedir_ponte({"ping": True}, self.PING_TIMEOUT).get("ok", False)
+        except Exception:
+            return False
+
+    @property
+    def needs_recycle(self) -> bool:
+        return self.max_conversions > 0 and self.conversions >= self.max_conversions
+
+    def convert(self, docx_path: str, out_dir: str) -> str:
+        """Converte um arquivo DOCX e retorna o caminho do PDF gerado em out_dir."""
+        pdf_path = self.convert_many([docx_path], out_dir)[0]
+        if pdf_path is None:
+            raise RuntimeError(f"O LibreOffice não gerou o arquivo PDF: {self.ultimo_erro or 'sem detalhes'}")
+        return pdf_path
+
+    def convert_many(self, docx_paths: list, out_dir: str) -> list:
+        """
+        Converte vários DOCX na mesma instância.
+        Retorna, na mesma ordem, o caminho de cada PDF ou None se aquele arquivo falhou.
+        """
+        pdf_paths = [
+            os.path.join(out_dir, os.path.splitext(os.path.basename(p))[0] + ".pdf") for p in docx_paths
+        ]
+        self.ultimo_erro = None
+
+        if self.modo == "ponte":
+            for docx_path, pdf_path in zip(docx_paths, pdf_paths):
+                # Ponte encerrada levanta RuntimeError: o pool derruba e reinicia o worker
+                try:
+                    resposta = self._pedir_ponte(
+                        {"docx": os.path.abspath(docx_path), "pdf": os.path.abspath(pdf_path)}, self.conversion_timeout
+                    )
+                except OfficeConversionTimeout as e:
+                    # soffice travado neste arquivo: derruba e sobe de novo para o resto do lote
+                    self.ultimo_erro = str(e)
+                    print(f"Erro ao converter {os.path.basename(docx_path)}: {e}")
+                    self.kill()
+                    self.start()
+                    continue
+                if not resposta.get("ok"):
+                    self.ultimo_erro = resposta.get("erro")
+                    print(f"Erro ao converter {os.path.basename(docx_path)}: {resposta.get('erro')}")
+        elif self.modo == "uno":
+            for docx_path, pdf_path in zip(docx_paths, pdf_paths):
+                with self._prazo_uno() as estourou:
+                    try:
+                        doc = self.desktop.loadComponentFromURL(
+                            uno.systemPathToFileUrl(os.path.abspath(docx_path)), "_blank", 0,
+                            (_prop("Hidden", True),)
+                        )
+                        try:
+                            doc.storeToURL(
+                                uno.systemPathToFileUrl(os.path.abspath(pdf_path)),
+                                (_prop("FilterName", "writer_pdf_Export"),)
+                            )
+                        finally:
+                            doc.close(True)
+                    except Exception as e:
+                        # Um arquivo com problema não derruba o lote; o health check decide se o worker reinicia
+                        self.ultimo_erro = str(e)
+                        print(f"Erro ao converter {os.path.basename(docx_path)}: {e}")
+                if estourou.is_set():
+                    self.ultimo_erro = f"conversão passou de {self.conversion_timeout:g}s"
+                    print(f"Conversão de {os.path.basename(docx_path)} passou de {self.conversion_timeout:g}s; "
+                          f"reiniciando o worker {self.index}.")
+                    self.kill()
+                    self.start()
+        else:
+            self._converter_cli(docx_paths, out_dir)
+
+        self.conversions += len(docx_paths)
+        return [p if os.path.exists(p) else None for p in pdf_paths]
+
+    def _converter_cli(self, docx_paths: list, out_dir: str):
+        """
+        Fallback sem UNO: uma única chamada --convert-to para o lote inteiro;
+        o perfil dedicado evita disputa entre conversões paralelas.
+        Prazo: o boot do office mais conversion_timeout por arquivo. Estourado, o grupo
+        de processos inteiro é morto (o soffice.bin é filho do script soffice).
+        """
+        comando = [
+            _office_binary(), '--headless', '--norestore', '--nolockcheck',
+            f'-env:UserInstallation={self.profile_url}',
+            '--convert-to', 'pdf', '--outdir', out_dir, *docx_paths
+        ]
+        prazo = self.STARTUP_TIMEOUT + self.conversion_timeout * len(docx_paths) if self.conversion_timeout else None
+        processo = subprocess.Popen(comando, stdout=subprocess.PIPE, stderr=subprocess.PIPE, start_new_session=True)
+        try:
+            saida, erro = processo.communicate(timeout=prazo)
+        except subprocess.TimeoutExpired:
+            _matar_grupo(processo)
+            raise OfficeConversionTimeout(f"soffice --convert-to não terminou em {prazo:g}s.")
+        if processo.returncode != 0:
+            raise subprocess.CalledProcessError(processo.returncode, comando, saida, erro)
+
+
+class OfficePool:
+    """
+    Pool de instâncias LibreOffice de longa duração.
+    - size: número de workers (conversões em paralelo)
+    - max_conversions: recicla o worker após N conversões (0 = nunca)
+    - max_waiting: tamanho máximo da fila de espera por um worker
+    - acquire_timeout: segundos de espera por um worker livre
+    - conversion_timeout: segundos por documento; soffice travado é morto e o worker reiniciado
+    """
+
+    def __init__(self, size: int, max_conversions: int = 200, max_waiting: int = 16, acquire_timeout: float = 60,
+                 conversion_timeout: float = 120):
+        self.size = max(1, int(size))
+        self.max_waiting = max_waiting
+        self.acquire_timeout = acquire_timeout
+        self.base_dir = tempfile.mkdtemp(prefix="nexusmed_office_")
+        self._workers = [
+            OfficeWorker(i, self.base_dir, max_conversions, conversion_timeout=conversion_timeout)
+            for i in range(self.size)
+        ]
+        self._idle = list(self._workers)
+        self._started = set()
+        self._waiting = 0
+        self._cond = threading.Condition()
+
+    @contextmanager
+    def worker(self):
+        """Reserva um worker saudável; bloqueia até acquire_timeout se todos estiverem ocupados."""
+        with self._cond:
+            if not self._idle and self._waiting >= self.max_waiting:
+                raise OfficePoolBusyError("Fila de conversão cheia. Tente novamente em instantes.")
+            self._waiting += 1
+            try:
+                if not self._cond.wait_for(lambda: self._idle, timeout=self.acquire_timeout):
+                    raise OfficePoolBusyError("Tempo de espera por um conversor esgotado.")
+                w = self._idle.pop()
+            finally:
+                self._waiting -= 1
+
+        try:
+            self._ensure_ready(w)
+            yield w
+        except Exception:
+            # Worker em estado incerto: derruba para ser reiniciado no próximo uso
+            w.stop()
+            self._started.discard(w.index)
+            raise
+        finally:
+            with self._cond:
+                self._idle.append(w)
+                self._cond.notify()
+
+    def _ensure_ready(self, w: OfficeWorker):
+        if w.index not in self._started:
+            w.start()
+            self._started.add(w.index)
+        elif w.needs_recycle or not w.is_healthy():
+            w.restart()
+
+    def convert(self, docx_bytes: io.BytesIO) -> io.BytesIO:
+        """Converte um DOCX em memória para PDF usando um worker do pool."""
+        with tempfile.TemporaryDirectory(dir=self.base_dir) as temp_dir:
+            temp_docx_path = os.path.join(temp_dir, "temp_contract.docx")
+            with open(temp_docx_path, "wb") as f:
+                f.write(docx_bytes.getbuffer())
+
+            with self.worker() as w:
+                pdf_path = w.convert(temp_docx_path, temp_dir)
+
+            with open(pdf_path, "rb") as f:
+                return io.BytesIO(f.read())
+
+    def convert_many(self, docx_buffers: list) -> list:
+        """
+        Converte um lote de DOCX em memória em um único worker.
+        Retorna a lista de PDFs (io.BytesIO) na mesma ordem; None para arquivos que falharam.
+        """
+        with tempfile.TemporaryDirectory(dir=self.base_dir) as temp_dir:
+            docx_paths = []
+            for i, buf in enumerate(docx_buffers):
+                path = os.path.join(temp_dir, f"contrato_{i:04d}.docx")
+                with open(path, "wb") as f:
+                    f.write(buf.getbuffer())
+                docx_paths.append(path)
+
+            with self.worker() as w:
+                pdf_paths = w.convert_many(docx_paths, temp_dir)
+
+            resultado = []
+            for pdf_path in pdf_paths:
+                if pdf_path is None:
+                    resultado.append(None)
+                    continue
+                with open(pdf_path, "rb") as f:
+                    resultado.append(io.BytesIO(f.read()))
+            return resultado
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "size": self.size,
+                "modo": modo_conversao(),
+                "idle": len(self._idle),
+                "waiting": self._waiting,
+                "conversions": {w.index: w.conversions for w in self._workers},
+            }
+
+    def shutdown(self):
+        for w in self._workers:
+            w.stop()
+        self._started.clear()
+        shutil.rmtree(self.base_dir, ignore_errors=True)
+
+
+@st.cache_resource
+def get_office_pool() -> OfficePool:
+    """
+    Cria (uma vez por processo) o pool de conversão.
+    Configuração opcional no secrets.toml:
+        [libreoffice]
+        pool_size = 4
+        max_conversions = 200
+        max_waiting = 16
+        acquire_timeout = 60
+        conversion_timeout = 120                        # segundos por documento (0 = sem limite)
+        uno_python = "/usr/bin/python3"                 # interpretador com python3-uno (modo ponte)
+        uno_path = ["/usr/lib/python3/dist-packages"]   # onde procurar o módulo uno (modo direto)
+    """
+    cfg = get_section("libreoffice")
+    pool = OfficePool(
+        size=int(cfg.get("pool_size", os.cpu_count() or 1)),
+        max_conversions=int(cfg.get("max_conversions", 200)),
+        max_waiting=int(cfg.get("max_waiting", 16)),
+        acquire_timeout=float(cfg.get("acquire_timeout", 60)),
+        conversion_timeout=float(cfg.get("conversion_timeout", 120)),
+    )
+    atexit.register(pool.shutdown)
+    return pool
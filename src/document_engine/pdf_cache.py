@@ -0,0 +1,191 @@
+import os
+import json
+import time
+import hashlib
+import tempfile
+import threading
+from contextlib import contextmanager
+import streamlit as st
+from src.utils.settings import get_section
+
+try:
+    import fcntl
+except ImportError:  # Windows: o lock vale só entre as threads do processo
+    fcntl = None
+
+
+def contract_cache_key(template_checksum: str, context: dict, entry_rows: list, installment_rows: list) -> str:
+    """Hash canônico (JSON ordenado) das entradas que determinam o PDF do contrato."""
+    payload = json.dumps(
+        {"template": template_checksum, "ctx": context, "entrada": entry_rows, "saldo": installment_rows},
+        sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class PDFCache:
+    """
+    Cache endereçado por conteúdo de PDFs gerados, em disco local.
+    Remove os itens usados há mais tempo (LRU, pelo mtime) quando o total passa de max_bytes.
+
+    O diretório é compartilhado entre processos (o Streamlit e os workers da fila de
+    jobs): o próprio disco é o índice, e a remoção dos excedentes e os contadores de
+    hits/misses (arquivo .stats.json) ficam sob um lock de arquivo (.lock).
+    """
+
+    _TMP_ORFAO = 600  # segundos sem escrita: .tmp de um processo que caiu antes do os.replace
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+        agora = time.time()
+        for entrada in os.scandir(directory):
+            if entrada.name.endswith(".tmp"):
+                try:
+                    if agora - entrada.stat().st_mtime > self._TMP_ORFAO:
+                        os.remove(entrada.path)
+                except OSError:
+                    pass
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.pdf")
+
+    @contextmanager
+    def _travar(self):
+        """Lock entre threads e, onde há fcntl, entre processos."""
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            with open(os.path.join(self.directory, ".lock"), "a") as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _stats_path(self) -> str:
+        return os.path.join(self.directory, ".stats.json")
+
+    def _ler_contadores(self) -> dict:
+        try:
+            with open(self._stats_path()) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {"hits": 0, "misses": 0}
+
+    def _contar(self, campo: str):
+        with self._travar():
+            contadores = self._ler_contadores()
+            contadores[campo] = contadores.get(campo, 0) + 1
+            with open(self._stats_path(), "w") as f:
+                json.dump(contadores, f)
+
+    def _arquivos(self) -> list:
+        """[(mtime, chave, tamanho)] dos PDFs no diretório, do menos para o mais recente."""
+        arquivos = []
+        for entrada in os.scandir(self.directory):
+            if entrada.name.endswith(".pdf"):
+                try:
+                    info = entrada.stat()
+                except OSError:
+                    continue  # removido por outro processo durante a varredura
+                arquivos.append((info.st_mtime, entrada.name[:-4], info.st_size))
+        return sorted(arquivos)
+
+    def get(self, key: str):
+        """Retorna os bytes do PDF ou None."""
+        arquivo = self.open(key)
+        if arquivo is None:
+            return None
+        with arquivo:
+            return arquivo.read()
+
+    def open(self, key: str):
+        """
+        Retorna o PDF em cache como arquivo aberto para leitura (ou None), sem ler o
+        conteúdo. O descritor continua válido mesmo se a entrada for descartada depois.
+        """
+        try:
+            arquivo = open(self._path(key), "rb")
+            os.utime(self._path(key))
+        except OSError:
+            # Ausente, ou removido por outro processo entre o open e o utime
+            self._contar("misses")
+            return None
+        self._contar("hits")
+        return arquivo
+
+    def put(self, key: str, data: bytes):
+        if len(data) > self.max_bytes:
+            return
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        if not self.put_file(key, tmp_path):
+            os.remove(tmp_path)
+
+    def put_file(self, key: str, tmp_path: str) -> bool:
+        """
+        Move para o cache um arquivo já gravado no diretório dele (ex.: download em streaming).
+        Retorna False, sem mexer no arquivo, se ele sozinho passar de max_bytes.
+        """
+        if os.path.getsize(tmp_path) > self.max_bytes:
+            return False
+        with self._travar():
+            os.replace(tmp_path, self._path(key))
+
+            # Total pelo diretório, não só pelo que este processo gravou
+            arquivos = self._arquivos()
+            total = sum(size for _, _, size in arquivos)
+            for _, old_key, size in arquivos:
+                if total <= self.max_bytes:
+                    break
+                if old_key == key:
+                    continue
+                try:
+                    os.remove(self._path(old_key))
+                except OSError:
+                    pass
+                total -= size
+        return True
+
+    def discard(self, key: str):
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def keys_with_prefix(self, prefix: str) -> list:
+        """Chaves em cache que começam com `prefix`, da mais recente para a mais antiga."""
+        return [key for _, key, _ in reversed(self._arquivos()) if key.startswith(prefix)]
+
+    def stats(self) -> dict:
+        """Contadores de todos os processos que usam o diretório, desde a criação dele."""
+        with self._travar():
+            contadores = self._ler_contadores()
+        arquivos = self._arquivos()
+        hits, misses = contadores.get("hits", 0), contadores.get("misses", 0)
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+            "entries": len(arquivos),
+            "bytes": sum(size for _, _, size in arquivos),
+        }
+
+
+@st.cache_resource
+def get_pdf_cache() -> PDFCache:
+    """
+    Cache de PDFs do processo. Configuração opcional no secrets.toml:
+        [pdf_cache]
+        directory = "/tmp/nexusmed_pdf_cache"
+        max_mb = 256
+    """
+    cfg = get_section("pdf_cache")
+    directory = cfg.get("directory", os.path.join(tempfile.gettempdir(), "nexusmed_pdf_cache"))
+    return PDFCache(directory, int(cfg.get("max_mb", 256)) * 1024 * 1024)
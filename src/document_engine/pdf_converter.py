@@ -1,13 +1,24 @@
 import io
-import subprocess
 import os
-import tempfile
 import streamlit as st
 from pypdf import PdfReader, PdfWriter
+from pypdf.generic import ArrayObject, DictionaryObject, FloatObject, NameObject, StreamObject
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.colors import black, white # Alterado para usar preto e branco
 from datetime import datetime
+from src.document_engine.office_pool import get_office_pool, OfficePoolBusyError
+from src.document_engine.pdf_cache import get_pdf_cache, contract_cache_key
+from src.document_engine.native_renderer import render_docx_native
+from src.utils.settings import get_section
+
+ENGINE_LIBREOFFICE = "libreoffice"
+ENGINE_REPORTLAB = "reportlab"
+
+
+class PDFConversionError(RuntimeError):
+    """Falha na conversão DOCX -> PDF; a mensagem traz a causa (pool ocupado, LibreOffice, renderizador)."""
+
 
 class PDFManager:
     """
@@ -16,37 +27,75 @@ class PDFManager:
     """
 
     @staticmethod
-    def convert_docx_to_pdf(docx_bytes: io.BytesIO) -> io.BytesIO:
+    def engine_for(template_path: str) -> str:
         """
-        Converte DOCX para PDF usando o LibreOffice (Headless).
-        (LÓGICA PRESERVADA)
+        Motor de PDF configurado para o modelo ('libreoffice' ou 'reportlab').
+        Configuração opcional no secrets.toml, pelo nome do arquivo:
+            [pdf_engines]
+            default = "libreoffice"
+            "modelo_contrato_V2.docx" = "reportlab"
         """
-        with tempfile.TemporaryDirectory() as temp_dir:
-            temp_docx_path = os.path.join(temp_dir, "temp_contract.docx")
-            
-            with open(temp_docx_path, "wb") as f:
-                f.write(docx_bytes.getbuffer())
+        cfg = get_section("pdf_engines")
+        engine = cfg.get(os.path.basename(template_path), cfg.get("default", ENGINE_LIBREOFFICE))
+        return engine if engine in (ENGINE_LIBREOFFICE, ENGINE_REPORTLAB) else ENGINE_LIBREOFFICE
+
+    @staticmethod
+    def convert_docx_to_pdf(docx_bytes: io.BytesIO, engine: str = ENGINE_LIBREOFFICE) -> io.BytesIO:
+        """
+        Converte DOCX para PDF (ver converter_docx), exibindo o erro na página.
+        Retorna None em caso de falha.
+        """
+        try:
+            return PDFManager.converter_docx(docx_bytes, engine)
+        except PDFConversionError as e:
+            st.error(str(e))
+            return None
 
+    @staticmethod
+    def converter_docx(docx_bytes: io.BytesIO, engine: str = ENGINE_LIBREOFFICE) -> io.BytesIO:
+        """
+        Converte DOCX para PDF.
+        - libreoffice: pool de instâncias LibreOffice (Headless); cada worker mantém
+          seu próprio perfil e processo, evitando o boot a cada contrato.
+        - reportlab: renderizador nativo para o layout fixo do contrato, sem suíte de escritório.
+        Falhas sobem como PDFConversionError com a causa (fora do Streamlit, ex. nos
+        workers da fila, o st.error não chega a ninguém).
+        """
+        if engine == ENGINE_REPORTLAB:
             try:
-                # O comando 'soffice' é o binário padrão para o LibreOffice Headless
-                subprocess.run([
-                    'soffice', '--headless', '--convert-to', 'pdf',
-                    '--outdir', temp_dir, temp_docx_path
-                ], check=True, capture_output=True)
-                
-                pdf_path = os.path.join(temp_dir, "temp_contract.pdf")
-                
-                if not os.path.exists(pdf_path):
-                    # Tenta novamente com o comando 'libreoffice' caso 'soffice' falhe no ambiente
-                    subprocess.run(['libreoffice', '--headless', '--convert-to', 'pdf', '--outdir', temp_dir, temp_docx_path], check=True)
-
-                with open(pdf_path, "rb") as f:
-                    pdf_bytes = io.BytesIO(f.read())
-                
-                return pdf_bytes
+                return render_docx_native(docx_bytes)
             except Exception as e:
-                st.error(f"Erro na conversão PDF. Verifique se o LibreOffice está instalado no servidor: {e}")
-                return None
+                raise PDFConversionError(f"Erro na renderização nativa do PDF: {e}") from e
+
+        try:
+            return get_office_pool().convert(docx_bytes)
+        except OfficePoolBusyError as e:
+            raise PDFConversionError(f"Servidor de conversão ocupado: {e}") from e
+        except Exception as e:
+            raise PDFConversionError(
+                f"Erro na conversão PDF. Verifique se o LibreOffice está instalado no servidor: {e}"
+            ) from e
+
+    @staticmethod
+    def generate_contract_pdf(processor, context: dict, entry_rows: list, installment_rows: list) -> io.BytesIO:
+        """
+        DOCX -> PDF com cache endereçado por conteúdo: contexto, parcelas, checksum e motor do modelo.
+        Regerar um contrato com dados idênticos devolve o PDF do disco local.
+        Falhas de conversão sobem como PDFConversionError.
+        """
+        engine = PDFManager.engine_for(processor.template_path)
+        cache = get_pdf_cache()
+        key = contract_cache_key(f"{processor.template_checksum}:{engine}", context, entry_rows, installment_rows)
+
+        cached = cache.get(key)
+        if cached is not None:
+            return io.BytesIO(cached)
+
+        docx_buffer = processor.generate_docx(context, entry_rows, installment_rows)
+        pdf_buffer = PDFManager.converter_docx(docx_buffer, engine)
+        cache.put(key, pdf_buffer.getvalue())
+        pdf_buffer.seek(0)
+        return pdf_buffer
 
     @staticmethod
     def create_signature_stamp(data_assinatura: datetime, nome_aluno: str, cpf: str, email: str, ip: str, link: str, hash_auth: str) -> io.BytesIO:
@@ -96,13 +145,24 @@ class PDFManager:
         return packet
 
     @staticmethod
-    def apply_stamp_to_pdf(pdf_original_bytes: io.BytesIO, stamp_bytes: io.BytesIO) -> io.BytesIO:
+    def apply_stamp_to_pdf(pdf_original_bytes: io.BytesIO, stamp_bytes: io.BytesIO, incremental: bool = True) -> io.BytesIO:
         """
-        Faz o merge do carimbo com todas as páginas do PDF usando pypdf.
-        (LÓGICA PRESERVADA)
+        Aplica o carimbo em todas as páginas do PDF.
+        pdf_original_bytes: qualquer stream binário posicionável (BytesIO ou o arquivo
+        aberto devolvido por StorageService.baixar), lido sob demanda pelo pypdf.
+        incremental=True: o carimbo vira um único Form XObject e é anexado como
+        atualização incremental; os bytes do original ficam intactos no início do arquivo.
+        incremental=False: merge_page em cada página e reescrita completa (modo anterior).
         """
+        if incremental:
+            try:
+                return PDFManager._apply_stamp_incremental(pdf_original_bytes, stamp_bytes)
+            except Exception as e:
+                print(f"Carimbo incremental falhou, usando merge completo: {e}")
+
         try:
             pdf_original_bytes.seek(0)
+            stamp_bytes.seek(0)
             existing_pdf = PdfReader(pdf_original_bytes)
             stamp_pdf = PdfReader(stamp_bytes)
             stamp_page = stamp_pdf.pages[0]
@@ -119,3 +179,60 @@ class PDFManager:
         except Exception as e:
             st.error(f"Erro ao aplicar carimbo: {e}")
             return pdf_original_bytes
+
+    @staticmethod
+    def _apply_stamp_incremental(pdf_original_bytes: io.BytesIO, stamp_bytes: io.BytesIO) -> io.BytesIO:
+        pdf_original_bytes.seek(0)
+        stamp_bytes.seek(0)
+        # PdfReader sobre o próprio stream (o writer só aceita BytesIO ou reader):
+        # os bytes do original são copiados uma vez, na escrita
+        writer = PdfWriter(PdfReader(pdf_original_bytes), incremental=True)
+        stamp_page = PdfReader(stamp_bytes).pages[0]
+
+        # Form XObject único, compartilhado por todas as páginas
+        form = StreamObject()
+        form.set_data(stamp_page.get_contents().get_data())
+        form.update({
+            NameObject("/Type"): NameObject("/XObject"),
+            NameObject("/Subtype"): NameObject("/Form"),
+            NameObject("/BBox"): ArrayObject([FloatObject(v) for v in stamp_page.mediabox]),
+            NameObject("/Resources"): stamp_page["/Resources"].clone(writer),
+        })
+        form_ref = writer._add_object(form)
+
+        # O conteúdo original fica entre q/Q para que seu estado gráfico não afete o carimbo
+        abre_ref = writer._add_object(PDFManager._content_stream(b"q\n"))
+        for page in writer.pages:
+            resources = page.get("/Resources")
+            resources = resources.get_object() if resources is not None else DictionaryObject()
+            xobjects = resources.get("/XObject")
+            xobjects = xobjects.get_object() if xobjects is not None else DictionaryObject()
+
+            nome = "/NxStamp"
+            while nome in xobjects and xobjects[nome] != form_ref:
+                nome += "X"
+            xobjects[NameObject(nome)] = form_ref
+            resources[NameObject("/XObject")] = xobjects
+            page[NameObject("/Resources")] = resources
+
+            conteudo = page.get("/Contents")
+            conteudo = conteudo.get_object() if conteudo is not None else ArrayObject()
+            anteriores = list(conteudo) if isinstance(conteudo, ArrayObject) else [page.raw_get("/Contents")]
+            fecha_ref = writer._add_object(PDFManager._content_stream(f"Q q {nome} Do Q\n".encode()))
+            page[NameObject("/Contents")] = ArrayObject([abre_ref, *anteriores, fecha_ref])
+
+        result_stream = io.BytesIO()
+        writer.write(result_stream)
+        result_stream.seek(0)
+        return result_stream
+
+    @staticmethod
+    def _content_stream(data: bytes) -> StreamObject:
+        stream = StreamObject()
+        stream.set_data(data)
+        return stream
+
+    @staticmethod
+    def original_preservado(pdf_original: bytes, pdf_assinado: bytes) -> bool:
+        """True se o PDF assinado começa exatamente com os bytes do original (atualização incremental)."""
+        return pdf_assinado[:len(pdf_original)] == pdf_original
@@ -1,28 +1,48 @@
 import io
-from docxtpl import DocxTemplate
+import copy
 from docx import Document
 from docx.shared import Pt, RGBColor
 from docx.enum.text import WD_ALIGN_PARAGRAPH
+from docx.oxml.ns import qn
+from src.document_engine.template_cache import template_registry
 
 class ContractProcessor:
+    # Linhas-molde das tabelas de pagamento, compartilhadas entre instâncias
+    _prototypes = {}
+
     def __init__(self, template_path: str):
         self.template_path = template_path
 
+    @property
+    def template_checksum(self) -> str:
+        """SHA-256 do arquivo de modelo atual (usado como parte da chave do cache de PDFs)."""
+        return template_registry.get(self.template_path).checksum
+
     def generate_docx(self, context: dict, entry_rows: list, installment_rows: list) -> io.BytesIO:
-        # Fase 1: Preenchimento de variáveis {{ }}
-        doc_tpl = DocxTemplate(self.template_path)
+        # Fase 1: Preenchimento de variáveis {{ }} (modelo já compilado em memória)
+        doc_tpl = template_registry.get(self.template_path).new_render()
         doc_tpl.render(context)
-        
-        temp_buffer = io.BytesIO()
-        doc_tpl.save(temp_buffer)
-        temp_buffer.seek(0)
 
-        # Fase 2: Injeção das Tabelas (Seção 03 e 04)
-        return self._inject_payment_tables(temp_buffer, entry_rows, installment_rows)
+        # Fase 2: Injeção das Tabelas (Seção 03 e 04) no mesmo documento renderizado,
+        # sem salvar e reabrir o DOCX entre as fases
+        self._fill_payment_tables(doc_tpl.docx, entry_rows, installment_rows)
+
+        final_buffer = io.BytesIO()
+        doc_tpl.save(final_buffer)
+        final_buffer.seek(0)
+        return final_buffer
 
     def _inject_payment_tables(self, doc_stream: io.BytesIO, entry_data: list, installment_data: list) -> io.BytesIO:
+        """Preenche as tabelas de um DOCX já serializado (usado fora do fluxo de render)."""
         doc = Document(doc_stream)
-        
+        self._fill_payment_tables(doc, entry_data, installment_data)
+
+        final_buffer = io.BytesIO()
+        doc.save(final_buffer)
+        final_buffer.seek(0)
+        return final_buffer
+
+    def _fill_payment_tables(self, doc, entry_data: list, installment_data: list):
         # Filtra tabelas financeiras (aquelas que têm 'Vencimento' no cabeçalho)
         payment_tables = []
         for table in doc.tables:
@@ -41,31 +61,61 @@ class ContractProcessor:
         if len(payment_tables) > 1 and installment_data:
             self._fill_table_rows(payment_tables[1], installment_data)
 
-        final_buffer = io.BytesIO()
-        doc.save(final_buffer)
-        final_buffer.seek(0)
-        return final_buffer
+    @staticmethod
+    def _row_values(item: dict) -> list:
+        # Mapeia para as colunas: Parcela | Vencimento | Valor | Forma
+        return [
+            str(item.get('numero', item.get('n', ''))),
+            str(item.get('data', item.get('vencimento', ''))),
+            str(item.get('valor', '')),
+            str(item.get('forma', ''))
+        ]
+
+    def _row_prototype(self, table):
+        """
+        Monta uma única linha já estilizada (Arial 10, centralizada) via python-docx
+        e a destaca da tabela para servir de molde às demais.
+        O molde fica em cache por layout de colunas (larguras do tblGrid).
+        """
+        layout = tuple(col.w for col in table._tbl.tblGrid.gridCol_lst)
+        prototype = self._prototypes.get(layout)
+        if prototype is not None:
+            return prototype
+
+        row = table.add_row()
+        for i in range(4):
+            paragraph = row.cells[i].paragraphs[0]
+            paragraph.clear()
+            run = paragraph.add_run("0")
+            run.font.name = 'Arial'
+            run.font.size = Pt(10)
+            paragraph.alignment = WD_ALIGN_PARAGRAPH.CENTER
+        table._tbl.remove(row._tr)
+
+        self._prototypes[layout] = row._tr
+        return row._tr
 
     def _fill_table_rows(self, table, data_rows: list):
+        tbl = table._tbl
+
         # Limpa linhas residuais mantendo apenas o cabeçalho
-        while len(table.rows) > 1:
-            table._element.remove(table.rows[-1]._element)
+        for tr in tbl.tr_lst[1:]:
+            tbl.remove(tr)
 
+        prototype = self._row_prototype(table)
+        novas_linhas = []
         for item in data_rows:
-            row = table.add_row()
-            # Mapeia para as colunas: Parcela | Vencimento | Valor | Forma
-            valores = [
-                str(item.get('numero', item.get('n', ''))),
-                str(item.get('data', item.get('vencimento', ''))),
-                str(item.get('valor', '')),
-                str(item.get('forma', ''))
-            ]
-
-            for i, texto in enumerate(valores):
-                cell = row.cells[i]
-                paragraph = cell.paragraphs[0]
-                paragraph.clear()
-                run = paragraph.add_run(texto)
-                run.font.name = 'Arial'
-                run.font.size = Pt(10)
-                paragraph.alignment = WD_ALIGN_PARAGRAPH.CENTER
+            tr = copy.deepcopy(prototype)
+            for t, texto in zip(tr.iter(qn('w:t')), self._row_values(item)):
+                t.text = texto
+                if texto != texto.strip():
+                    t.set(qn('xml:space'), 'preserve')
+            novas_linhas.append(tr)
+
+        # Inserção em bloco: as linhas ficam após o cabeçalho, no fim do <w:tbl>
+        tbl.extend(novas_linhas)
+
+
+def render_docx_bytes(template_path: str, context: dict, entry_rows: list, installment_rows: list) -> bytes:
+    """Ponto de entrada picklable para render em processos separados (geração em lote)."""
+    return ContractProcessor(template_path).generate_docx(context, entry_rows, installment_rows).getvalue()
@@ -0,0 +1,115 @@
+import io
+import os
+import re
+import copy
+import hashlib
+import threading
+from docx import Document
+from docxtpl import DocxTemplate
+from jinja2 import Template
+
+
+class CompiledTemplate:
+    """
+    Modelo DOCX já carregado: bytes, pacote python-docx parseado e
+    o XML do corpo pré-processado e compilado pelo Jinja.
+    """
+
+    def __init__(self, path: str, blob: bytes, mtime_ns: int):
+        self.path = path
+        self.mtime_ns = mtime_ns
+        self.checksum = hashlib.sha256(blob).hexdigest()
+        self.blob = blob
+        self.document = Document(io.BytesIO(blob))
+
+        # O patch_xml do docxtpl (regex sobre ~360KB de XML) é a parte mais cara do render
+        tpl = DocxTemplate(io.BytesIO(blob))
+        tpl.docx = self.document
+        self.body_src = tpl.patch_xml(tpl.get_xml())
+
+        self._compiled = {}
+        self._lock = threading.Lock()
+
+    def compile(self, src_xml: str) -> Template:
+        """Compila (uma vez) um trecho de XML já patcheado."""
+        template = self._compiled.get(src_xml)
+        if template is None:
+            with self._lock:
+                template = self._compiled.get(src_xml)
+                if template is None:
+                    template = Template(re.sub(r"<w:p([ >])", r"\n<w:p\1", src_xml))
+                    self._compiled[src_xml] = template
+        return template
+
+    def new_render(self) -> "CachedDocxTemplate":
+        """Clone barato (deepcopy do pacote em memória) para um único render."""
+        return CachedDocxTemplate(self)
+
+
+class CachedDocxTemplate(DocxTemplate):
+    """DocxTemplate que reaproveita o pacote e os templates Jinja do registro."""
+
+    def __init__(self, compiled: CompiledTemplate):
+        super().__init__(io.BytesIO(compiled.blob))
+        self._compiled = compiled
+        self.docx = copy.deepcopy(compiled.document)
+
+    def build_xml(self, context, jinja_env=None):
+        return self.render_xml_part(self._compiled.body_src, self.docx._part, context, jinja_env)
+
+    def render_xml_part(self, src_xml, part, context, jinja_env=None):
+        # Com jinja_env customizado não há como reaproveitar a compilação
+        if jinja_env is not None:
+            return super().render_xml_part(src_xml, part, context, jinja_env)
+
+        # Mesmo pós-processamento de DocxTemplate.render_xml_part, sem recompilar
+        self.current_rendering_part = part
+        dst_xml = self._compiled.compile(src_xml).render(context)
+        dst_xml = re.sub(r"\n<w:p([ >])", r"<w:p\1", dst_xml)
+        dst_xml = (
+            dst_xml.replace("{_{", "{{")
+            .replace("}_}", "}}")
+            .replace("{_%", "{%")
+            .replace("%_}", "%}")
+        )
+        return self.resolve_listing(dst_xml)
+
+
+class TemplateRegistry:
+    """
+    Registro de modelos por processo, chaveado pelo caminho absoluto.
+    A entrada é invalidada quando o mtime ou o tamanho do arquivo mudam.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, template_path: str) -> CompiledTemplate:
+        path = os.path.abspath(template_path)
+        st_info = os.stat(path)
+
+        entry = self._entries.get(path)
+        if entry and entry.mtime_ns == st_info.st_mtime_ns and len(entry.blob) == st_info.st_size:
+            return entry
+
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry and entry.mtime_ns == st_info.st_mtime_ns and len(entry.blob) == st_info.st_size:
+                return entry
+            with open(path, "rb") as f:
+                blob = f.read()
+            entry = CompiledTemplate(path, blob, st_info.st_mtime_ns)
+            self._entries[path] = entry
+            return entry
+
+    def invalidate(self, template_path: str = None):
+        with self._lock:
+            if template_path is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(os.path.abspath(template_path), None)
+
+
+# Instância global compartilhada pelos ContractProcessor do processo
+template_registry = TemplateRegistry()
@@ -0,0 +1,95 @@
+"""
+Ponte UNO para o OfficePool.
+
+Roda no interpretador que enxerga o módulo 'uno' (normalmente o python3 do
+sistema, com o pacote python3-uno), quando o Python do app não consegue importá-lo.
+Conecta uma vez ao listener de um soffice já iniciado e atende pedidos pela
+entrada padrão, um JSON por linha, respondendo um JSON por linha:
+    {"docx": "/tmp/a.docx", "pdf": "/tmp/a.pdf"}  -> {"ok": true} | {"ok": false, "erro": "..."}
+    {"ping": true}                                -> {"ok": true}
+    {"encerrar": true}                            -> encerra o soffice e sai
+A primeira linha emitida indica se a conexão deu certo.
+
+Não importa nada do projeto: o interpretador do sistema não tem as dependências do app.
+    /usr/bin/python3 uno_bridge.py --port 2002 --timeout 30
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+import uno
+from com.sun.star.beans import PropertyValue
+
+
+def _prop(name, value):
+    p = PropertyValue()
+    p.Name = name
+    p.Value = value
+    return p
+
+
+def conectar(port: int, timeout: float):
+    local_ctx = uno.getComponentContext()
+    resolver = local_ctx.ServiceManager.createInstanceWithContext("com.sun.star.bridge.UnoUrlResolver", local_ctx)
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            ctx = resolver.resolve(f"uno:socket,host=127.0.0.1,port={port};urp;StarOffice.ComponentContext")
+            return ctx.ServiceManager.createInstanceWithContext("com.sun.star.frame.Desktop", ctx)
+        except Exception:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.25)
+
+
+def converter(desktop, docx_path: str, pdf_path: str):
+    doc = desktop.loadComponentFromURL(
+        uno.systemPathToFileUrl(os.path.abspath(docx_path)), "_blank", 0, (_prop("Hidden", True),)
+    )
+    try:
+        doc.storeToURL(uno.systemPathToFileUrl(os.path.abspath(pdf_path)), (_prop("FilterName", "writer_pdf_Export"),))
+    finally:
+        doc.close(True)
+
+
+def responder(dados: dict):
+    sys.stdout.write(json.dumps(dados) + "\n")
+    sys.stdout.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ponte UNO do pool de conversão DOCX -> PDF")
+    parser.add_argument("--port", type=int, required=True)
+    parser.add_argument("--timeout", type=float, default=30)
+    args = parser.parse_args()
+
+    try:
+        desktop = conectar(args.port, args.timeout)
+    except Exception as e:
+        responder({"ok": False, "erro": f"LibreOffice não respondeu no socket UNO: {e}"})
+        return 1
+    responder({"ok": True})
+
+    for linha in sys.stdin:
+        pedido = json.loads(linha)
+        if pedido.get("encerrar"):
+            try:
+                desktop.terminate()
+            except Exception:
+                pass
+            return 0
+        try:
+            if pedido.get("ping"):
+                desktop.getComponents()
+            else:
+                converter(desktop, pedido["docx"], pedido["pdf"])
+            responder({"ok": True})
+        except Exception as e:
+            responder({"ok": False, "erro": str(e)})
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
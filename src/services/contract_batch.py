@@ -0,0 +1,226 @@
+import io
+import os
+import uuid
+import multiprocessing
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from src.database.repo_contratos import ContratoRepository
+from src.document_engine.processor import ContractProcessor, render_docx_bytes
+from src.document_engine.office_pool import get_office_pool
+from src.document_engine.pdf_converter import PDFManager, ENGINE_REPORTLAB
+from src.document_engine.native_renderer import render_contract_pdf_bytes
+from src.document_engine.pdf_cache import get_pdf_cache, contract_cache_key
+from src.document_engine.contract_builder import (
+    calcular_valores, parcelas_entrada, parcelas_saldo, tabelas_pdf, montar_contexto, montar_registro_contrato,
+    montar_parcelas
+)
+from src.utils.storage import StorageService
+
+TEMPLATE_PADRAO = "assets/modelo_contrato_V2.docx"
+
+# Etapas de cada contrato do lote, na ordem
+ETAPAS = ["pendente", "renderizado", "convertido", "enviado", "salvo"]
+
+
+class BatchContractGenerator:
+    """
+    Geração de contratos em lote para uma turma, com um plano financeiro comum.
+    - Render DOCX em pool de processos (CPU)
+    - Conversão PDF em lotes de vários arquivos por instância LibreOffice,
+      ou PDF direto no pool de processos quando o modelo usa o motor nativo
+    - Upload via StorageService e insert único (contratos + parcelas) via ContratoRepository
+
+    plano: dict com percentual_desconto, entrada_total, entrada_qtd,
+           entrada_primeiro_vencimento, entrada_forma, saldo_qtd,
+           saldo_primeiro_vencimento, saldo_forma
+    """
+
+    def __init__(self, template_path: str = TEMPLATE_PADRAO, max_workers: int = None,
+                 chunk_size: int = 8, upload_workers: int = 8):
+        self.template_path = template_path
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.chunk_size = max(1, chunk_size)
+        self.upload_workers = upload_workers
+        self.engine = PDFManager.engine_for(template_path)
+
+    def preparar(self, alunos: list, curso: dict, turma: dict, plano: dict):
+        """
+        Monta contexto e tabelas de cada contrato (sem I/O).
+        Retorna (jobs, calculo), onde calculo guarda os valores comuns do plano.
+        """
+        agora = datetime.now()
+        valores = calcular_valores(float(curso.get('valor_bruto', 0)), float(plano.get('percentual_desconto', 0)))
+        entrada_total = min(float(plano.get('entrada_total', 0)), valores['valor_final'])
+        entrada_qtd = int(plano.get('entrada_qtd', 1))
+
+        lista_entrada = parcelas_entrada(
+            entrada_total, entrada_qtd, plano['entrada_primeiro_vencimento'], plano.get('entrada_forma', 'PIX')
+        )
+        lista_saldo = parcelas_saldo(
+            round(valores['valor_final'] - entrada_total, 2), int(plano.get('saldo_qtd', 12)),
+            plano['saldo_primeiro_vencimento'], plano.get('saldo_forma', 'Boleto')
+        )
+        tbl_ent, tbl_sal = tabelas_pdf(lista_entrada, lista_saldo)
+        checksum = f"{ContractProcessor(self.template_path).template_checksum}:{self.engine}"
+
+        jobs = []
+        for aluno in alunos:
+            ctx = montar_contexto(aluno, curso, turma, valores, agora)
+            jobs.append({
+                "aluno": aluno,
+                "token": str(uuid.uuid4()),
+                "ctx": ctx,
+                "tbl_ent": tbl_ent,
+                "tbl_sal": tbl_sal,
+                "cache_key": contract_cache_key(checksum, ctx, tbl_ent, tbl_sal),
+                "etapa": "pendente",
+                "erro": None,
+                "docx": None,
+                "pdf": None,
+                "url": None,
+            })
+
+        calculo = {
+            "turma": turma, "valores": valores, "agora": agora,
+            "entrada_total": entrada_total, "entrada_qtd": entrada_qtd,
+            "lista_entrada": lista_entrada, "lista_saldo": lista_saldo,
+            "parcelas": montar_parcelas(lista_entrada, lista_saldo),
+        }
+        return jobs, calculo
+
+    @staticmethod
+    def _registro(job: dict, calculo: dict) -> dict:
+        return montar_registro_contrato(
+            job["aluno"], calculo["turma"], calculo["valores"], calculo["entrada_total"], calculo["entrada_qtd"],
+            calculo["lista_entrada"], calculo["lista_saldo"], job["token"], job["url"], calculo["agora"]
+        )
+
+    def executar(self, alunos: list, curso: dict, turma: dict, plano: dict, on_progress=None) -> list:
+        """
+        Gera, converte, envia e grava os contratos.
+        on_progress(job) é chamado sempre que um contrato muda de etapa ou falha.
+        Retorna a lista de jobs com 'etapa' final ('salvo' ou 'erro') e 'erro'.
+        """
+        jobs, calculo = self.preparar(alunos, curso, turma, plano)
+
+        def avancar(job, etapa, erro=None):
+            job["etapa"] = "erro" if erro else etapa
+            job["erro"] = erro
+            if on_progress:
+                on_progress(job)
+
+        # 1. Cache de PDFs: contratos idênticos já gerados pulam render e conversão
+        cache = get_pdf_cache()
+        for job in jobs:
+            cached = cache.get(job["cache_key"])
+            if cached is not None:
+                job["pdf"] = io.BytesIO(cached)
+                avancar(job, "convertido")
+
+        # 2. Render em processos separados: só o DOCX (LibreOffice) ou já o PDF (motor nativo)
+        nativo = self.engine == ENGINE_REPORTLAB
+        funcao = render_contract_pdf_bytes if nativo else render_docx_bytes
+        pendentes = [j for j in jobs if j["pdf"] is None]
+        if pendentes:
+            ctx_mp = multiprocessing.get_context("forkserver")
+            with ProcessPoolExecutor(max_workers=self.max_workers, mp_context=ctx_mp) as executor:
+                futures = {
+                    executor.submit(funcao, self.template_path, j["ctx"], j["tbl_ent"], j["tbl_sal"]): j
+                    for j in pendentes
+                }
+                for future in as_completed(futures):
+                    job = futures[future]
+                    try:
+                        conteudo = future.result()
+                    except Exception as e:
+                        avancar(job, "renderizado", f"Erro no render: {e}")
+                        continue
+                    if nativo:
+                        job["pdf"] = io.BytesIO(conteudo)
+                        cache.put(job["cache_key"], conteudo)
+                        avancar(job, "convertido")
+                    else:
+                        job["docx"] = io.BytesIO(conteudo)
+                        avancar(job, "renderizado")
+
+        # 3. Conversão em lotes de vários arquivos, um lote por worker LibreOffice
+        renderizados = [j for j in jobs if j["etapa"] == "renderizado"]
+        lotes = [renderizados[i:i + self.chunk_size] for i in range(0, len(renderizados), self.chunk_size)]
+        if lotes:
+            pool = get_office_pool()
+            with ThreadPoolExecutor(max_workers=pool.size) as executor:
+                futures = {executor.submit(pool.convert_many, [j["docx"] for j in lote]): lote for lote in lotes}
+                for future in as_completed(futures):
+                    lote = futures[future]
+                    try:
+                        pdfs = future.result()
+                    except Exception as e:
+                        pdfs = [None] * len(lote)
+                        erro_lote = f"Erro na conversão: {e}"
+                    else:
+                        erro_lote = "Erro na conversão: PDF não gerado."
+                    for job, pdf in zip(lote, pdfs):
+                        job["docx"] = None
+                        if pdf is None:
+                            avancar(job, "convertido", erro_lote)
+                            continue
+                        job["pdf"] = pdf
+                        cache.put(job["cache_key"], pdf.getvalue())
+                        avancar(job, "convertido")
+
+        # 4. Upload para o bucket (I/O de rede em paralelo)
+        convertidos = [j for j in jobs if j["etapa"] == "convertido"]
+        with ThreadPoolExecutor(max_workers=self.upload_workers) as executor:
+            futures = {
+                executor.submit(StorageService.upload_minuta, j["pdf"], j["aluno"]["nome_completo"], curso["nome"], j["token"]): j
+                for j in convertidos
+            }
+            for future in as_completed(futures):
+                job = futures[future]
+                url, erro = future.result()
+                job["pdf"] = None
+                if erro:
+                    avancar(job, "enviado", f"Erro Upload: {erro}")
+                else:
+                    job["url"] = url
+                    avancar(job, "enviado")
+
+        # 5. Insert único de todos os contratos enviados, com as parcelas de cada um
+        enviados = [j for j in jobs if j["etapa"] == "enviado"]
+        if enviados:
+            res = ContratoRepository.criar_contratos_em_lote(
+                [self._registro(j, calculo) for j in enviados], calculo["parcelas"]
+            )
+            erro_db = res['error'] if isinstance(res, dict) and 'error' in res else None
+            if erro_db:
+                enviados = self._descartar_minutas(enviados, avancar, erro_db)
+            for job in enviados:
+                avancar(job, "salvo")
+
+        return jobs
+
+    @staticmethod
+    def _descartar_minutas(enviados: list, avancar, erro_db: str) -> list:
+        """
+        Insert do lote com erro: as minutas já enviadas ficariam no bucket sem contrato
+        apontando para elas (e uma nova execução envia outras, com outro timestamp no nome).
+        Confere antes quais contratos chegaram a ser gravados (erro depois do commit, ex.
+        na resposta): esses ficam com a minuta e são devolvidos como salvos. Sem conseguir
+        conferir, nenhuma minuta é removida: melhor um arquivo órfão que um link quebrado.
+        """
+        gravados = ContratoRepository.tokens_gravados([j["token"] for j in enviados])
+        if gravados is None:
+            for job in enviados:
+                avancar(job, "salvo", erro_db)
+            return []
+
+        falhos = [j for j in enviados if j["token"] not in gravados]
+        erro_remocao = StorageService.remover(
+            [c for c in (StorageService.caminho_do_objeto(j["url"]) for j in falhos) if c]
+        )
+        if erro_remocao:
+            print(f"Minutas do lote não removidas após erro no insert: {erro_remocao}")
+        for job in falhos:
+            job["url"] = None
+            avancar(job, "salvo", erro_db)
+        return [j for j in enviados if j["token"] in gravados]
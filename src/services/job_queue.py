@@ -0,0 +1,242 @@
+import os
+import json
+import time
+import sqlite3
+import tempfile
+from contextlib import contextmanager
+import streamlit as st
+from src.utils.settings import get_section
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    tipo TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pendente',
+    tentativas INTEGER NOT NULL DEFAULT 0,
+    max_tentativas INTEGER NOT NULL DEFAULT 5,
+    proxima_execucao REAL NOT NULL,
+    lease_ate REAL,
+    worker TEXT,
+    resultado TEXT,
+    erro TEXT,
+    criado_em REAL NOT NULL,
+    atualizado_em REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_fila ON jobs (status, proxima_execucao);
+"""
+
+
+class JobQueue:
+    """
+    Fila de jobs durável em SQLite, compartilhada entre o Streamlit e os workers.
+    Status: pendente -> processando -> concluido | falhou.
+    Falhas voltam para 'pendente' com backoff exponencial até max_tentativas.
+    """
+
+    def __init__(self, db_path: str, backoff_base: float = 5.0, backoff_max: float = 600.0, lease: float = 300.0):
+        self.db_path = db_path
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.lease = lease
+        with self._conn() as conn:
+            conn.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    @contextmanager
+    def _conn(self):
+        conn = self._connect()
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @contextmanager
+    def _transacao(self):
+        """Conexão com BEGIN IMMEDIATE: leitura e escrita sem outro processo no meio."""
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            yield conn
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _inserir(conn, tipo: str, payload: dict, max_tentativas: int, executar_em: float, agora: float) -> int:
+        return conn.execute(
+            "INSERT INTO jobs (tipo, payload, max_tentativas, proxima_execucao, criado_em, atualizado_em) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (tipo, json.dumps(payload, default=str), max_tentativas, executar_em, agora, agora)
+        ).lastrowid
+
+    @staticmethod
+    def _to_dict(row):
+        if row is None:
+            return None
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        job["resultado"] = json.loads(job["resultado"]) if job["resultado"] else None
+        return job
+
+    def enqueue(self, tipo: str, payload: dict, max_tentativas: int = 5, executar_em: float = None) -> int:
+        """Enfileira um job; `executar_em` (timestamp) adia a primeira execução."""
+        agora = time.time()
+        with self._conn() as conn:
+            return self._inserir(conn, tipo, payload, max_tentativas, executar_em or agora, agora)
+
+    def enqueue_many(self, tipo: str, payloads: list, max_tentativas: int = 5) -> list:
+        """Enfileira vários jobs do mesmo tipo numa transação. Retorna os ids, na ordem dos payloads."""
+        agora = time.time()
+        with self._transacao() as conn:
+            return [self._inserir(conn, tipo, payload, max_tentativas, agora, agora) for payload in payloads]
+
+    def enqueue_se_livre(self, tipo: str, payload: dict, max_tentativas: int = 5, executar_em: float = None):
+        """
+        Enfileira o job só se não houver outro do tipo na fila ou em execução (jobs recorrentes).
+        A conferência e o insert rodam na mesma transação: dois processos agendando ao
+        mesmo tempo não criam execuções duplicadas. Retorna o id, ou None se já havia um.
+        """
+        agora = time.time()
+        with self._transacao() as conn:
+            if self._agendado(conn, tipo):
+                return None
+            return self._inserir(conn, tipo, payload, max_tentativas, executar_em or agora, agora)
+
+    @staticmethod
+    def _agendado(conn, tipo: str) -> bool:
+        return conn.execute(
+            "SELECT 1 FROM jobs WHERE status IN ('pendente', 'processando') AND tipo = ? LIMIT 1", (tipo,)
+        ).fetchone() is not None
+
+    def agendado(self, tipo: str) -> bool:
+        """Há job do tipo na fila ou em execução?"""
+        with self._conn() as conn:
+            return self._agendado(conn, tipo)
+
+    def claim(self, worker_id: str):
+        """
+        Reserva o próximo job pronto para execução.
+        Jobs 'processando' com lease vencido (worker morto) também são retomados, se
+        ainda tiverem tentativas; os que já esgotaram max_tentativas vão para 'falhou'
+        (um job que derruba o worker não é retomado para sempre).
+        """
+        agora = time.time()
+        with self._transacao() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'falhou', lease_ate = NULL, atualizado_em = ?, "
+                "erro = COALESCE(erro || ' / ', '') || 'lease vencido (worker interrompido) sem tentativas restantes' "
+                "WHERE status = 'processando' AND lease_ate < ? AND tentativas >= max_tentativas",
+                (agora, agora)
+            )
+            row = conn.execute(
+                "SELECT id FROM jobs "
+                "WHERE (status = 'pendente' AND proxima_execucao <= ?) "
+                "   OR (status = 'processando' AND lease_ate < ?) "
+                "ORDER BY proxima_execucao, id LIMIT 1",
+                (agora, agora)
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = 'processando', tentativas = tentativas + 1, worker = ?, "
+                "lease_ate = ?, atualizado_em = ? WHERE id = ?",
+                (worker_id, agora + self.lease, agora, row["id"])
+            )
+            return self._to_dict(conn.execute("SELECT * FROM jobs WHERE id = ?", (row["id"],)).fetchone())
+
+    def renovar(self, job_id: int, worker_id: str) -> bool:
+        """
+        Estende o lease de um job em execução (heartbeat do worker). Retorna False se o
+        job não é mais deste worker: o lease venceu e outro worker o retomou.
+        """
+        agora = time.time()
+        with self._conn() as conn:
+            cur = conn.execute(
+                "UPDATE jobs SET lease_ate = ?, atualizado_em = ? WHERE id = ? AND worker = ? AND status = 'processando'",
+                (agora + self.lease, agora, job_id, worker_id)
+            )
+            return cur.rowcount == 1
+
+    def complete(self, job_id: int, resultado: dict, worker_id: str) -> bool:
+        """
+        Registra o resultado se o job ainda for deste worker. Retorna False se o lease
+        venceu e o job foi retomado por outro worker (o resultado deste é descartado).
+        """
+        with self._conn() as conn:
+            cur = conn.execute(
+                "UPDATE jobs SET status = 'concluido', resultado = ?, erro = NULL, lease_ate = NULL, "
+                "atualizado_em = ? WHERE id = ? AND worker = ? AND status = 'processando'",
+                (json.dumps(resultado, default=str), time.time(), job_id, worker_id)
+            )
+            return cur.rowcount == 1
+
+    def fail(self, job_id: int, erro: str, worker_id: str) -> bool:
+        """
+        Agenda nova tentativa com backoff exponencial ou marca como 'falhou'.
+        Mesma regra do complete: só vale se o job ainda for deste worker.
+        """
+        agora = time.time()
+        with self._conn() as conn:
+            row = conn.execute("SELECT tentativas, max_tentativas FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return False
+            if row["tentativas"] >= row["max_tentativas"]:
+                cur = conn.execute(
+                    "UPDATE jobs SET status = 'falhou', erro = ?, lease_ate = NULL, atualizado_em = ? "
+                    "WHERE id = ? AND worker = ? AND status = 'processando'",
+                    (erro, agora, job_id, worker_id)
+                )
+            else:
+                espera = min(self.backoff_max, self.backoff_base * (2 ** (row["tentativas"] - 1)))
+                cur = conn.execute(
+                    "UPDATE jobs SET status = 'pendente', erro = ?, proxima_execucao = ?, lease_ate = NULL, "
+                    "atualizado_em = ? WHERE id = ? AND worker = ? AND status = 'processando'",
+                    (erro, agora + espera, agora, job_id, worker_id)
+                )
+            return cur.rowcount == 1
+
+    def get(self, job_id: int):
+        with self._conn() as conn:
+            return self._to_dict(conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone())
+
+    def get_many(self, job_ids: list) -> dict:
+        """Vários jobs numa consulta: {id: job} (ids inexistentes ficam de fora)."""
+        if not job_ids:
+            return {}
+        with self._conn() as conn:
+            rows = conn.execute(
+                f"SELECT * FROM jobs WHERE id IN ({','.join('?' * len(job_ids))})", list(job_ids)
+            ).fetchall()
+            return {row["id"]: self._to_dict(row) for row in rows}
+
+    def stats(self) -> dict:
+        with self._conn() as conn:
+            rows = conn.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+            return {r["status"]: r["n"] for r in rows}
+
+
+def job_queue_settings() -> dict:
+    """
+    Configuração opcional no secrets.toml:
+        [job_queue]
+        db_path = "/tmp/nexusmed_jobs.sqlite3"
+        workers = 2
+    """
+    cfg = get_section("job_queue")
+    cfg.setdefault("db_path", os.path.join(tempfile.gettempdir(), "nexusmed_jobs.sqlite3"))
+    cfg.setdefault("workers", 2)
+    return cfg
+
+
+@st.cache_resource
+def get_job_queue() -> JobQueue:
+    return JobQueue(job_queue_settings()["db_path"])
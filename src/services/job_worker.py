@@ -0,0 +1,247 @@
+"""
+Worker da fila de jobs (src/services/job_queue.py).
+
+Roda como processo separado do Streamlit:
+    python -m src.services.job_worker --db /tmp/nexusmed_jobs.sqlite3
+O app também sobe os workers automaticamente via start_workers().
+"""
+import os
+import sys
+import time
+import atexit
+import socket
+import argparse
+import threading
+import subprocess
+from datetime import datetime
+import streamlit as st
+from src.services.job_queue import JobQueue, job_queue_settings, get_job_queue
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Tipo do job -> função(payload) -> resultado (dict)
+HANDLERS = {}
+
+
+def handler(tipo: str):
+    def registrar(fn):
+        HANDLERS[tipo] = fn
+        return fn
+    return registrar
+
+
+@handler("gerar_contrato")
+def gerar_contrato(payload: dict) -> dict:
+    """Render + PDF + upload + insert de um contrato. Idempotente pelo token de acesso."""
+    from src.database.repo_contratos import ContratoRepository
+    from src.database.projections import GERACAO
+    from src.document_engine.processor import ContractProcessor
+    from src.document_engine.pdf_converter import PDFManager
+    from src.utils.storage import StorageService
+
+    dados_db = dict(payload["dados_db"])
+
+    # Retentativa após o insert ter dado certo: não duplica o contrato
+    existente = ContratoRepository.buscar_por_token(dados_db["token_acesso"], perfil=GERACAO)
+    if existente:
+        return {"contrato_id": existente["id"], "url_pdf": existente.get("caminho_arquivo")}
+
+    processor = ContractProcessor(payload["template_path"])
+    # PDFConversionError sobe com a causa, que fica no erro do job (e aparece na página)
+    pdf_buffer = PDFManager.generate_contract_pdf(processor, payload["ctx_doc"], payload["tbl_ent"], payload["tbl_sal"])
+
+    url_pdf, erro_upload = StorageService.upload_minuta(
+        pdf_buffer, payload["nome_aluno"], payload["nome_curso"], dados_db["token_acesso"]
+    )
+    if erro_upload:
+        raise RuntimeError(f"Erro Upload: {erro_upload}")
+
+    dados_db["caminho_arquivo"] = url_pdf
+    # Jobs enfileirados antes da tabela de parcelas não trazem a chave
+    res = ContratoRepository.criar_contrato(dados_db, payload.get("parcelas"))
+    if res and isinstance(res, dict) and 'error' in res:
+        raise RuntimeError(res['error'])
+
+    return {"contrato_id": res.get("id"), "url_pdf": url_pdf}
+
+
+@handler("enviar_email")
+def enviar_email(payload: dict) -> dict:
+    """
+    Envio do link de assinatura (outbox). Erro de SMTP sobe para a fila, que agenda
+    nova tentativa com backoff; a sessão SMTP do worker é reaproveitada entre os jobs.
+    O resultado de cada tentativa fica gravado no contrato (email_status), visível
+    fora da sessão que pediu o envio.
+    """
+    from src.database.repo_contratos import ContratoRepository
+    from src.utils.email_sender import get_smtp_transport, montar_email_contrato
+
+    token = payload.get("token")  # jobs enfileirados antes da situação no contrato não trazem a chave
+    try:
+        transporte = get_smtp_transport()
+        transporte.send(montar_email_contrato(
+            payload["email"], payload["nome_aluno"], payload["link_assinatura"], payload["nome_curso"], transporte.user
+        ))
+    except Exception as e:
+        if token:
+            ContratoRepository.registrar_envio_email(token, payload["email"], str(e))
+        raise
+    # Falha ao gravar não reenvia: o e-mail já saiu, o job conclui mesmo assim
+    if token:
+        ContratoRepository.registrar_envio_email(token, payload["email"])
+    return {"destinatario": payload["email"], "enviado_em": datetime.now().strftime("%d/%m/%Y %H:%M")}
+
+
+@handler("lembretes_assinatura")
+def lembretes_assinatura(payload: dict) -> dict:
+    """Campanha de lembretes para contratos pendentes (job recorrente, ver src/services/reminders.py)."""
+    from src.services.reminders import executar_campanha
+    return executar_campanha()
+
+
+def _manter_lease(queue: JobQueue, job_id: int, worker_id: str, parar: threading.Event):
+    """
+    Heartbeat: renova o lease a cada terço do prazo enquanto o job roda, para um job
+    longo (ex.: campanha de lembretes) não ser retomado por outro worker no meio.
+    """
+    while not parar.wait(queue.lease / 3):
+        try:
+            if not queue.renovar(job_id, worker_id):
+                print(f"[{worker_id}] Job {job_id}: lease perdido para outro worker.")
+                return
+        except Exception as e:
+            # Falha pontual (ex.: 'database is locked'): tenta de novo no próximo ciclo
+            print(f"[{worker_id}] Erro ao renovar o lease do job {job_id}: {e}")
+
+
+def processar_proximo(queue: JobQueue, worker_id: str) -> bool:
+    """Reserva, executa e registra o resultado do próximo job. Retorna False se a fila estava vazia."""
+    job = queue.claim(worker_id)
+    if job is None:
+        return False
+
+    fn = HANDLERS.get(job["tipo"])
+    erro = None
+    parar = threading.Event()
+    threading.Thread(
+        target=_manter_lease, args=(queue, job["id"], worker_id, parar), name=f"lease-{job['id']}", daemon=True
+    ).start()
+    try:
+        if fn is None:
+            raise RuntimeError(f"Tipo de job desconhecido: {job['tipo']}")
+        resultado = fn(job["payload"])
+    except Exception as e:
+        print(f"[{worker_id}] Job {job['id']} falhou (tentativa {job['tentativas']}): {e}")
+        erro = str(e)
+    finally:
+        parar.set()
+
+    # Erro ao gravar o resultado sobe para o run_worker: o job volta pelo lease vencido
+    if erro is None:
+        registrado = queue.complete(job["id"], resultado, worker_id)
+    else:
+        registrado = queue.fail(job["id"], erro, worker_id)
+    if not registrado:
+        print(f"[{worker_id}] Job {job['id']}: lease vencido, o job foi retomado por outro worker; resultado descartado.")
+        return True
+
+    # Job recorrente: terminado (com sucesso ou sem mais tentativas), agenda a próxima execução.
+    # Se ainda houver um do tipo (nova tentativa deste, ou agendado por outro processo), não duplica.
+    repetir = job["payload"].get("repetir_a_cada")
+    if repetir:
+        queue.enqueue_se_livre(job["tipo"], job["payload"], job["max_tentativas"], executar_em=time.time() + float(repetir))
+    return True
+
+
+def run_worker(queue: JobQueue, worker_id: str, poll_interval: float = 1.0):
+    """Loop principal. Erro da própria fila (ex.: 'database is locked') não derruba o worker."""
+    while True:
+        try:
+            if not processar_proximo(queue, worker_id):
+                time.sleep(poll_interval)
+        except Exception as e:
+            print(f"[{worker_id}] Erro na fila de jobs: {e}")
+            time.sleep(poll_interval)
+
+
+class WorkerSupervisor:
+    """
+    Processos worker do app. Verifica a cada `intervalo` segundos e sobe de novo
+    os que tiverem morrido, para a fila não parar até o próximo restart do app.
+    `agendar` (opcional) roda a cada verificação: repõe jobs recorrentes perdidos
+    com um worker que morreu no meio da execução.
+    """
+
+    def __init__(self, db_path: str, quantidade: int, intervalo: float = 10.0, agendar=None):
+        self.db_path = db_path
+        self.intervalo = intervalo
+        self.agendar = agendar
+        self.processos = [None] * max(1, int(quantidade))
+        self.reinicios = 0
+        self._parar = threading.Event()
+
+    def _novo_processo(self) -> subprocess.Popen:
+        return subprocess.Popen(
+            [sys.executable, "-m", "src.services.job_worker", "--db", self.db_path],
+            cwd=PROJECT_ROOT
+        )
+
+    def verificar(self):
+        for i, p in enumerate(self.processos):
+            if p is not None and p.poll() is None:
+                continue
+            if p is not None:
+                print(f"Worker {p.pid} encerrou (código {p.returncode}); reiniciando.")
+                self.reinicios += 1
+            self.processos[i] = self._novo_processo()
+
+    def iniciar(self):
+        self.verificar()
+        threading.Thread(target=self._vigiar, name="job-workers", daemon=True).start()
+        atexit.register(self.encerrar)
+
+    def _vigiar(self):
+        while not self._parar.wait(self.intervalo):
+            self.verificar()
+            if self.agendar is not None:
+                try:
+                    self.agendar()
+                except Exception as e:
+                    print(f"Erro ao agendar jobs recorrentes: {e}")
+
+    def encerrar(self):
+        self._parar.set()
+        for p in self.processos:
+            if p is not None:
+                p.terminate()
+
+
+@st.cache_resource
+def start_workers() -> WorkerSupervisor:
+    """
+    Sobe (uma vez por processo do Streamlit) os workers configurados em [job_queue],
+    sob um supervisor que reinicia os que morrerem, e agenda o job recorrente de
+    lembretes de assinatura ([lembretes]).
+    """
+    from src.services.reminders import agendar_lembretes
+
+    cfg = job_queue_settings()
+    queue = get_job_queue()
+    supervisor = WorkerSupervisor(cfg["db_path"], int(cfg["workers"]), agendar=lambda: agendar_lembretes(queue))
+    supervisor.iniciar()
+    agendar_lembretes(queue)
+    return supervisor
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Worker da fila de geração de contratos e envio de e-mails")
+    parser.add_argument("--db", default=job_queue_settings()["db_path"])
+    parser.add_argument("--poll", type=float, default=1.0)
+    args = parser.parse_args()
+
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    run_worker(JobQueue(args.db), worker_id, args.poll)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Lembretes automáticos de assinatura para contratos pendentes.
+
+Roda como job recorrente da fila (tipo "lembretes_assinatura", agendado por
+start_workers) ou uma vez pela linha de comando, ex. num cron:
+    python -m src.services.reminders
+"""
+from src.database.repo_lembretes import LembreteRepository
+from src.utils.email_sender import enviar_emails_contrato
+from src.utils.settings import get_section
+
+TIPO_JOB = "lembretes_assinatura"
+BASE_URL = "https://nexusmed-contratos.streamlit.app"
+
+
+def reminder_settings() -> dict:
+    """
+    [lembretes] no secrets.toml (opcional):
+        ativo = true
+        dias = [3, 7, 14]         # etapas: dias desde a criação do contrato
+        intervalo_minutos = 60    # entre execuções do agendador
+        lote = 50                 # lembretes reservados e enviados por vez
+        max_por_execucao = 500
+        max_tentativas = 3        # por lembrete, com falhas reenviadas nas execuções seguintes
+        enviando_timeout_minutos = 30  # reserva sem resultado há mais tempo que isso é retomada
+    O ritmo de envio segue [email] max_por_minuto.
+    """
+    cfg = {"ativo": True, "dias": [3, 7, 14], "intervalo_minutos": 60, "lote": 50,
+           "max_por_execucao": 500, "max_tentativas": 3, "enviando_timeout_minutos": 30}
+    cfg.update(get_section("lembretes"))
+    return cfg
+
+
+def executar_campanha(cfg: dict = None) -> dict:
+    """
+    Envia os lembretes devidos de cada etapa, em lotes de `lote` por sessão SMTP.
+    Retorna {"enviados", "falhas", "por_etapa": {dias: enviados}}.
+    """
+    cfg = cfg or reminder_settings()
+    dias = sorted({int(d) for d in cfg["dias"]})
+    resumo = {"enviados": 0, "falhas": 0, "por_etapa": {}}
+    restantes = int(cfg["max_por_execucao"])
+
+    for i, etapa in enumerate(dias):
+        proxima = dias[i + 1] if i + 1 < len(dias) else None
+        enviados_etapa = 0
+        while restantes > 0:
+            # Falhas voltam na execução seguinte (e não na mesma, em que acabaram de falhar)
+            reservados = LembreteRepository.reservar(
+                etapa, proxima, min(int(cfg["lote"]), restantes), int(cfg["max_tentativas"]),
+                reenviar_apos_minutos=max(1, int(cfg["intervalo_minutos"]) // 2),
+                enviando_timeout_minutos=int(cfg["enviando_timeout_minutos"])
+            )
+            if not reservados:
+                break
+            restantes -= len(reservados)
+
+            com_email = [r for r in reservados if r.get("email")]
+            for r in reservados:
+                if not r.get("email"):
+                    LembreteRepository.registrar_falha(etapa, r["contrato_id"], "aluno sem e-mail cadastrado")
+                    resumo["falhas"] += 1
+
+            resultados = enviar_emails_contrato([
+                {
+                    "email": r["email"],
+                    "nome_aluno": r["nome_aluno"],
+                    "link_assinatura": f"{BASE_URL}/Assinatura?token={r['token_acesso']}",
+                    "nome_curso": r["nome_curso"] or "",
+                    "assunto": f"Lembrete: seu contrato {r['nome_curso'] or ''} aguarda assinatura",
+                }
+                for r in com_email
+            ]) if com_email else []
+
+            enviados = [r["contrato_id"] for r, erro in zip(com_email, resultados) if erro is None]
+            LembreteRepository.registrar_envios(etapa, enviados)
+            for r, erro in zip(com_email, resultados):
+                if erro is not None:
+                    LembreteRepository.registrar_falha(etapa, r["contrato_id"], erro)
+                    resumo["falhas"] += 1
+            enviados_etapa += len(enviados)
+
+        resumo["por_etapa"][etapa] = enviados_etapa
+        resumo["enviados"] += enviados_etapa
+    return resumo
+
+
+def agendar_lembretes(queue) -> bool:
+    """Coloca o job recorrente na fila, se o agendador estiver ativo e ainda não houver um."""
+    cfg = reminder_settings()
+    if not cfg["ativo"]:
+        return False
+    # max_tentativas=1: em caso de erro o worker já agenda a próxima execução
+    return queue.enqueue_se_livre(
+        TIPO_JOB, {"repetir_a_cada": float(cfg["intervalo_minutos"]) * 60}, max_tentativas=1
+    ) is not None
+
+
+if __name__ == "__main__":
+    print(executar_campanha())
@@ -0,0 +1,62 @@
+"""
+Recuperação de assinaturas interrompidas.
+
+A página de assinatura reserva o contrato ('Pendente' -> 'Assinando') antes de
+carimbar e enviar a via assinada, e só o marca 'Assinado' depois do upload. Se o
+processo cair no meio, o contrato fica em 'Assinando'; aqui ele é resolvido:
+  - via assinada já no Storage -> conclui ('Assinado', caminho_arquivo apontando para ela)
+  - sem via assinada           -> desfaz (volta a 'Pendente' para o aluno assinar de novo)
+
+Roda sob demanda na própria página (contrato parado aberto pelo aluno) ou para
+todos os contratos parados, ex. num cron:
+    python -m src.services.signature_recovery
+"""
+from datetime import datetime, timedelta, timezone
+from src.database.repo_contratos import ContratoRepository
+from src.utils.storage import StorageService
+
+# Uma assinatura normal leva segundos; depois disso, 'Assinando' é processo que caiu
+MINUTOS_INTERROMPIDA = 10
+
+
+def interrompida(contrato: dict, minutos: float = MINUTOS_INTERROMPIDA) -> bool:
+    """O contrato está em 'Assinando' há mais de `minutos`?"""
+    iniciada = contrato.get("assinatura_iniciada_em")
+    if contrato.get("status") != "Assinando" or not iniciada:
+        return False
+    inicio = datetime.fromisoformat(iniciada.replace("Z", "+00:00"))
+    if inicio.tzinfo is None:
+        inicio = inicio.replace(tzinfo=timezone.utc)
+    return datetime.now(timezone.utc) - inicio > timedelta(minutes=minutos)
+
+
+def reconciliar(contrato_id: str, token: str, hash_aceite: str, nome_aluno: str) -> str:
+    """
+    Conclui ou desfaz uma assinatura parada em 'Assinando'.
+    Retorna "concluida", "desfeita" ou "" (outro processo resolveu antes, ou erro).
+    """
+    caminho = StorageService.caminho_via_assinada(nome_aluno, token)
+    try:
+        existe = StorageService.existe(caminho)
+    except Exception as e:
+        # Sem saber se a via existe, não desfaz: a próxima tentativa decide
+        print(f"Erro ao consultar via assinada de {contrato_id}: {e}")
+        return ""
+    if existe:
+        ok = ContratoRepository.concluir_assinatura(contrato_id, hash_aceite, StorageService.url_publica(caminho))
+        return "concluida" if ok else ""
+    return "desfeita" if ContratoRepository.desfazer_assinatura(contrato_id, hash_aceite) else ""
+
+
+def reconciliar_interrompidas(minutos: float = MINUTOS_INTERROMPIDA, limite: int = 100) -> dict:
+    """Resolve até `limite` contratos parados em 'Assinando' há mais de `minutos`."""
+    resumo = {"concluida": 0, "desfeita": 0, "ignorada": 0}
+    for c in ContratoRepository.listar_assinaturas_interrompidas(minutos, limite):
+        nome_aluno = (c.get("alunos") or {}).get("nome_completo")
+        resultado = reconciliar(c["id"], c["token_acesso"], c["hash_aceite"], nome_aluno)
+        resumo[resultado or "ignorada"] += 1
+    return resumo
+
+
+if __name__ == "__main__":
+    print(reconciliar_interrompidas())
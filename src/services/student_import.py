@@ -0,0 +1,292 @@
+import io
+import csv
+import json
+import time
+import sqlite3
+import hashlib
+from contextlib import contextmanager
+from datetime import date, datetime
+from src.database.repo_alunos import AlunoRepository
+from src.services.job_queue import job_queue_settings
+from src.utils.formatters import remover_acentos, format_phone
+from src.utils.settings import get_section
+
+try:
+    import openpyxl
+    HAS_OPENPYXL = True
+except ImportError:
+    HAS_OPENPYXL = False
+
+# Colunas da tabela alunos aceitas na importação
+COLUNAS = [
+    "nome_completo", "cpf", "email", "telefone", "data_nascimento", "nacionalidade", "estado_civil",
+    "logradouro", "numero", "complemento", "bairro", "cidade", "uf", "crm", "area_formacao",
+]
+OBRIGATORIAS = ["nome_completo", "cpf", "email"]
+
+# Cabeçalhos alternativos comuns em planilhas (já normalizados por _normalizar_cabecalho)
+_APELIDOS = {
+    "nome": "nome_completo",
+    "celular": "telefone",
+    "fone": "telefone",
+    "e-mail": "email",
+    "nascimento": "data_nascimento",
+    "data_de_nascimento": "data_nascimento",
+    "estado": "uf",
+    "endereco": "logradouro",
+    "formacao": "area_formacao",
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS importacoes_alunos (
+    arquivo_hash TEXT PRIMARY KEY,
+    nome_arquivo TEXT NOT NULL,
+    proxima_linha INTEGER NOT NULL DEFAULT 0,
+    importados INTEGER NOT NULL DEFAULT 0,
+    erros TEXT NOT NULL DEFAULT '[]',
+    concluido INTEGER NOT NULL DEFAULT 0,
+    atualizado_em REAL NOT NULL
+);
+"""
+
+
+def import_settings() -> dict:
+    """
+    [importacao] no secrets.toml (opcional):
+        tamanho_lote = 500   # linhas por upsert
+    """
+    cfg = {"tamanho_lote": 500}
+    cfg.update(get_section("importacao"))
+    return cfg
+
+
+def cpf_valido(cpf: str) -> bool:
+    """Confere os dois dígitos verificadores (cpf só com dígitos)."""
+    if len(cpf) != 11 or cpf == cpf[0] * 11:
+        return False
+    for tamanho in (9, 10):
+        soma = sum(int(d) * peso for d, peso in zip(cpf[:tamanho], range(tamanho + 1, 1, -1)))
+        if (soma * 10 % 11) % 10 != int(cpf[tamanho]):
+            return False
+    return True
+
+
+def _normalizar_cabecalho(nome) -> str:
+    chave = remover_acentos(str(nome or "")).strip().lower().replace(" ", "_")
+    return _APELIDOS.get(chave, chave)
+
+
+def _texto(valor) -> str:
+    if valor is None:
+        return ""
+    if isinstance(valor, float) and valor.is_integer():
+        valor = int(valor)  # CPF/telefone lidos como número no XLSX
+    return str(valor).strip()
+
+
+def _data_iso(valor):
+    if isinstance(valor, datetime):
+        return valor.date().isoformat()
+    if isinstance(valor, date):
+        return valor.isoformat()
+    texto = _texto(valor)
+    if not texto:
+        return None
+    for formato in ("%d/%m/%Y", "%Y-%m-%d", "%d-%m-%Y"):
+        try:
+            return datetime.strptime(texto[:10], formato).date().isoformat()
+        except ValueError:
+            continue
+    raise ValueError(f"data de nascimento inválida ({texto})")
+
+
+def linhas_csv(arquivo):
+    """Gera os registros de um CSV (',' ou ';', UTF-8 com ou sem BOM) sem carregar o arquivo como tabela."""
+    texto = io.TextIOWrapper(arquivo, encoding="utf-8-sig", newline="")
+    amostra = texto.read(4096)
+    texto.seek(0)
+    dialeto = csv.Sniffer().sniff(amostra, delimiters=",;") if amostra.strip() else csv.excel
+    leitor = csv.reader(texto, dialect=dialeto)
+    cabecalho = [_normalizar_cabecalho(c) for c in next(leitor, [])]
+    for linha in leitor:
+        if any((c or "").strip() for c in linha):
+            yield dict(zip(cabecalho, linha))
+    texto.detach()
+
+
+def linhas_xlsx(arquivo):
+    """Gera os registros da primeira planilha de um XLSX em modo read_only (linha a linha)."""
+    if not HAS_OPENPYXL:
+        raise RuntimeError("Importação de XLSX indisponível: pacote 'openpyxl' não instalado.")
+    planilha = openpyxl.load_workbook(arquivo, read_only=True, data_only=True)
+    try:
+        linhas = planilha.worksheets[0].iter_rows(values_only=True)
+        cabecalho = [_normalizar_cabecalho(c) for c in next(linhas, ())]
+        for linha in linhas:
+            if any(_texto(c) for c in linha):
+                yield dict(zip(cabecalho, linha))
+    finally:
+        planilha.close()
+
+
+def normalizar(registro: dict) -> dict:
+    """
+    Converte um registro do arquivo no formato da tabela alunos.
+    Lança ValueError com o motivo se a linha for inválida.
+    """
+    aluno = {}
+    for coluna in COLUNAS:
+        if coluna not in registro:
+            continue
+        valor = _data_iso(registro[coluna]) if coluna == "data_nascimento" else _texto(registro[coluna])
+        # Célula vazia fica fora do registro: no upsert, não sobrescreve o valor já cadastrado
+        if valor:
+            aluno[coluna] = valor
+
+    faltando = [c for c in OBRIGATORIAS if not aluno.get(c)]
+    if faltando:
+        raise ValueError(f"campo obrigatório vazio: {', '.join(faltando)}")
+
+    aluno["cpf"] = "".join(filter(str.isdigit, aluno["cpf"])).zfill(11)
+    if not cpf_valido(aluno["cpf"]):
+        raise ValueError("CPF inválido")
+    if "@" not in aluno["email"]:
+        raise ValueError("e-mail inválido")
+    if aluno.get("telefone"):
+        aluno["telefone"] = format_phone(aluno["telefone"])
+    if aluno.get("uf"):
+        aluno["uf"] = aluno["uf"].upper()
+    return aluno
+
+
+class StudentImporter:
+    """
+    Importação em massa de alunos a partir de CSV/XLSX.
+    - Leitura em streaming (linha a linha), normalização de CPF/telefone e validação
+    - Upsert em lotes de `tamanho_lote` linhas por requisição, com conflito em 'cpf':
+      aluno já cadastrado é atualizado com as colunas preenchidas na linha (célula vazia
+      mantém o valor atual)
+    - Erros por linha (número da linha no arquivo, CPF e motivo)
+    - Retomável: o progresso fica em SQLite, por hash do arquivo; reenviar o mesmo
+      arquivo continua do primeiro lote não gravado
+    """
+
+    def __init__(self, db_path: str = None, tamanho_lote: int = None):
+        self.db_path = db_path or job_queue_settings()["db_path"]
+        self.tamanho_lote = max(1, int(tamanho_lote or import_settings()["tamanho_lote"]))
+        with self._conn() as conn:
+            conn.executescript(_SCHEMA)
+
+    @contextmanager
+    def _conn(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def hash_arquivo(conteudo: bytes) -> str:
+        return hashlib.sha256(conteudo).hexdigest()
+
+    def progresso(self, arquivo_hash: str):
+        """Checkpoint de uma importação anterior do mesmo arquivo (ou None)."""
+        with self._conn() as conn:
+            row = conn.execute("SELECT * FROM importacoes_alunos WHERE arquivo_hash = ?", (arquivo_hash,)).fetchone()
+        if row is None:
+            return None
+        progresso = dict(row)
+        progresso["erros"] = json.loads(progresso["erros"])
+        progresso["concluido"] = bool(progresso["concluido"])
+        return progresso
+
+    def descartar(self, arquivo_hash: str):
+        """Esquece o checkpoint (a próxima importação do arquivo começa do zero)."""
+        with self._conn() as conn:
+            conn.execute("DELETE FROM importacoes_alunos WHERE arquivo_hash = ?", (arquivo_hash,))
+
+    def _salvar(self, arquivo_hash, nome_arquivo, proxima_linha, importados, erros, concluido):
+        with self._conn() as conn:
+            conn.execute(
+                "INSERT INTO importacoes_alunos (arquivo_hash, nome_arquivo, proxima_linha, importados, erros, concluido, atualizado_em) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(arquivo_hash) DO UPDATE SET proxima_linha = excluded.proxima_linha, "
+                "importados = excluded.importados, erros = excluded.erros, concluido = excluded.concluido, "
+                "atualizado_em = excluded.atualizado_em",
+                (arquivo_hash, nome_arquivo, proxima_linha, importados, json.dumps(erros), int(concluido), time.time())
+            )
+
+    def importar(self, conteudo: bytes, nome_arquivo: str, on_progress=None) -> dict:
+        """
+        Importa o arquivo (conteúdo em bytes; o tipo vem da extensão do nome).
+        on_progress(linhas_lidas, importados) é chamado após cada lote gravado.
+        Retorna {"importados", "erros": [{"linha", "cpf", "motivo"}], "requisicoes",
+                 "concluido", "retomado_da_linha", "erro_lote"}.
+        """
+        arquivo_hash = self.hash_arquivo(conteudo)
+        anterior = self.progresso(arquivo_hash) or {"proxima_linha": 0, "importados": 0, "erros": [], "concluido": False}
+        if anterior["concluido"]:
+            return {**anterior, "requisicoes": 0, "retomado_da_linha": None, "erro_lote": None}
+
+        inicio = anterior["proxima_linha"]
+        importados, erros = anterior["importados"], anterior["erros"]
+        proxima_linha, requisicoes = inicio, 0
+
+        if nome_arquivo.lower().endswith(".xlsx"):
+            registros = linhas_xlsx(io.BytesIO(conteudo))
+        else:
+            registros = linhas_csv(io.BytesIO(conteudo))
+
+        for fim, lote in self._lotes(registros, inicio, erros):
+            if lote:
+                resposta = AlunoRepository.upsert_em_lote(lote)
+                requisicoes += len({frozenset(aluno) for aluno in lote})  # uma por conjunto de colunas
+                if isinstance(resposta, dict) and "error" in resposta:
+                    # O checkpoint fica no início do lote recusado; os erros de linha dele
+                    # são descartados para não se repetirem na retomada
+                    erros = [e for e in erros if e["linha"] < proxima_linha + 2]
+                    self._salvar(arquivo_hash, nome_arquivo, proxima_linha, importados, erros, False)
+                    return {
+                        "importados": importados, "erros": erros, "requisicoes": requisicoes, "concluido": False,
+                        "retomado_da_linha": inicio + 2 if inicio else None, "erro_lote": resposta["error"],
+                    }
+                importados += len(lote)
+            proxima_linha = fim
+            self._salvar(arquivo_hash, nome_arquivo, proxima_linha, importados, erros, False)
+            if on_progress:
+                on_progress(proxima_linha, importados)
+
+        self._salvar(arquivo_hash, nome_arquivo, proxima_linha, importados, erros, True)
+        return {
+            "importados": importados, "erros": erros, "requisicoes": requisicoes, "concluido": True,
+            "retomado_da_linha": inicio + 2 if inicio else None, "erro_lote": None,
+        }
+
+    def _lotes(self, registros, inicio: int, erros: list):
+        """
+        Valida os registros e gera (registros_lidos, lote) a cada `tamanho_lote` alunos válidos,
+        e um último (total, resto). Linhas inválidas vão para `erros`; as anteriores a `inicio`
+        (já gravadas) só alimentam a detecção de CPF repetido.
+        """
+        lote, vistos, lidos = [], {}, 0
+        for indice, registro in enumerate(registros):
+            lidos = indice + 1
+            numero_linha = indice + 2  # a linha 1 é o cabeçalho
+            try:
+                aluno = normalizar(registro)
+                if aluno["cpf"] in vistos:
+                    # Duas linhas com o mesmo CPF no mesmo upsert fazem o Postgres recusar o lote
+                    raise ValueError(f"CPF repetido no arquivo (linha {vistos[aluno['cpf']]})")
+                vistos[aluno["cpf"]] = numero_linha
+            except ValueError as e:
+                if indice >= inicio:
+                    erros.append({"linha": numero_linha, "cpf": _texto(registro.get("cpf")), "motivo": str(e)})
+                continue
+            if indice < inicio:
+                continue
+            lote.append(aluno)
+            if len(lote) >= self.tamanho_lote:
+                yield lidos, lote
+                lote = []
+        yield max(lidos, inicio), lote
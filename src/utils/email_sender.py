@@ -1,72 +1,241 @@
+import time
 import smtplib
+import threading
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 import streamlit as st
 
 # Função obter_url_app removida pois o link já virá pronto
 
-def enviar_email_contrato(email_destinatario: str, nome_aluno: str, link_assinatura: str, nome_curso: str):
+
+def _conexao_caiu(erro: Exception) -> bool:
+    """Erro de rede/sessão (vale reconectar e reenviar), e não recusa do servidor (destinatário, conteúdo)."""
+    if isinstance(erro, (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError)):
+        return True
+    return isinstance(erro, OSError) and not isinstance(erro, smtplib.SMTPException)
+
+
+class _LimitadorTaxa:
+    """Espaça os envios para no máximo `por_minuto` mensagens por minuto (0 = sem limite)."""
+
+    def __init__(self, por_minuto: float):
+        self.intervalo = 60.0 / por_minuto if por_minuto else 0.0
+        self._proximo = 0.0
+
+    def aguardar(self):
+        if not self.intervalo:
+            return
+        agora = time.monotonic()
+        if self._proximo > agora:
+            time.sleep(self._proximo - agora)
+        self._proximo = max(agora, self._proximo) + self.intervalo
+
+
+class SMTPTransport:
     """
-    Envia o link de assinatura para o aluno via SMTP.
-    Args:
-        link_assinatura: URL completa já montada (ex: https://.../Assinatura?token=xyz)
+    Sessão SMTP reaproveitada entre envios (uma conexão, um STARTTLS e um login).
+    - Antes de usar uma sessão ociosa há mais de `ocioso_max` segundos, confere com NOOP
+    - Reconecta e reenvia uma vez se a conexão tiver caído
+    - Limita a taxa de envio (max_por_minuto) para não esbarrar no limite do provedor
+    Thread-safe: os envios são serializados na mesma sessão.
     """
-    try:
-        # 1. Configurações SMTP do secrets.toml
-        smtp_host = st.secrets["email"]["smtp_host"]
-        smtp_port = int(st.secrets["email"]["smtp_port"]) 
-        smtp_user = st.secrets["email"]["smtp_user"]
-        smtp_pass = st.secrets["email"]["smtp_password"]
-
-        # 2. Cria a Mensagem Multipart
-        msg = MIMEMultipart('alternative')
-        msg['Subject'] = f"Assinatura Pendente: Contrato {nome_curso}"
-        msg['From'] = f"NexusMed Secretaria <{smtp_user}>"
-        msg['To'] = email_destinatario
-
-        # 3. Template HTML estilizado (Usa o link_assinatura direto)
-        html_body = f"""
-        <html>
-        <body style="font-family: Arial, sans-serif; color: #333; line-height: 1.6;">
-            <div style="max-width: 600px; margin: 0 auto; border: 1px solid #e0e0e0; border-radius: 8px; overflow: hidden;">
-                <div style="background-color: #0f172a; padding: 20px; text-align: center; color: white;">
-                    <h2 style="margin: 0;">NexusMed Educação</h2>
-                </div>
-                <div style="padding: 30px; background-color: #ffffff;">
-                    <p>Olá, <strong>{nome_aluno}</strong>.</p>
-                    <p>Seu contrato para o curso de <strong>{nome_curso}</strong> já está disponível para assinatura eletrônica.</p>
-                    
-                    <div style="background-color: #f8fafc; padding: 20px; border-radius: 8px; margin: 25px 0; text-align: center; border: 1px solid #e2e8f0;">
-                        <p style="margin-bottom: 15px; font-size: 14px; color: #64748b;">Clique abaixo para revisar os dados e assinar:</p>
-                        
-                        <a href="{link_assinatura}" style="background-color: #2563eb; color: white; padding: 14px 28px; text-decoration: none; border-radius: 6px; font-weight: bold; display: inline-block;">
-                            ✍️ REVISAR E ASSINAR AGORA
-                        </a>
-                    </div>
+
+    def __init__(self, host: str, port: int, user: str = "", password: str = "", starttls: bool = True,
+                 timeout: float = 30.0, max_por_minuto: float = 0, ocioso_max: float = 30.0):
+        self.host = host
+        self.port = int(port)
+        self.user = user
+        self.password = password
+        self.starttls = starttls
+        self.timeout = timeout
+        self.ocioso_max = ocioso_max
+        self._limitador = _LimitadorTaxa(float(max_por_minuto or 0))
+        self._lock = threading.Lock()
+        self._server = None
+        self._ultimo_uso = 0.0
+        self.conexoes = 0
+        self.enviados = 0
+
+    def _conectar(self):
+        self._fechar()
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        # server.set_debuglevel(1) # Descomente para debug se necessário
+        try:
+            if self.starttls:
+                server.starttls()
+            if self.password:
+                server.login(self.user, self.password)
+        except Exception:
+            server.close()
+            raise
+        self._server = server
+        self.conexoes += 1
+
+    def _fechar(self):
+        if self._server is not None:
+            try:
+                self._server.quit()
+            except Exception:
+                pass
+            self._server = None
+
+    def _descartar(self):
+        """Abandona a sessão sem QUIT (conexão já caiu)."""
+        if self._server is not None:
+            try:
+                self._server.close()
+            except Exception:
+                pass
+            self._server = None
+
+    def _sessao(self):
+        """Sessão pronta para enviar: reaproveita a atual se ela responder ao NOOP."""
+        if self._server is not None and time.monotonic() - self._ultimo_uso > self.ocioso_max:
+            try:
+                if self._server.noop()[0] != 250:
+                    self._fechar()
+            except Exception:
+                self._descartar()
+        if self._server is None:
+            self._conectar()
+        return self._server
+
+    def _enviar(self, msg):
+        self._limitador.aguardar()
+        try:
+            self._sessao().send_message(msg)
+        except Exception as e:
+            if not _conexao_caiu(e):
+                raise
+            # Sessão derrubada pelo servidor (timeout, limite de mensagens por conexão): mais uma tentativa
+            self._descartar()
+            self._sessao().send_message(msg)
+        self._ultimo_uso = time.monotonic()
+        self.enviados += 1
+
+    def send(self, msg):
+        """Envia uma mensagem. Exceções do SMTP sobem para quem chamou."""
+        with self._lock:
+            self._enviar(msg)
+
+    def send_batch(self, mensagens: list) -> list:
+        """
+        Envia várias mensagens pela mesma sessão.
+        Retorna, na ordem, None para cada mensagem enviada ou o texto do erro.
+        """
+        resultados = []
+        with self._lock:
+            for msg in mensagens:
+                try:
+                    self._enviar(msg)
+                    resultados.append(None)
+                except Exception as e:
+                    resultados.append(str(e))
+        return resultados
+
+    def close(self):
+        with self._lock:
+            self._fechar()
+
+
+@st.cache_resource
+def get_smtp_transport() -> SMTPTransport:
+    """
+    Transporte SMTP do processo, configurado pela seção [email] do secrets.toml:
+        smtp_host, smtp_port, smtp_user, smtp_password
+        starttls = true        # opcional
+        max_por_minuto = 0     # opcional, 0 = sem limite
+        timeout = 30           # opcional, segundos
+    """
+    cfg = st.secrets["email"]
+    return SMTPTransport(
+        cfg["smtp_host"], int(cfg["smtp_port"]), cfg["smtp_user"], cfg["smtp_password"],
+        starttls=bool(cfg.get("starttls", True)),
+        timeout=float(cfg.get("timeout", 30)),
+        max_por_minuto=float(cfg.get("max_por_minuto", 0)),
+    )
+
+
+def montar_email_contrato(email_destinatario: str, nome_aluno: str, link_assinatura: str, nome_curso: str,
+                          remetente: str, assunto: str = None) -> MIMEMultipart:
+    """Mensagem com o link de assinatura (HTML)."""
+    # 2. Cria a Mensagem Multipart
+    msg = MIMEMultipart('alternative')
+    msg['Subject'] = assunto or f"Assinatura Pendente: Contrato {nome_curso}"
+    msg['From'] = f"NexusMed Secretaria <{remetente}>"
+    msg['To'] = email_destinatario
+
+    # 3. Template HTML estilizado (Usa o link_assinatura direto)
+    html_body = f"""
+    <html>
+    <body style="font-family: Arial, sans-serif; color: #333; line-height: 1.6;">
+        <div style="max-width: 600px; margin: 0 auto; border: 1px solid #e0e0e0; border-radius: 8px; overflow: hidden;">
+            <div style="background-color: #0f172a; padding: 20px; text-align: center; color: white;">
+                <h2 style="margin: 0;">NexusMed Educação</h2>
+            </div>
+            <div style="padding: 30px; background-color: #ffffff;">
+                <p>Olá, <strong>{nome_aluno}</strong>.</p>
+                <p>Seu contrato para o curso de <strong>{nome_curso}</strong> já está disponível para assinatura eletrônica.</p>
+                
+                <div style="background-color: #f8fafc; padding: 20px; border-radius: 8px; margin: 25px 0; text-align: center; border: 1px solid #e2e8f0;">
+                    <p style="margin-bottom: 15px; font-size: 14px; color: #64748b;">Clique abaixo para revisar os dados e assinar:</p>
                     
-                    <p style="font-size: 11px; color: #94a3b8;">Caso o botão não funcione, utilize o link: <br> 
-                    <a href="{link_assinatura}">{link_assinatura}</a></p>
-                </div>
-                <div style="background-color: #f1f5f9; padding: 15px; text-align: center; font-size: 12px; color: #64748b;">
-                    <p>Este é um e-mail automático. Por favor, não responda.</p>
+                    <a href="{link_assinatura}" style="background-color: #2563eb; color: white; padding: 14px 28px; text-decoration: none; border-radius: 6px; font-weight: bold; display: inline-block;">
+                        ✍️ REVISAR E ASSINAR AGORA
+                    </a>
                 </div>
+                
+                <p style="font-size: 11px; color: #94a3b8;">Caso o botão não funcione, utilize o link: <br> 
+                <a href="{link_assinatura}">{link_assinatura}</a></p>
             </div>
-        </body>
-        </html>
-        """
+            <div style="background-color: #f1f5f9; padding: 15px; text-align: center; font-size: 12px; color: #64748b;">
+                <p>Este é um e-mail automático. Por favor, não responda.</p>
+            </div>
+        </div>
+    </body>
+    </html>
+    """
 
-        part = MIMEText(html_body, 'html', 'utf-8')
-        msg.attach(part)
+    part = MIMEText(html_body, 'html', 'utf-8')
+    msg.attach(part)
+    return msg
 
-        # 4. Conexão e Envio
-        with smtplib.SMTP(smtp_host, smtp_port) as server:
-            # server.set_debuglevel(1) # Descomente para debug se necessário
-            server.starttls() 
-            server.login(smtp_user, smtp_pass)
-            server.send_message(msg)
+
+def enviar_email_contrato(email_destinatario: str, nome_aluno: str, link_assinatura: str, nome_curso: str):
+    """
+    Envia o link de assinatura para o aluno via SMTP (sessão reaproveitada do get_smtp_transport).
+    Args:
+        link_assinatura: URL completa já montada (ex: https://.../Assinatura?token=xyz)
+    """
+    try:
+        # 1. Transporte SMTP configurado pelo secrets.toml
+        transporte = get_smtp_transport()
+        msg = montar_email_contrato(email_destinatario, nome_aluno, link_assinatura, nome_curso, transporte.user)
+
+        # 4. Envio
+        transporte.send(msg)
 
         return True # Retorna booleano simples para o if sucesso: do app
 
     except Exception as e:
         print(f"Erro SMTP: {e}")
         return False
+
+
+def enviar_emails_contrato(envios: list) -> list:
+    """
+    Envia vários links de assinatura numa única sessão SMTP.
+    envios: dicts com email, nome_aluno, link_assinatura, nome_curso e, opcionalmente, assunto.
+    Retorna, na ordem, None para cada e-mail enviado ou o texto do erro.
+    """
+    try:
+        transporte = get_smtp_transport()
+    except Exception as e:
+        print(f"Erro SMTP: {e}")
+        return [str(e)] * len(envios)
+    mensagens = [
+        montar_email_contrato(e["email"], e["nome_aluno"], e["link_assinatura"], e["nome_curso"], transporte.user,
+                              e.get("assunto"))
+        for e in envios
+    ]
+    return transporte.send_batch(mensagens)
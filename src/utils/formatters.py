@@ -1,7 +1,14 @@
 import re
+import unicodedata
 from datetime import datetime
 from decimal import Decimal
 
+def remover_acentos(texto: str) -> str:
+    """Decompõe em NFKD e descarta as marcas combinantes: 'João' -> 'Joao'"""
+    if not texto: return ""
+    nfkd = unicodedata.normalize('NFKD', texto)
+    return "".join([c for c in nfkd if not unicodedata.combining(c)])
+
 def format_cpf(cpf: str) -> str:
     """Aplica a máscara de CPF: 000.000.000-00"""
     if not cpf: return ""
@@ -51,3 +58,16 @@ def format_phone(phone: str) -> str:
     elif len(numbers) == 10:
         return f"({numbers[:2]}) {numbers[2:6]}-{numbers[6:]}"
     return numbers
+
+def format_envio_email(contrato: dict) -> str:
+    """Situação do e-mail do link de assinatura gravada no contrato (colunas email_*)"""
+    status = (contrato or {}).get("email_status")
+    if status == "enviado":
+        enviado_em = contrato.get("email_enviado_em")
+        quando = datetime.fromisoformat(enviado_em.replace("Z", "+00:00")).astimezone().strftime("%d/%m/%Y %H:%M") if enviado_em else ""
+        return f"✅ Enviado {quando}".strip()
+    if status == "falhou":
+        return f"❌ Falhou ({contrato.get('email_tentativas') or 0} tentativa(s)): {contrato.get('email_erro') or ''}"
+    if status == "na_fila":
+        return "⏳ Na fila"
+    return ""
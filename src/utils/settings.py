@@ -0,0 +1,12 @@
+import streamlit as st
+
+
+def get_section(name: str) -> dict:
+    """
+    Lê uma seção opcional do secrets.toml.
+    Retorna dict vazio se a seção (ou o próprio secrets.toml) não existir.
+    """
+    try:
+        return dict(st.secrets.get(name, {}))
+    except Exception:
+        return {}
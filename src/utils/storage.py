@@ -1,26 +1,98 @@
-import io
-import unicodedata
+import os
 import re
+import hashlib
+import tempfile
+from urllib.parse import urlparse, unquote
+import streamlit as st
 from src.database.connection import supabase
+from src.document_engine.pdf_cache import PDFCache
+from src.utils.formatters import remover_acentos
+from src.utils.settings import get_section
+
+BUCKET = "contratos"
+_CHUNK = 64 * 1024
+
+
+@st.cache_resource
+def get_storage_cache() -> PDFCache:
+    """
+    Cópias locais de objetos do Storage (ex.: minuta original na assinatura),
+    por caminho + ETag. Configuração opcional no secrets.toml:
+        [storage_cache]
+        directory = "/tmp/nexusmed_storage_cache"
+        max_mb = 128
+    """
+    cfg = get_section("storage_cache")
+    directory = cfg.get("directory", os.path.join(tempfile.gettempdir(), "nexusmed_storage_cache"))
+    return PDFCache(directory, int(cfg.get("max_mb", 128)) * 1024 * 1024)
+
+
+def _chave_cache(bucket: str, caminho: str, etag: str = None) -> str:
+    """'<sha256 do caminho>_<ETag em hex>': o ETag é recuperável da chave para o If-None-Match."""
+    prefixo = hashlib.sha256(f"{bucket}/{caminho}".encode()).hexdigest() + "_"
+    return prefixo if etag is None else prefixo + etag.encode().hex()
+
+def _gravar_objeto(bucket_api, bucket: str, caminho: str, etag_local: str, destino):
+    """
+    Grava o objeto em `destino` em blocos e retorna (etag, nao_modificado).
+    O storage3 só baixa o corpo inteiro em memória (download()); o streaming usa o
+    httpx.Client e os cabeçalhos do bucket, atributos internos dele (_client, _headers,
+    _base_url): este é o único lugar que depende deles. Se uma versão nova os mudar,
+    cai no download() público (sem streaming nem If-None-Match).
+    """
+    try:
+        client, cabecalhos, base_url = bucket_api._client, bucket_api._headers, bucket_api._base_url
+        url = str(base_url.joinpath("object", bucket, *caminho.split("/")))
+    except AttributeError:
+        destino.write(bucket_api.download(caminho))
+        return None, False
+
+    headers = dict(cabecalhos)
+    if etag_local:
+        headers["If-None-Match"] = etag_local
+    with client.stream("GET", url, headers=headers) as response:
+        if response.status_code == 304:
+            return etag_local, True
+        response.raise_for_status()
+        for chunk in response.iter_bytes(_CHUNK):
+            destino.write(chunk)
+        return response.headers.get("etag"), False
+
+
+def _arquivo_temporario(caminho: str):
+    """Abre o arquivo e o remove do diretório: o descritor aberto continua válido até ser fechado."""
+    arquivo = open(caminho, "rb")
+    try:
+        os.remove(caminho)
+    except OSError:
+        pass
+    return arquivo
+
 
 class StorageService:
     @staticmethod
     def sanitizar_nome(texto: str) -> str:
         if not texto: return "arquivo"
-        nfkd = unicodedata.normalize('NFKD', texto)
-        sem_acento = "".join([c for c in nfkd if not unicodedata.combining(c)])
+        sem_acento = remover_acentos(texto)
         limpo = re.sub(r'[^a-zA-Z0-9]', '_', sem_acento)
         return re.sub(r'_{2,}', '_', limpo).strip('_')
 
     @staticmethod
-    def upload_minuta(pdf_buffer, nome_aluno, nome_curso):
+    def upload_minuta(pdf_buffer, nome_aluno, nome_curso, token: str = None):
+        """
+        Envia a minuta com nome único por contrato: o sufixo vem do token de acesso
+        (hash, para o token não aparecer na URL pública). Sem ele, homônimos gerados
+        no mesmo segundo (lote em paralelo) iriam para o mesmo objeto.
+        """
         try:
             aluno_safe = StorageService.sanitizar_nome(nome_aluno)
             curso_safe = StorageService.sanitizar_nome(nome_curso)
             # Adicionamos um timestamp ou ID único no nome para EVITAR CACHE
             import time
+            import uuid
             timestamp = int(time.time())
-            filename = f"Minuta_{aluno_safe}_{curso_safe}_{timestamp}.pdf"
+            sufixo = hashlib.sha256(token.encode()).hexdigest()[:16] if token else uuid.uuid4().hex[:16]
+            filename = f"Minuta_{aluno_safe}_{curso_safe}_{timestamp}_{sufixo}.pdf"
             
             # Resetamos o buffer para garantir que lemos do início
             pdf_buffer.seek(0)
@@ -43,3 +115,90 @@ class StorageService:
 
         except Exception as e:
             return None, str(e)
+
+    @staticmethod
+    def caminho_via_assinada(nome_aluno: str, token: str) -> str:
+        """Caminho da via assinada no bucket: determinístico por contrato (o sufixo é o hash do token)."""
+        sufixo = hashlib.sha256(token.encode()).hexdigest()[:16]
+        return f"minutas/Contrato_{StorageService.sanitizar_nome(nome_aluno)}_{sufixo}_ASSINADO.pdf"
+
+    @staticmethod
+    def url_publica(caminho: str, bucket: str = BUCKET) -> str:
+        url_res = supabase.storage.from_(bucket).get_public_url(caminho)
+        return url_res if isinstance(url_res, str) else url_res.get('publicURL', url_res)
+
+    @staticmethod
+    def existe(caminho: str, bucket: str = BUCKET) -> bool:
+        """O objeto está no bucket? (exceções sobem: 'não sei' não é 'não existe')"""
+        return bool(supabase.storage.from_(bucket).exists(caminho))
+
+    @staticmethod
+    def remover(caminhos: list, bucket: str = BUCKET):
+        """Remove objetos do bucket numa requisição. Retorna None ou o texto do erro."""
+        if not caminhos:
+            return None
+        try:
+            supabase.storage.from_(bucket).remove(list(caminhos))
+            return None
+        except Exception as e:
+            return str(e)
+
+    @staticmethod
+    def caminho_do_objeto(url: str, bucket: str = BUCKET):
+        """Caminho do objeto no bucket a partir da URL pública (None se a URL não for do Storage)."""
+        marcador = f"/object/public/{bucket}/"
+        path = urlparse(url or "").path
+        i = path.find(marcador)
+        return unquote(path[i + len(marcador):]) if i >= 0 else None
+
+    @staticmethod
+    def baixar(caminho: str, bucket: str = BUCKET):
+        """
+        Baixa um objeto pela API do Storage, com o cliente (pool e timeouts de download)
+        já configurado. O corpo vem em streaming para um arquivo local e fica no
+        get_storage_cache(); com uma cópia local, a requisição leva If-None-Match e um
+        304 dispensa o download. Nada é lido para a memória aqui.
+        Retorna (arquivo binário aberto, posicionado no início, None) ou (None, erro);
+        quem chama fecha o arquivo.
+        """
+        try:
+            cache = get_storage_cache()
+            anteriores = cache.keys_with_prefix(_chave_cache(bucket, caminho))
+            etag_local = bytes.fromhex(anteriores[0].rsplit("_", 1)[1]).decode() if anteriores else None
+
+            bucket_api = supabase.storage.from_(bucket)
+            fd, tmp_path = tempfile.mkstemp(dir=cache.directory, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    etag, nao_modificado = _gravar_objeto(bucket_api, bucket, caminho, etag_local, f)
+            except Exception:
+                os.remove(tmp_path)
+                raise
+
+            if nao_modificado:
+                os.remove(tmp_path)
+                arquivo = cache.open(anteriores[0])
+                if arquivo is not None:
+                    return arquivo, None
+                # Cópia local removida entre a consulta e o 304: baixa de novo, sem If-None-Match
+                cache.discard(anteriores[0])
+                return StorageService.baixar(caminho, bucket)
+
+            chave = _chave_cache(bucket, caminho, etag) if etag else None
+            if chave and cache.put_file(chave, tmp_path):
+                # Versões anteriores do mesmo objeto não serão mais pedidas
+                for anterior in anteriores:
+                    if anterior != chave:
+                        cache.discard(anterior)
+                arquivo = cache.open(chave)
+                if arquivo is not None:
+                    return arquivo, None
+                return None, "cópia local descartada durante o download"
+            return _arquivo_temporario(tmp_path), None
+
+        except Exception as e:
+            return None, str(e)
+
+    @staticmethod
+    def cache_stats() -> dict:
+        return get_storage_cache().stats()
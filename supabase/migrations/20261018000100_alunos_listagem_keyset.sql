@@ -0,0 +1,6 @@
+-- Listagem de Gestão de Alunos: paginação por keyset em (nome_completo, id)
+-- (AlunoRepository.listar_pagina -> rpc listar_alunos_pagina, em 20261018000800).
+-- O índice cobre o ORDER BY e a comparação de linha (nome_completo, id) > (x, y),
+-- que o Postgres resolve como um único intervalo do índice. (O filtro equivalente
+-- nome_completo > x OR (nome_completo = x AND id > y) não usa o índice assim.)
+create index if not exists idx_alunos_nome_id on public.alunos (nome_completo, id);
@@ -0,0 +1,49 @@
+-- Busca de alunos sem acento e tolerante a erros de digitação
+-- (AlunoRepository.buscar -> rpc buscar_alunos).
+--
+-- nome_busca guarda o nome em minúsculas e sem acentos. O unaccent tem o mesmo
+-- efeito da remoção de marcas NFKD feita no Python (remover_acentos) para os
+-- nomes em português; o termo já chega dobrado pelo app e é dobrado aqui de novo.
+create extension if not exists pg_trgm with schema extensions;
+create extension if not exists unaccent with schema extensions;
+
+-- unaccent() é STABLE; a versão com dicionário explícito pode ser IMMUTABLE,
+-- o que permite usá-la em coluna gerada e em índice.
+create or replace function public.f_unaccent(texto text)
+returns text
+language sql immutable parallel safe strict
+as $$ select extensions.unaccent('extensions.unaccent'::regdictionary, texto) $$;
+
+alter table public.alunos
+    add column if not exists nome_busca text
+    generated always as (lower(public.f_unaccent(coalesce(nome_completo, '')))) stored;
+
+-- Índices GIN de trigramas: atendem prefixo (like 'x%'), trecho (like '%x%')
+-- e similaridade (<%) sem varrer a tabela.
+create index if not exists idx_alunos_nome_busca_trgm on public.alunos using gin (nome_busca extensions.gin_trgm_ops);
+create index if not exists idx_alunos_cpf_trgm on public.alunos using gin (cpf extensions.gin_trgm_ops);
+
+-- Top-k por relevância: prefixo do nome e trecho de CPF valem 1.0;
+-- o resto é ordenado pela similaridade de palavra (pg_trgm).
+create or replace function public.buscar_alunos(termo text, limite int default 10)
+returns setof public.alunos
+language sql stable
+set pg_trgm.word_similarity_threshold = 0.4
+set search_path = public, extensions
+as $$
+    with q as (
+        select lower(public.f_unaccent(trim(termo))) as t,
+               regexp_replace(termo, '\D', '', 'g') as d
+    )
+    select a.*
+    from public.alunos a, q
+    where (q.t <> '' and (a.nome_busca like q.t || '%' or q.t <% a.nome_busca))
+       or (length(q.d) >= 3 and a.cpf like '%' || q.d || '%')
+    order by greatest(
+                 case when a.nome_busca like q.t || '%' then 1.0 else 0.0 end,
+                 case when length(q.d) >= 3 and a.cpf like '%' || q.d || '%' then 1.0 else 0.0 end,
+                 word_similarity(q.t, a.nome_busca)
+             ) desc,
+             a.nome_completo
+    limit greatest(1, least(limite, 100));
+$$;
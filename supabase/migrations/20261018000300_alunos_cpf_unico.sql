@@ -0,0 +1,6 @@
+-- Importação em massa de alunos (StudentImporter): upsert em lotes com
+-- on_conflict=cpf. O ON CONFLICT (cpf) do PostgREST exige um índice único
+-- na coluna; ele também garante que o cadastro manual não duplique CPFs.
+-- Antes de aplicar, confira se não há CPFs repetidos:
+--   select cpf, count(*) from public.alunos group by cpf having count(*) > 1;
+create unique index if not exists idx_alunos_cpf_unico on public.alunos (cpf);
@@ -0,0 +1,57 @@
+-- Parcelas de cada contrato (entrada e saldo), antes só existentes no PDF.
+-- Gravadas junto com o contrato, em uma única requisição, pelo rpc
+-- criar_contratos_com_parcelas (ContratoRepository.criar_contrato /
+-- criar_contratos_em_lote com parcelas).
+create table if not exists public.parcelas (
+    id bigint generated always as identity primary key,
+    contrato_id uuid not null references public.contratos (id) on delete cascade,
+    tipo text not null check (tipo in ('entrada', 'saldo')),
+    numero integer not null,
+    total_parcelas integer not null,
+    vencimento date not null,
+    valor numeric(12, 2) not null,
+    forma_pagamento text,
+    status text not null default 'Aberta' check (status in ('Aberta', 'Paga', 'Cancelada')),
+    pago_em timestamptz,
+    created_at timestamptz not null default now(),
+    unique (contrato_id, tipo, numero)
+);
+
+-- Consultas por período ("tudo que vence no mês que vem") e por status no
+-- período ("em aberto vencendo na semana"): range scan em vez de varrer a tabela.
+-- A unique acima já indexa contrato_id para as parcelas de um contrato.
+create index if not exists idx_parcelas_vencimento on public.parcelas (vencimento);
+create index if not exists idx_parcelas_status_vencimento on public.parcelas (status, vencimento);
+
+-- Insere os contratos e as parcelas de cada um numa transação só.
+-- contratos: array de objetos com as colunas de contratos e a chave
+-- "parcelas" (array de {tipo, numero, total_parcelas, vencimento, valor,
+-- forma_pagamento}). Colunas ausentes no objeto ficam com o default da tabela.
+create or replace function public.criar_contratos_com_parcelas(contratos jsonb)
+returns setof public.contratos
+language plpgsql
+as $$
+declare
+    item jsonb;
+    dados jsonb;
+    cols text;
+    novo public.contratos;
+begin
+    for item in select value from jsonb_array_elements(contratos) loop
+        dados := item - 'parcelas';
+        select string_agg(quote_ident(k), ', ') into cols from jsonb_object_keys(dados) as k;
+
+        execute format(
+            'insert into public.contratos (%1$s) select %1$s from jsonb_populate_record(null::public.contratos, $1) returning *',
+            cols
+        ) using dados into novo;
+
+        insert into public.parcelas (contrato_id, tipo, numero, total_parcelas, vencimento, valor, forma_pagamento)
+        select novo.id, p.tipo, p.numero, p.total_parcelas, p.vencimento, p.valor, p.forma_pagamento
+        from jsonb_to_recordset(coalesce(item -> 'parcelas', '[]'::jsonb))
+            as p(tipo text, numero integer, total_parcelas integer, vencimento date, valor numeric, forma_pagamento text);
+
+        return next novo;
+    end loop;
+end;
+$$;
@@ -0,0 +1,105 @@
+-- Métricas do painel principal (app.py) mantidas de forma incremental por
+-- triggers: o painel lê poucas linhas já somadas (MetricaRepository.painel),
+-- qualquer que seja o volume de contratos e alunos.
+
+-- Estado atual: quantidade e soma de valor_final por status do contrato
+create table if not exists public.contratos_por_status (
+    status text primary key,
+    quantidade bigint not null default 0,
+    valor numeric(14, 2) not null default 0
+);
+
+-- Eventos por mês: contratos_criados, contratos_assinados, alunos_novos
+create table if not exists public.metricas_mensais (
+    mes date not null,  -- primeiro dia do mês
+    metrica text not null,
+    quantidade bigint not null default 0,
+    valor numeric(14, 2) not null default 0,
+    primary key (mes, metrica)
+);
+
+create or replace function public._somar_status(p_status text, p_quantidade bigint, p_valor numeric)
+returns void language sql as $$
+    insert into public.contratos_por_status as t (status, quantidade, valor)
+    values (p_status, p_quantidade, coalesce(p_valor, 0))
+    on conflict (status) do update
+        set quantidade = t.quantidade + excluded.quantidade, valor = t.valor + excluded.valor;
+$$;
+
+create or replace function public._somar_mes(p_quando timestamptz, p_metrica text, p_quantidade bigint, p_valor numeric)
+returns void language sql as $$
+    insert into public.metricas_mensais as t (mes, metrica, quantidade, valor)
+    values (date_trunc('month', coalesce(p_quando, now()))::date, p_metrica, p_quantidade, coalesce(p_valor, 0))
+    on conflict (mes, metrica) do update
+        set quantidade = t.quantidade + excluded.quantidade, valor = t.valor + excluded.valor;
+$$;
+
+-- security definer: quem assina pela página pública não precisa de permissão
+-- de escrita nas tabelas de métricas
+create or replace function public._metricas_contratos()
+returns trigger language plpgsql security definer set search_path = public as $$
+begin
+    if tg_op in ('UPDATE', 'DELETE') then
+        perform public._somar_status(old.status, -1, -old.valor_final);
+        if old.status = 'Assinado' and (tg_op = 'DELETE' or new.status is distinct from 'Assinado') then
+            perform public._somar_mes(old.data_aceite, 'contratos_assinados', -1, -old.valor_final);
+        end if;
+    end if;
+    if tg_op in ('INSERT', 'UPDATE') then
+        perform public._somar_status(new.status, 1, new.valor_final);
+        if new.status = 'Assinado' and (tg_op = 'INSERT' or old.status is distinct from 'Assinado') then
+            perform public._somar_mes(new.data_aceite, 'contratos_assinados', 1, new.valor_final);
+        end if;
+    end if;
+    if tg_op = 'INSERT' then
+        perform public._somar_mes(new.created_at, 'contratos_criados', 1, new.valor_final);
+    end if;
+    return null;
+end;
+$$;
+
+drop trigger if exists trg_metricas_contratos on public.contratos;
+create trigger trg_metricas_contratos
+    after insert or delete or update of status, valor_final, data_aceite on public.contratos
+    for each row execute function public._metricas_contratos();
+
+create or replace function public._metricas_alunos()
+returns trigger language plpgsql security definer set search_path = public as $$
+begin
+    perform public._somar_mes(now(), 'alunos_novos', 1, 0);
+    return null;
+end;
+$$;
+
+drop trigger if exists trg_metricas_alunos on public.alunos;
+create trigger trg_metricas_alunos
+    after insert on public.alunos
+    for each row execute function public._metricas_alunos();
+
+-- Carga inicial a partir dos dados existentes
+truncate public.contratos_por_status, public.metricas_mensais;
+
+insert into public.contratos_por_status (status, quantidade, valor)
+select status, count(*), coalesce(sum(valor_final), 0) from public.contratos group by status;
+
+insert into public.metricas_mensais (mes, metrica, quantidade, valor)
+select date_trunc('month', created_at)::date, 'contratos_criados', count(*), coalesce(sum(valor_final), 0)
+from public.contratos group by 1;
+
+insert into public.metricas_mensais (mes, metrica, quantidade, valor)
+select date_trunc('month', coalesce(data_aceite, created_at))::date, 'contratos_assinados', count(*), coalesce(sum(valor_final), 0)
+from public.contratos where status = 'Assinado' group by 1
+on conflict (mes, metrica) do update
+    set quantidade = metricas_mensais.quantidade + excluded.quantidade, valor = metricas_mensais.valor + excluded.valor;
+
+do $$
+begin
+    if exists (
+        select 1 from information_schema.columns
+        where table_schema = 'public' and table_name = 'alunos' and column_name = 'created_at'
+    ) then
+        insert into public.metricas_mensais (mes, metrica, quantidade, valor)
+        select date_trunc('month', created_at)::date, 'alunos_novos', count(*), 0 from public.alunos group by 1;
+    end if;
+end;
+$$;
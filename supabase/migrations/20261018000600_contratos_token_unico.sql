@@ -0,0 +1,6 @@
+-- Página de assinatura: busca do contrato por token_acesso
+-- (ContratoRepository.buscar_por_token). O índice único evita a varredura da
+-- tabela e garante que um link nunca aponte para dois contratos.
+-- Antes de aplicar, confira se não há tokens repetidos:
+--   select token_acesso, count(*) from public.contratos group by token_acesso having count(*) > 1;
+create unique index if not exists idx_contratos_token_acesso on public.contratos (token_acesso);
@@ -0,0 +1,112 @@
+-- Lembretes automáticos de assinatura para contratos pendentes
+-- (src/services/reminders.py, agendado na fila de jobs).
+--
+-- Cada etapa é um limiar em dias desde a criação do contrato (ex.: 3, 7, 14).
+-- O rpc reservar_lembretes lê só os contratos que passaram do limiar desde a
+-- última execução (cursor por etapa + índice em status, created_at), então o
+-- custo acompanha o número de lembretes devidos, não o total de contratos.
+
+create index if not exists idx_contratos_status_created_at on public.contratos (status, created_at);
+
+-- Um lembrete por contrato e etapa: a linha é reservada antes do envio
+-- ('enviando') e atualizada com o resultado ('enviado' ou 'falhou').
+create table if not exists public.lembretes_assinatura (
+    contrato_id uuid not null references public.contratos (id) on delete cascade,
+    etapa integer not null,
+    status text not null default 'enviando' check (status in ('enviando', 'enviado', 'falhou')),
+    tentativas integer not null default 1,
+    erro text,
+    ultima_tentativa timestamptz not null default now(),
+    enviado_em timestamptz,
+    primary key (contrato_id, etapa)
+);
+
+-- Reenvio das falhas: só as linhas com status 'falhou' entram no índice
+create index if not exists idx_lembretes_assinatura_falhou
+    on public.lembretes_assinatura (etapa, ultima_tentativa) where status = 'falhou';
+
+-- Até onde cada etapa já foi processada, na ordem (created_at, id): contratos
+-- gerados em lote compartilham o mesmo created_at
+create table if not exists public.lembretes_cursor (
+    etapa integer primary key,
+    processado_ate timestamptz not null default '-infinity',
+    processado_id uuid not null default '00000000-0000-0000-0000-000000000000'
+);
+
+-- Reserva até `limite` lembretes devidos da etapa e devolve os dados do e-mail.
+-- - Novos: contratos pendentes criados entre o cursor da etapa e now() - etapa_dias.
+--   Contratos que já passaram da etapa seguinte (proxima_dias) ficam para ela:
+--   um contrato antigo recebe só o lembrete mais recente, não todos de uma vez.
+-- - Falhas anteriores da etapa com menos de max_tentativas, tentadas há mais de
+--   reenviar_apos_minutos, se o contrato continua pendente.
+-- Chamado em sequência até voltar vazio; cada chamada avança o cursor.
+create or replace function public.reservar_lembretes(
+    etapa_dias integer,
+    proxima_dias integer default null,
+    limite integer default 50,
+    max_tentativas integer default 3,
+    reenviar_apos_minutos integer default 30
+)
+returns table (
+    contrato_id uuid, etapa integer, tentativas integer,
+    token_acesso text, nome_aluno text, email text, nome_curso text
+)
+language plpgsql
+as $$
+#variable_conflict use_column
+declare
+    desde timestamptz;
+    desde_id uuid;
+    ate timestamptz := now() - make_interval(days => etapa_dias);
+begin
+    insert into public.lembretes_cursor (etapa) values (etapa_dias) on conflict do nothing;
+    select processado_ate, processado_id into desde, desde_id
+    from public.lembretes_cursor where etapa = etapa_dias for update;
+    if proxima_dias is not null and desde < now() - make_interval(days => proxima_dias) then
+        desde := now() - make_interval(days => proxima_dias);
+        desde_id := '00000000-0000-0000-0000-000000000000';
+    end if;
+
+    return query
+    with candidatos as (
+        select c.id, c.created_at
+        from public.contratos c
+        where c.status = 'Pendente' and c.created_at >= desde and (c.created_at, c.id) > (desde, desde_id)
+          and c.created_at <= ate
+        order by c.created_at, c.id
+        limit limite
+    ), ultimo as (
+        select created_at, id from candidatos order by created_at desc, id desc limit 1
+    ), cursor_avancado as (
+        update public.lembretes_cursor lc
+        set processado_ate = u.created_at, processado_id = u.id
+        from ultimo u
+        where lc.etapa = etapa_dias
+    ), novos as (
+        insert into public.lembretes_assinatura as l (contrato_id, etapa)
+        select id, etapa_dias from candidatos
+        on conflict do nothing
+        returning l.contrato_id, l.tentativas
+    ), repetidos as (
+        update public.lembretes_assinatura l
+        set status = 'enviando', tentativas = l.tentativas + 1, erro = null, ultima_tentativa = now()
+        where l.etapa = etapa_dias
+          and (l.contrato_id, l.etapa) in (
+              select f.contrato_id, f.etapa
+              from public.lembretes_assinatura f
+              join public.contratos c on c.id = f.contrato_id and c.status = 'Pendente'
+              where f.etapa = etapa_dias and f.status = 'falhou' and f.tentativas < max_tentativas
+                and f.ultima_tentativa < now() - make_interval(mins => reenviar_apos_minutos)
+              limit limite
+          )
+        returning l.contrato_id, l.tentativas
+    )
+    select r.contrato_id, etapa_dias, r.tentativas,
+           c.token_acesso::text, a.nome_completo::text, a.email::text, cu.nome::text
+    from (select * from novos union all select * from repetidos) r
+    join public.contratos c on c.id = r.contrato_id
+    join public.alunos a on a.id = c.aluno_id
+    left join public.turmas t on t.id = c.turma_id
+    left join public.cursos cu on cu.id = t.curso_id;
+end;
+$$;
@@ -0,0 +1,26 @@
+-- Página da listagem de alunos por keyset (AlunoRepository.listar_pagina).
+--
+-- O PostgREST não expressa comparação de linha no filtro da tabela, e o
+-- or=(nome_completo.gt.x, and(nome_completo.eq.x, id.gt.y)) não vira um
+-- intervalo do índice idx_alunos_nome_id. Aqui a comparação (nome_completo, id) > (x, y)
+-- começa a leitura do índice direto no cursor e para depois de `limite` linhas.
+-- Os filtros de busca são opcionais: trecho do nome (nome_busca, já dobrado
+-- pelo app) ou trecho do CPF.
+create or replace function public.listar_alunos_pagina(
+    apos_nome text default null,
+    apos_id uuid default null,
+    nome_trecho text default null,
+    cpf_trecho text default null,
+    limite int default 25
+)
+returns setof public.alunos
+language sql stable
+as $$
+    select a.*
+    from public.alunos a
+    where (apos_nome is null or (a.nome_completo, a.id) > (apos_nome, apos_id))
+      and (nome_trecho is null or a.nome_busca like '%' || nome_trecho || '%')
+      and (cpf_trecho is null or a.cpf like '%' || cpf_trecho || '%')
+    order by a.nome_completo, a.id
+    limit greatest(1, least(limite, 201));
+$$;
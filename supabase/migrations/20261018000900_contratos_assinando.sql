@@ -0,0 +1,11 @@
+-- Assinatura em duas etapas (pages/Assinatura.py):
+--   'Pendente' -> 'Assinando' (aceite registrado, caminho_arquivo intacto)
+--   -> 'Assinado' (via assinada já no Storage, caminho_arquivo apontando para ela).
+-- assinatura_iniciada_em marca a reserva: um contrato parado em 'Assinando' além
+-- de alguns minutos é de um processo que caiu, e src/services/signature_recovery.py
+-- conclui ou desfaz a assinatura.
+alter table public.contratos add column if not exists assinatura_iniciada_em timestamptz;
+
+-- Só os contratos em 'Assinando' entram no índice (poucos, e por pouco tempo)
+create index if not exists idx_contratos_assinando
+    on public.contratos (assinatura_iniciada_em) where status = 'Assinando';
@@ -0,0 +1,33 @@
+-- Situação do e-mail com o link de assinatura, por contrato.
+-- O envio é feito pelos workers da fila de jobs (job 'enviar_email'), mas a fila
+-- é local ao processo: o resultado fica gravado no contrato para aparecer em
+-- qualquer sessão que liste o contrato, e não só na que pediu o envio.
+--   email_status: 'na_fila' (pedido registrado), 'enviado' ou 'falhou' (última tentativa;
+--   a fila ainda pode reenviar até o máximo de tentativas do job)
+alter table public.contratos
+    add column if not exists email_status text check (email_status in ('na_fila', 'enviado', 'falhou')),
+    add column if not exists email_destinatario text,
+    add column if not exists email_tentativas integer not null default 0,
+    add column if not exists email_erro text,
+    add column if not exists email_enviado_em timestamptz;
+
+-- Resultado de uma tentativa de envio (erro nulo = enviado), gravado pelo worker.
+-- O contador de tentativas é incrementado no banco: duas tentativas do mesmo
+-- contrato em workers diferentes não se sobrescrevem. O token tem o tipo da coluna
+-- para a busca usar o índice único de token_acesso.
+create or replace function public.registrar_envio_email(
+    token public.contratos.token_acesso%type,
+    destinatario text,
+    erro text default null
+)
+returns void
+language sql
+as $$
+    update public.contratos
+    set email_status = case when registrar_envio_email.erro is null then 'enviado' else 'falhou' end,
+        email_destinatario = registrar_envio_email.destinatario,
+        email_tentativas = email_tentativas + 1,
+        email_erro = registrar_envio_email.erro,
+        email_enviado_em = case when registrar_envio_email.erro is null then now() else email_enviado_em end
+    where token_acesso = registrar_envio_email.token;
+$$;
@@ -0,0 +1,91 @@
+-- Lembretes presos em 'enviando': o processo que reservou o lembrete caiu antes
+-- de registrar o resultado (worker morto no meio do lote). Sem isto a linha ficava
+-- em 'enviando' para sempre e o contrato nunca recebia o lembrete daquela etapa.
+-- Agora reservar_lembretes também retoma as linhas em 'enviando' tentadas há mais
+-- de enviando_timeout_minutos, contando como mais uma tentativa (até max_tentativas).
+
+-- Reenvio: linhas 'falhou' e 'enviando' (as 'enviado', a maioria, ficam de fora)
+drop index if exists public.idx_lembretes_assinatura_falhou;
+create index if not exists idx_lembretes_assinatura_reenvio
+    on public.lembretes_assinatura (etapa, ultima_tentativa) where status in ('falhou', 'enviando');
+
+-- Novo parâmetro: a assinatura antiga é removida para não ficar uma sobrecarga ambígua
+drop function if exists public.reservar_lembretes(integer, integer, integer, integer, integer);
+
+create or replace function public.reservar_lembretes(
+    etapa_dias integer,
+    proxima_dias integer default null,
+    limite integer default 50,
+    max_tentativas integer default 3,
+    reenviar_apos_minutos integer default 30,
+    enviando_timeout_minutos integer default 30
+)
+returns table (
+    contrato_id uuid, etapa integer, tentativas integer,
+    token_acesso text, nome_aluno text, email text, nome_curso text
+)
+language plpgsql
+as $$
+#variable_conflict use_column
+declare
+    desde timestamptz;
+    desde_id uuid;
+    ate timestamptz := now() - make_interval(days => etapa_dias);
+begin
+    insert into public.lembretes_cursor (etapa) values (etapa_dias) on conflict do nothing;
+    select processado_ate, processado_id into desde, desde_id
+    from public.lembretes_cursor where etapa = etapa_dias for update;
+    if proxima_dias is not null and desde < now() - make_interval(days => proxima_dias) then
+        desde := now() - make_interval(days => proxima_dias);
+        desde_id := '00000000-0000-0000-0000-000000000000';
+    end if;
+
+    return query
+    with candidatos as (
+        select c.id, c.created_at
+        from public.contratos c
+        where c.status = 'Pendente' and c.created_at >= desde and (c.created_at, c.id) > (desde, desde_id)
+          and c.created_at <= ate
+        order by c.created_at, c.id
+        limit limite
+    ), ultimo as (
+        select created_at, id from candidatos order by created_at desc, id desc limit 1
+    ), cursor_avancado as (
+        update public.lembretes_cursor lc
+        set processado_ate = u.created_at, processado_id = u.id
+        from ultimo u
+        where lc.etapa = etapa_dias
+    ), novos as (
+        insert into public.lembretes_assinatura as l (contrato_id, etapa)
+        select id, etapa_dias from candidatos
+        on conflict do nothing
+        returning l.contrato_id, l.tentativas
+    ), repetidos as (
+        update public.lembretes_assinatura l
+        set status = 'enviando', tentativas = l.tentativas + 1, erro = null, ultima_tentativa = now()
+        where l.etapa = etapa_dias
+          and (l.contrato_id, l.etapa) in (
+              select f.contrato_id, f.etapa
+              from public.lembretes_assinatura f
+              join public.contratos c on c.id = f.contrato_id and c.status = 'Pendente'
+              where f.etapa = etapa_dias and f.tentativas < max_tentativas
+                and (
+                    (f.status = 'falhou'
+                     and f.ultima_tentativa < now() - make_interval(mins => reenviar_apos_minutos))
+                    or (f.status = 'enviando'
+                     and f.ultima_tentativa < now() - make_interval(mins => enviando_timeout_minutos))
+                )
+              limit limite
+              for update of f skip locked
+          )
+        returning l.contrato_id, l.tentativas
+    )
+    select r.contrato_id, etapa_dias, r.tentativas,
+           c.token_acesso::text, a.nome_completo::text, a.email::text, cu.nome::text
+    from (select * from novos union all select * from repetidos) r
+    join public.contratos c on c.id = r.contrato_id
+    join public.alunos a on a.id = c.aluno_id
+    left join public.turmas t on t.id = c.turma_id
+    left join public.cursos cu on cu.id = t.curso_id;
+end;
+$$;
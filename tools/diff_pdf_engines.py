@@ -0,0 +1,222 @@
+"""
+Harness de comparação entre os motores de PDF: LibreOffice x renderizador nativo (reportlab).
+
+Gera contratos sintéticos (1, 12 e 36 parcelas de saldo) e confere:
+  - cobertura (sempre): toda palavra do DOCX (corpo, cabeçalho e rodapé, inclusive
+    hyperlinks e controles de conteúdo) precisa aparecer no PDF nativo, com a mesma
+    contagem. Os resultados de campos dinâmicos (PAGE, NUMPAGES...) ficam de fora;
+  - com --libreoffice, converte o mesmo DOCX pelos dois motores e compara:
+      - texto: sequência de palavras extraída com pypdf (difflib), com as diferenças listadas;
+      - visual (opcional, requer pypdfium2): diferença média de pixels por página,
+        com PNGs de diff salvos em --out.
+
+Uso (na raiz do projeto):
+    python -m tools.diff_pdf_engines
+    python -m tools.diff_pdf_engines --libreoffice --out /tmp/diff_pdf --max-visual 0.05
+Sai com código 1 se faltar alguma palavra do DOCX no PDF nativo (ou se a diferença
+visual passar de --max-visual, quando informado).
+"""
+import io
+import os
+import re
+import sys
+import difflib
+import argparse
+from collections import Counter
+from datetime import date, datetime
+from docx import Document
+from docx.oxml.ns import qn
+from pypdf import PdfReader
+from src.document_engine.processor import ContractProcessor
+from src.document_engine.native_renderer import render_docx_native
+from src.document_engine.contract_builder import (
+    calcular_valores, parcelas_entrada, parcelas_saldo, tabelas_pdf, montar_contexto
+)
+
+TEMPLATE = "assets/modelo_contrato_V2.docx"
+
+ALUNO = {
+    "id": "00000000-0000-0000-0000-000000000000", "nome_completo": "Maria Conceição de Araújo",
+    "cpf": "12345678909", "rg": "1234567890", "email": "maria@example.com", "telefone": "51999998888",
+    "data_nascimento": "1990-05-17", "estado_civil": "Casado(a)", "logradouro": "Rua General Neto",
+    "numero": "594", "complemento": "Apto 302", "bairro": "Floresta", "cidade": "Porto Alegre",
+    "uf": "RS", "cep": "90560-020", "crm": "12345",
+}
+CURSO = {"nome": "Pós-Graduação em Dermatologia", "valor_bruto": 28990.0}
+TURMA = {"id": 1, "codigo_turma": "DERM-2027-01", "formato": "Híbrido", "atendimento": "Sim"}
+
+
+def gerar_docx(qtd_saldo: int) -> io.BytesIO:
+    valores = calcular_valores(CURSO["valor_bruto"], 12.5)
+    entrada = parcelas_entrada(3000.0, 3, date(2027, 1, 10), "PIX")
+    saldo = parcelas_saldo(round(valores["valor_final"] - 3000.0, 2), qtd_saldo, date(2027, 2, 10), "Boleto")
+    ctx = montar_contexto(ALUNO, CURSO, TURMA, valores, datetime(2027, 1, 5, 10, 0))
+    tbl_ent, tbl_sal = tabelas_pdf(entrada, saldo)
+    return ContractProcessor(TEMPLATE).generate_docx(ctx, tbl_ent, tbl_sal)
+
+
+def palavras(pdf: bytes) -> list:
+    texto = " ".join(p.extract_text() or "" for p in PdfReader(io.BytesIO(pdf)).pages)
+    return re.findall(r"\S+", texto)
+
+
+# Campos cujo texto em cache no DOCX não vale para o PDF (número de página etc.)
+CAMPOS_DINAMICOS = {"PAGE", "NUMPAGES", "SECTIONPAGES", "DATE", "TIME"}
+
+
+def _campo(instrucao: str) -> str:
+    """Nome do campo a partir da instrução (' PAGE \\* MERGEFORMAT ' -> 'PAGE')."""
+    partes = (instrucao or "").split()
+    return partes[0].upper() if partes else ""
+
+
+def _texto_paragrafo(p) -> str:
+    """Texto do parágrafo como o leitor vê, sem instruções nem resultados de campos dinâmicos."""
+    partes, instrucao, no_resultado = [], "", False
+    for el in p.iter(qn('w:t'), qn('w:tab'), qn('w:br'), qn('w:fldChar'), qn('w:instrText'), qn('w:fldSimple')):
+        if el.tag == qn('w:fldChar'):
+            tipo = el.get(qn('w:fldCharType'))
+            if tipo == "begin":
+                instrucao = ""
+            elif tipo == "separate":
+                no_resultado = _campo(instrucao) in CAMPOS_DINAMICOS
+            elif tipo == "end":
+                no_resultado = False
+        elif el.tag == qn('w:instrText'):
+            instrucao += el.text or ""
+        elif el.tag == qn('w:t'):
+            simples = next(el.iterancestors(qn('w:fldSimple')), None)
+            dinamico = simples is not None and _campo(simples.get(qn('w:instr'))) in CAMPOS_DINAMICOS
+            if not (no_resultado or dinamico):
+                partes.append(el.text or "")
+        else:
+            partes.append(" ")
+    return "".join(partes)
+
+
+def _tokens(texto: str) -> list:
+    # Palavras sem pontuação: o espaçamento que o pypdf reconstrói em volta de vírgulas,
+    # parênteses e mudanças de fonte não deve contar como diferença
+    return re.findall(r"\w+", texto.casefold())
+
+
+def palavras_docx(docx: io.BytesIO) -> Counter:
+    """Contagem das palavras do DOCX: corpo, cabeçalhos e rodapés (cada parte uma vez)."""
+    docx.seek(0)
+    doc = Document(docx)
+    elementos, vistos = [doc.element.body], set()
+    for secao in doc.sections:
+        for parte in (secao.header, secao.first_page_header, secao.even_page_header,
+                      secao.footer, secao.first_page_footer, secao.even_page_footer):
+            if not parte.is_linked_to_previous and id(parte.part) not in vistos:
+                vistos.add(id(parte.part))
+                elementos.append(parte._element)
+    contagem = Counter()
+    for elemento in elementos:
+        for p in elemento.iter(qn('w:p')):
+            contagem.update(_tokens(_texto_paragrafo(p)))
+    return contagem
+
+
+def palavras_faltando(docx: io.BytesIO, pdf: bytes) -> Counter:
+    """Palavras do DOCX que o PDF não tem (ou tem menos vezes): vazio se nada se perdeu."""
+    texto = " ".join(p.extract_text() or "" for p in PdfReader(io.BytesIO(pdf)).pages)
+    return palavras_docx(docx) - Counter(_tokens(texto))
+
+
+def diff_texto(a: bytes, b: bytes):
+    pa, pb = palavras(a), palavras(b)
+    matcher = difflib.SequenceMatcher(None, pa, pb, autojunk=False)
+    diferencas = [
+        (op, " ".join(pa[i1:i2]), " ".join(pb[j1:j2]))
+        for op, i1, i2, j1, j2 in matcher.get_opcodes() if op != "equal"
+    ]
+    return matcher.ratio(), diferencas
+
+
+def diff_visual(a: bytes, b: bytes, prefixo: str):
+    """Diferença média de pixels (0..1) por página; None se pypdfium2 não estiver disponível."""
+    try:
+        import pypdfium2
+        from PIL import ImageChops, ImageStat
+    except ImportError:
+        return None
+
+    doc_a, doc_b = pypdfium2.PdfDocument(a), pypdfium2.PdfDocument(b)
+    resultado = []
+    for i in range(max(len(doc_a), len(doc_b))):
+        if i >= len(doc_a) or i >= len(doc_b):
+            resultado.append(1.0)
+            continue
+        img_a = doc_a[i].render(scale=1).to_pil().convert("L")
+        img_b = doc_b[i].render(scale=1).to_pil().convert("L").resize(img_a.size)
+        diff = ImageChops.difference(img_a, img_b)
+        resultado.append(ImageStat.Stat(diff).mean[0] / 255)
+        if prefixo:
+            diff.save(f"{prefixo}_p{i + 1:02d}.png")
+    return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Confere o PDF do renderizador nativo e o compara com o do LibreOffice")
+    parser.add_argument("--out", default="", help="Diretório para salvar os PDFs e os PNGs de diff")
+    parser.add_argument("--libreoffice", action="store_true", help="Compara também com o PDF do LibreOffice")
+    parser.add_argument("--max-visual", type=float, default=None, help="Diferença visual média máxima (0..1)")
+    args = parser.parse_args()
+
+    if args.out:
+        os.makedirs(args.out, exist_ok=True)
+
+    pool = None
+    if args.libreoffice:
+        from src.document_engine.office_pool import OfficePool
+        pool = OfficePool(size=1)
+    falhou = False
+    try:
+        for qtd in (1, 12, 36):
+            docx = gerar_docx(qtd)
+            pdf_nat = render_docx_native(io.BytesIO(docx.getvalue())).getvalue()
+            prefixo = os.path.join(args.out, f"saldo_{qtd:02d}") if args.out else ""
+            if prefixo:
+                with open(f"{prefixo}_nativo.pdf", "wb") as f:
+                    f.write(pdf_nat)
+
+            faltando = palavras_faltando(docx, pdf_nat)
+            print(f"\n=== {qtd} parcela(s) de saldo | páginas nativo: {len(PdfReader(io.BytesIO(pdf_nat)).pages)}"
+                  f" | palavras do DOCX faltando: {sum(faltando.values())}")
+            for palavra, n in faltando.most_common(20):
+                print(f"  [faltando] {palavra!r} x{n}")
+            if faltando:
+                falhou = True
+
+            if pool is None:
+                continue
+            pdf_lo = pool.convert(io.BytesIO(docx.getvalue())).getvalue()
+            if prefixo:
+                with open(f"{prefixo}_libreoffice.pdf", "wb") as f:
+                    f.write(pdf_lo)
+
+            ratio, diferencas = diff_texto(pdf_lo, pdf_nat)
+            print(f"  LibreOffice: {len(PdfReader(io.BytesIO(pdf_lo)).pages)} página(s) | texto: {ratio:.4f}")
+            for op, de, para in diferencas[:20]:
+                print(f"  [{op}] LO: {de[:80]!r} -> nativo: {para[:80]!r}")
+            if len(diferencas) > 20:
+                print(f"  ... mais {len(diferencas) - 20} diferença(s)")
+
+            visual = diff_visual(pdf_lo, pdf_nat, prefixo)
+            if visual is None:
+                print("  visual: pypdfium2 não instalado, comparação de pixels ignorada")
+            else:
+                media = sum(visual) / len(visual)
+                print(f"  visual: diferença média {media:.4f} | por página: {', '.join(f'{v:.3f}' for v in visual)}")
+                if args.max_visual is not None and media > args.max_visual:
+                    falhou = True
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    sys.exit(1 if falhou else 0)
+
+
+if __name__ == "__main__":
+    main()